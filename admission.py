@@ -0,0 +1,119 @@
+"""Admission control for the chat endpoints: per-client rate limits and a global concurrency cap.
+
+Each client gets a token bucket (RATE_LIMIT_PER_MINUTE tokens a minute, up to
+RATE_LIMIT_BURST at once). The buckets live in an LRU map capped at
+RATE_LIMIT_MAX_CLIENTS, so the limiter's memory is bounded too. Independently,
+at most MAX_CONCURRENT_ANSWERS answers are computed at a time; past that, new
+work is shed at once with 429 rather than queued behind a slow search, which
+keeps latency flat for the requests that are admitted.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', '30'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '10'))
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', '100000'))
+MAX_CONCURRENT_ANSWERS = int(os.environ.get('MAX_CONCURRENT_ANSWERS', '16'))
+
+# Proxies in front of the app that append to X-Forwarded-For; Vercel's edge is one
+FORWARDED_HOPS = int(os.environ.get('FORWARDED_HOPS', '1' if os.environ.get('VERCEL') else '0'))
+
+
+def client_address(request, hops=FORWARDED_HOPS):
+    """Address of the client behind `hops` trusted proxies.
+
+    Entries further left in X-Forwarded-For are set by the client itself and
+    cannot be trusted, so the one written by the outermost trusted proxy is used.
+    """
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get('x-forwarded-for', '').split(',') if part.strip()]
+        if forwarded:
+            return forwarded[-min(hops, len(forwarded))]
+    return request.client.host if request.client else 'unknown'
+
+
+class RateLimiter:
+    """Token bucket per client key"""
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.max_clients = max(1, max_clients)
+        self._buckets = OrderedDict()  # key -> [tokens, last refill], least recently seen first
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def check(self, key):
+        """0 if `key` may make a request now (and take a token), else seconds until it may"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                return 0.0
+            self.limited += 1
+            return (1 - bucket[0]) / self.rate if self.rate > 0 else 60.0
+
+
+class ConcurrencyLimit:
+    """Counting slots that are refused, not waited for, once all are taken"""
+
+    def __init__(self, limit=MAX_CONCURRENT_ANSWERS):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self.peak = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_use >= self.limit:
+                self.shed += 1
+                return False
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+
+
+def retry_after(seconds):
+    """Retry-After header value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def admission_metrics(limiter, concurrency):
+    return {
+        'rate_limit': {
+            'per_minute': limiter.rate * 60,
+            'burst': limiter.burst,
+            'clients_tracked': len(limiter),
+            'max_clients': limiter.max_clients,
+            'allowed': limiter.allowed,
+            'limited': limiter.limited,
+        },
+        'concurrency': {
+            'limit': concurrency.limit,
+            'in_use': concurrency.in_use,
+            'peak': concurrency.peak,
+            'shed': concurrency.shed,
+        },
+    }
@@ -1,24 +1,28 @@
 import requests
 from bs4 import BeautifulSoup
-import json
+import argparse
 import time
 import re
 from urllib.parse import urljoin, urlparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import os
+from browser_pool import BrowserPool, build_chrome_options, apply_resource_blocking
+from incremental import incremental_scrape, refresh_derived
+from dataset_io import write_dataset
+from text_store import compact_dataset, NEAR_DUPLICATE_THRESHOLD
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class AdvancedXboxROGAllyScraper:
-    def __init__(self, use_selenium=True):
+    def __init__(self, use_selenium=True, browser_pool=None, block_resources=False):
         self.base_url = "https://www.xbox.com/en-AU/handhelds/rog-xbox-ally"
         self.session = requests.Session()
         self.session.headers.update({
@@ -30,24 +34,21 @@ class AdvancedXboxROGAllyScraper:
             'Upgrade-Insecure-Requests': '1',
         })
         self.use_selenium = use_selenium
+        self.browser_pool = browser_pool
+        self.block_resources = block_resources
         self.driver = None
         self.scraped_data = {}
         
-        if self.use_selenium:
+        # A shared pool supplies warm browsers, so no Chrome is launched per instance
+        if self.use_selenium and self.browser_pool is None:
             self.setup_selenium()
     
     def setup_selenium(self):
         """Setup Selenium WebDriver for JavaScript rendering"""
         try:
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")  # Run in background
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920,1080")
-            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = webdriver.Chrome(options=build_chrome_options(block_resources=self.block_resources))
+            if self.block_resources:
+                apply_resource_blocking(self.driver)
             logger.info("Selenium WebDriver initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Selenium: {e}")
@@ -56,15 +57,34 @@ class AdvancedXboxROGAllyScraper:
     
     def get_page_with_selenium(self, url):
         """Get page content using Selenium for JavaScript rendering"""
+        if self.browser_pool is not None:
+            try:
+                with self.browser_pool.session() as driver:
+                    return self.render_page(driver, url)
+            except Exception as e:
+                logger.error(f"Browser pool error: {e}")
+                return None
+        
         if not self.driver:
             return None
         
+        try:
+            return self.render_page(self.driver, url)
+        except Exception:
+            return None
+    
+    def render_page(self, driver, url):
+        """Render a page in the given WebDriver and return its source.
+
+        Errors other than a load timeout are raised, so a pooled session that
+        failed is quit by `BrowserPool.session()` instead of being reused.
+        """
         try:
             logger.info(f"Loading page with Selenium: {url}")
-            self.driver.get(url)
+            driver.get(url)
             
             # Wait for page to load
-            WebDriverWait(self.driver, 20).until(
+            WebDriverWait(driver, 20).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
             
@@ -72,16 +92,16 @@ class AdvancedXboxROGAllyScraper:
             time.sleep(5)
             
             # Get the rendered page source
-            page_source = self.driver.page_source
+            page_source = driver.page_source
             logger.info("Page loaded successfully with Selenium")
             return page_source
             
         except TimeoutException:
             logger.warning("Page load timeout, proceeding with available content")
-            return self.driver.page_source
+            return driver.page_source
         except Exception as e:
             logger.error(f"Selenium error: {e}")
-            return None
+            raise
     
     def get_page_content(self, url):
         """Get page content with fallback options"""
@@ -105,6 +125,15 @@ class AdvancedXboxROGAllyScraper:
                 time.sleep(2 ** attempt)
         return None
     
+    def get_pages_content(self, urls, max_workers=None):
+        """Fetch several pages concurrently, one pooled browser per in-flight page"""
+        if max_workers is None:
+            max_workers = self.browser_pool.size if self.browser_pool is not None else 1
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            contents = executor.map(self.get_page_content, urls)
+            return dict(zip(urls, contents))
+    
     def extract_all_tabs_and_sections(self, soup):
         """Extract content from all tabs, sections, and interactive elements"""
         logger.info("Extracting all tabs and sections...")
@@ -338,13 +367,27 @@ class AdvancedXboxROGAllyScraper:
             logger.error("Failed to fetch page content")
             return None
         
+        return self.extract_from_html(page_content)
+    
+    def extract_pages(self, urls):
+        """Fetch several pages concurrently and extract each; {url: data} for the pages fetched"""
+        extracted = {}
+        for url, page_content in self.get_pages_content(urls).items():
+            if not page_content:
+                logger.error(f"Failed to fetch page content for {url}")
+                continue
+            extracted[url] = self.extract_from_html(page_content, url)
+        return extracted
+    
+    def extract_from_html(self, page_content, url=None):
+        """Extract ALL data categories from already-fetched page HTML"""
         soup = BeautifulSoup(page_content, 'html.parser')
         
         # Extract ALL categories of data
         self.scraped_data = {
-            'url': self.base_url,
+            'url': url or self.base_url,
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'scraping_method': 'Selenium + Requests' if self.use_selenium else 'Requests only',
+            'scraping_method': ('Selenium + Requests' if self.use_selenium else 'Requests only') + (' (heavy resources blocked)' if self.use_selenium and self.block_resources else ''),
             
             # Comprehensive content extraction
             'all_tabs_and_sections': self.extract_all_tabs_and_sections(soup),
@@ -385,7 +428,8 @@ class AdvancedXboxROGAllyScraper:
             # Script and style information
             'scripts': [script.get('src', '') for script in soup.find_all('script') if script.get('src')],
             'stylesheets': [link.get('href', '') for link in soup.find_all('link', rel='stylesheet') if link.get('href')],
-            'inline_styles': [style.get_text(strip=True) for style in soup.find_all('style') if style.get_text(strip=True)],
+            # Inline CSS is skipped in the lightweight rendering mode; the chatbot never reads it
+            'inline_styles': [] if self.block_resources else [style.get_text(strip=True) for style in soup.find_all('style') if style.get_text(strip=True)],
         }
         
         logger.info("COMPREHENSIVE data extraction completed successfully")
@@ -533,15 +577,16 @@ class AdvancedXboxROGAllyScraper:
         
         return pricing
     
-    def save_data(self, filename='xbox_rog_ally_complete_data.json'):
-        """Save scraped data to JSON file"""
+    def save_data(self, filename=os.path.join('data', 'xbox_rog_ally_complete_data.json'), compact=True, compression=None, dedupe=True):
+        """Save scraped data atomically (.jsonl for line-delimited, .gz/.zst for compressed output)"""
         if not self.scraped_data:
             logger.error("No data to save")
             return False
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.scraped_data, f, indent=2, ensure_ascii=False)
+            # Keyword extractors capture the same parent text many times; store each text once
+            data = compact_dataset(self.scraped_data, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD) if dedupe else self.scraped_data
+            write_dataset(data, filename, compact=compact, compression=compression)
             logger.info(f"Data saved to {filename}")
             return True
         except Exception as e:
@@ -589,29 +634,64 @@ TOTAL COMPREHENSIVE DATA POINTS: {total_data_points}
         return summary
     
     def cleanup(self):
-        """Clean up resources"""
+        """Clean up resources (a shared browser pool is left running for its owner)"""
         if self.driver:
             self.driver.quit()
             logger.info("Selenium WebDriver closed")
 
+def parse_page(value):
+    """`name=url` from the command line -> (shard name, url)"""
+    name, sep, url = value.partition('=')
+    if not sep or not name or not url:
+        raise argparse.ArgumentTypeError(f"expected NAME=URL, got {value!r}")
+    return name, url
+
+
 def main():
     """Main function to run the advanced scraper"""
+    parser = argparse.ArgumentParser(description="Scrape the Xbox ROG Ally product page")
+    parser.add_argument('--incremental', action='store_true', help="only re-render and merge sections that changed")
+    parser.add_argument('--page', dest='pages', action='append', type=parse_page, default=[], metavar='NAME=URL',
+                        help="also scrape URL into data/NAME_complete_data.json (repeatable)")
+    parser.add_argument('--pool-size', type=int, default=2, help="browsers kept warm for concurrent pages")
+    parser.add_argument('--block-resources', '--lightweight', action='store_true',
+                        help="skip images, fonts and media while rendering (less memory, faster loads)")
+    args = parser.parse_args()
+    
     logger.info("Starting Xbox ROG Ally COMPREHENSIVE data scraper...")
     
-    scraper = AdvancedXboxROGAllyScraper(use_selenium=True)
+    pool = BrowserPool(size=args.pool_size, block_resources=args.block_resources)
+    scraper = AdvancedXboxROGAllyScraper(use_selenium=True, browser_pool=pool, block_resources=args.block_resources)
     
     try:
-        # Extract ALL data
-        data = scraper.extract_all_data()
-        
+        if args.incremental:
+            manifest = incremental_scrape(scraper)
+            if manifest:
+                print(f"Incremental scrape {manifest['status']}: changed sections {manifest['changed_sections'] + manifest['added_sections'] + manifest['removed_sections']}")
+                for path in refresh_derived(manifest):
+                    print(f"Refreshed {path}")
+            else:
+                logger.error("Incremental scraping failed!")
+            return
+        
+        # Extract ALL data, rendering the extra pages alongside the main one
+        filenames = {scraper.base_url: os.path.join('data', 'xbox_rog_ally_complete_data.json')}
+        for name, url in args.pages:
+            filenames[url] = os.path.join('data', f'{name}_complete_data.json')
+        pages = scraper.extract_pages(list(filenames))
+        
+        for url, data in pages.items():
+            scraper.scraped_data = data
+            scraper.save_data(filenames[url])
+        
+        data = pages.get(scraper.base_url)
         if data:
+            scraper.scraped_data = data
+            
             # Generate and display comprehensive summary
             summary = scraper.generate_comprehensive_summary()
             print(summary)
             
-            # Save data to file
-            scraper.save_data()
-            
             # Display sample data
             print("\n=== SAMPLE EXTRACTED DATA ===")
             print(f"Tabs & Sections found: {list(scraper.scraped_data['all_tabs_and_sections'].keys())[:5]}")
@@ -625,6 +705,7 @@ def main():
     finally:
         # Clean up
         scraper.cleanup()
+        pool.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
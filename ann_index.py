@@ -0,0 +1,119 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index over unit vectors.
+
+Vectors are bucketed by their nearest spherical k-means centroid. A query scores
+the centroids, then only the vectors in the closest buckets: at most `nprobe`
+of them and, past the first, no more than `max_rows` vectors in all. Buckets
+grow like sqrt(n), so without the row cap a query's cost would too. New vectors
+are added to their nearest existing bucket without retraining.
+"""
+import math
+
+import numpy as np
+
+from dataset_io import atomic_write
+
+DEFAULT_NPROBE = 8
+
+# Rows scored per query however large the corpus: fewer buckets are probed as they grow
+MAX_PROBED_ROWS = 256
+
+# k-means only needs a sample of this many points per centroid to place them well
+TRAIN_POINTS_PER_LIST = 64
+
+
+def default_nlist(n):
+    """Bucket count for `n` vectors: grows like sqrt(n), so buckets stay small"""
+    return max(1, int(round(4 * math.sqrt(n))))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _nearest(centroids, vectors, batch=4096):
+    """Index of the most similar centroid for every vector"""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch):
+        chunk = np.asarray(vectors[start:start + batch], dtype=np.float32)
+        out[start:start + batch] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """Centroids plus the bucket of every vector; the vectors themselves live elsewhere"""
+
+    def __init__(self, centroids, assignments, trained_size):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.trained_size = int(trained_size)
+        self._build_lists()
+
+    def _build_lists(self):
+        self.list_rows = np.argsort(self.assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    @classmethod
+    def train(cls, vectors, nlist=None, iterations=10, seed=0):
+        """Fit centroids with spherical k-means on a sample of `vectors` and bucket all of them"""
+        n = len(vectors)
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, nlist * TRAIN_POINTS_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _nearest(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = _normalize(sums)
+        return cls(centroids, _nearest(centroids, vectors), n)
+
+    def __len__(self):
+        return len(self.assignments)
+
+    def add(self, vectors):
+        """Bucket vectors appended to the end of the indexed matrix"""
+        self.assignments = np.concatenate((self.assignments, _nearest(self.centroids, vectors)))
+        self._build_lists()
+
+    def needs_retraining(self, growth=4):
+        """True once the corpus has grown `growth`x past what the centroids were fitted on"""
+        return len(self) > growth * self.trained_size
+
+    def candidates(self, query, nprobe=DEFAULT_NPROBE, max_rows=MAX_PROBED_ROWS):
+        """Row numbers in the buckets closest to `query`: up to `nprobe` buckets holding at most
+        `max_rows` rows, though the closest bucket is always included"""
+        nprobe = min(nprobe, len(self.centroids))
+        scores = self.centroids @ query
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        probe = probe[np.argsort(-scores[probe])]
+        offsets = self.list_offsets
+        sizes = np.cumsum(offsets[probe + 1] - offsets[probe])
+        probe = probe[:max(1, int(np.searchsorted(sizes, max_rows, side='right')))]
+        return np.concatenate([self.list_rows[offsets[c]:offsets[c + 1]] for c in probe])
+
+    def search(self, matrix, query, k, nprobe=DEFAULT_NPROBE, max_rows=MAX_PROBED_ROWS):
+        """(scores, rows) of the best `k` candidates, best first"""
+        rows = self.candidates(query, nprobe, max_rows)
+        if not len(rows):
+            return np.empty(0, dtype=np.float32), rows
+        rows.sort()  # read the memory-mapped matrix front to back
+        scores = matrix[rows] @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], rows[top]
+
+    def save(self, filename):
+        with atomic_write(filename) as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments, trained_size=np.array(self.trained_size))
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename, allow_pickle=False) as data:
+            return cls(data['centroids'], data['assignments'], data['trained_size'])
@@ -1,201 +1,226 @@
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 import json
-import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Optional
 import os
-app = FastAPI(title="ROG Xbox Ally Enhanced Chatbot", version="2.0.0")
+import sys
 
-# Add CORS middleware
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared modules live in the project root
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from response_encoding import JSON_RESPONSE_CLASS, CompressionMiddleware
+
+app = FastAPI(title="ROG Xbox Ally Enhanced Chatbot", version="2.0.0", default_response_class=JSON_RESPONSE_CLASS)
+
+# Add CORS middleware; CORS_ALLOW_ORIGINS (comma-separated) restricts which sites may script the API
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[o.strip() for o in os.environ.get("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress answers and the page (brotli or gzip, above COMPRESS_MIN_SIZE bytes)
+app.add_middleware(CompressionMiddleware)
+
 # Templates
 # templates = Jinja2Templates(directory="templates")
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-# Point to the templates folder one level above
-templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
-
-# Load comprehensive scraped data
-def load_scraped_data():
-    try:
-        with open('xbox_rog_ally_complete_data.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("Warning: Scraped data file not found. Using fallback knowledge base.")
-        return None
-
-# Load the comprehensive data
-SCRAPED_DATA = load_scraped_data()
-
-# Enhanced knowledge base with scraped data
-ENHANCED_KNOWLEDGE = {
-    "general": {
-        "what_is": "The ROG Xbox Ally is a handheld gaming device that combines the power of Xbox with the freedom of Windows, crafted by ROG (Republic of Gamers). It's designed for portable gaming with Xbox Game Pass integration and offers next-gen power in your hands.",
-        "models": "There are two models: ROG Xbox Ally X (24GB RAM, 1TB storage) and ROG Xbox Ally (16GB RAM, 512GB storage). The Ally X is the premium 'next-gen power' model, while the Ally offers 'handheld freedom for everyone'.",
-        "tagline": "Power of Xbox. Freedom of Windows. Craftsmanship of ROG. Xbox, anywhere you go.",
-        "purpose": "Designed for handheld gaming freedom, allowing you to play Xbox games anywhere with the power of a gaming PC and the convenience of a handheld device."
-    },
-    "specs": {
-        "processor": "ROG Xbox Ally X uses AMD Ryzen AI Z2 Extreme Processor, while ROG Xbox Ally uses AMD Ryzen Z2 A Processor. Both are ultra-efficient processors designed for handheld gaming.",
-        "memory": "Ally X has 24GB LPDDR5X-8000 RAM, Ally has 16GB LPDDR5X-6400 RAM. The higher RAM in Ally X enables better multitasking and gaming performance.",
-        "storage": "Ally X comes with 1TB M.2 2280 SSD, Ally has 512GB M.2 2280 SSD. Both use the larger 2280 form factor for easier upgrades compared to smaller handheld SSDs.",
-        "display": "Both models feature a 7\" FHD (1080p) IPS display with 120Hz refresh rate, 500 nits brightness, AMD FreeSync Premium (Variable Refresh Rate), Corning Gorilla Glass Victus, and DXC Anti-Reflection coating for excellent visibility.",
-        "battery": "Ally X has an 80Wh battery, Ally has a 60Wh battery for extended gaming sessions. The larger battery in Ally X provides longer playtime.",
-        "dimensions": "Both models measure 290.8 x 121.5 x 50.7mm. Ally X weighs 715g, Ally weighs 670g.",
-        "operating_system": "Both models run Windows 11 Home, providing full Windows compatibility and access to PC games and applications."
-    }
+from admission import ConcurrencyLimit, RateLimiter, admission_metrics, client_address, retry_after
+from coalesce import SingleFlight, normalize_message
+from corpus import DEFAULT_DATA_DIR, Corpus
+from data_version import data_version
+from http_cache import DATA_VERSION_CACHE_CONTROL, PRIVATE_CACHE_CONTROL, SESSION_VARY, answer_etag, cache_headers, etag_matches, not_modified
+from knowledge import encode_response, load_knowledge
+from quick_answers import QUICK_QUESTIONS, load_quick_answers
+from segment import attach_segment, write_segment
+from snapshot import load_snapshot
+from sessions import SESSION_COOKIE, Session, create_session_store, load_session
+from spec_table import spec_attribute
+
+# Module import is the serverless cold start, so templates, semantic indexes, the
+# quick answers and the scraped shards are loaded on first use (or by warm_up)
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """Templates from the folder one level above, loaded on the first page view"""
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+
+# Knowledge, precomposed answers and keyword routes shared with the standard app
+KNOWLEDGE = load_knowledge()
+KB_TEXT = KNOWLEDGE.texts
+ANSWERS = KNOWLEDGE.answers
+ROUTER = KNOWLEDGE.router("enhanced")
+
+# Label shown in front of a search hit, by the section it was cut from
+SECTION_LABELS = {
+    'main_content': 'Content',
+    'comprehensive_specifications': 'Specification',
+    'interactive_elements': 'Interactive Element',
+    'all_tabs_and_sections': 'Tab/Section',
+    'gaming_features': 'Gaming',
+    'model_comparisons': 'Comparison',
+    'controls_and_interface': 'Controls',
+    'connectivity_and_ports': 'Connectivity',
+    'technical_details': 'Technical',
+    'accessories_and_packaging': 'Accessories',
+    'use_cases_and_scenarios': 'Use Case',
+    'pricing_and_availability': 'Pricing',
+    'page_metadata': 'Page',
 }
 
+# Sections searched first, so page copy outranks navigation and plumbing text
+SEARCH_SECTION_ORDER = ['main_content', 'comprehensive_specifications', 'interactive_elements', 'all_tabs_and_sections']
+
+# Every shard's passages and spec rows, compiled into one read-only file that all workers
+# mmap instead of each building their own (see segment.py); without a current one (always
+# the case on Vercel, which has no persistent disk to write it to) shards are parsed from
+# their datasets. INDEX_SEGMENT_FILE= (empty) disables it
+SEGMENT_FILE = os.environ.get("INDEX_SEGMENT_FILE", os.path.join(DEFAULT_DATA_DIR, "index_segment.bin"))
+SEGMENT = attach_segment(SEGMENT_FILE, data_version(), SEARCH_SECTION_ORDER)
+
+# Scraped datasets, one shard per product; a shard is loaded and segmented into
+# passages the first time a question is routed to it
+CORPUS = Corpus(section_order=SEARCH_SECTION_ORDER, segment=SEGMENT)
+if not len(CORPUS):
+    print("Warning: Scraped data file not found. Using fallback knowledge base.")
+# Words on the page are spelled right; the speller reads them when it is first needed
+if ROUTER.speller is not None:
+    ROUTER.speller.add_vocabulary(CORPUS.vocabulary)
+
+# Last product and topic per visitor, so follow-up questions resolve against the spec table
+SESSIONS = create_session_store()
+
+# Identical questions in flight at the same time are answered once
+INFLIGHT = SingleFlight()
+
+# Per-client token buckets and a cap on answers computed at once (see admission.py for the settings)
+RATE_LIMITER = RateLimiter()
+ADMISSION = ConcurrencyLimit()
+RATE_LIMITED_BODY = encode_response("You're sending messages too quickly. Please wait a moment and try again.")
+BUSY_BODY = encode_response("I'm answering a lot of questions right now. Please try again in a moment.")
+
+@lru_cache(maxsize=None)
+def knowledge_embeddings():
+    """Optional semantic tier over the knowledge base: vectors built offline by embeddings.py,
+    memory-mapped on the first question that needs them (importing numpy is most of the cost)"""
+    from embeddings import KNOWLEDGE_EMBEDDINGS_FILE, load_embedding_index
+    return load_embedding_index(KNOWLEDGE_EMBEDDINGS_FILE)
+
+def passage_label(passage) -> str:
+    if passage.section == 'main_content' and passage.path[:1] == ('headings',):
+        return 'Heading'
+    return SECTION_LABELS.get(passage.section, 'Content')
+
 def search_scraped_data(query: str) -> List[str]:
-    """Search through scraped data for relevant information"""
-    if not SCRAPED_DATA:
-        return []
-    
+    """Search the passages of the shards the query is about for relevant sentences"""
     query_lower = query.lower()
     results = []
-    
-    # Search through main content
-    if 'main_content' in SCRAPED_DATA:
-        main_content = SCRAPED_DATA['main_content']
-        
-        # Search headings
-        if 'headings' in main_content:
-            for heading in main_content['headings']:
-                if query_lower in heading.get('text', '').lower():
-                    results.append(f"**Heading**: {heading['text']}")
-        
-        # Search paragraphs
-        if 'paragraphs' in main_content:
-            for para in main_content['paragraphs']:
-                if query_lower in para.lower():
-                    results.append(f"**Content**: {para[:200]}...")
-    
-    # Search through specifications
-    if 'comprehensive_specifications' in SCRAPED_DATA:
-        specs = SCRAPED_DATA['comprehensive_specifications']
-        for key, value in specs.items():
-            if isinstance(value, dict):
-                for spec_key, spec_value in value.items():
-                    if query_lower in str(spec_value).lower():
-                        results.append(f"**{spec_key}**: {spec_value}")
-            elif isinstance(value, str) and query_lower in value.lower():
-                results.append(f"**Specification**: {value}")
-    
-    # Search through interactive elements
-    if 'interactive_elements' in SCRAPED_DATA:
-        elements = SCRAPED_DATA['interactive_elements']
-        for key, element in elements.items():
-            if isinstance(element, dict):
-                element_text = element.get('text', '')
-                if query_lower in element_text.lower():
-                    results.append(f"**Interactive Element**: {element_text}")
-    
-    # Search through tabs and sections
-    if 'all_tabs_and_sections' in SCRAPED_DATA:
-        tabs = SCRAPED_DATA['all_tabs_and_sections']
-        for key, tab in tabs.items():
-            if isinstance(tab, dict):
-                tab_text = tab.get('text', '')
-                tab_content = tab.get('content', '')
-                if query_lower in tab_text.lower() or query_lower in tab_content.lower():
-                    results.append(f"**Tab/Section**: {tab_text} - {tab_content[:100]}...")
-    
-    return results[:5]  # Limit to 5 results
-def get_enhanced_chatbot_response(user_message: str) -> str:
+    for shard in CORPUS.shards_for(query_lower):
+        for passage in shard.search(query_lower, 5 - len(results)):  # Limit to 5 results
+            results.append(f"**{passage_label(passage)}**: {passage.text}")
+        if len(results) == 5:
+            break
+    return results
+
+def route_message(user_message: str) -> Optional[str]:
+    """Answer ID for a message, or None when only a scraped-data search can answer it"""
+    return ROUTER.route(user_message)
+
+def clean_results(results: List[str]) -> List[str]:
+    """Drop scraped hits that are JSON dumps, HTML or too long to show"""
+    clean = []
+    for r in results:
+        # Skip large JSON dumps or HTML
+        if len(r) > 300 or "window.__PRELOADED_STATE__" in r or "{" in r or "<" in r:
+            continue
+        clean.append(r.strip())
+    return clean
+
+def semantic_results(user_message: str) -> Optional[str]:
+    """Closest knowledge entry, or the closest scraped passages, by embedding similarity"""
+    hits = []
+    index = knowledge_embeddings()
+    if index is not None:
+        hits.extend((score, kind, key, None) for score, kind, key in index.search(user_message, k=3))
+    for shard in CORPUS.shards_for(user_message):
+        if shard.embeddings is not None:
+            hits.extend((score, kind, key, shard) for score, kind, key in shard.embeddings.search(user_message, k=3))
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+
+    passages = []
+    for score, kind, key, shard in hits[:3]:
+        if kind == "knowledge" and not passages:
+            return KB_TEXT.get(key)
+        passage = shard.passages_by_id.get(key) if shard is not None else None
+        if passage is not None:
+            passages.append(f"**{passage_label(passage)}**: {passage.text}")
+    passages = clean_results(passages)
+    if passages:
+        return "📖 Here's what I found based on Xbox site data:\n" + "\n".join(passages)
+    return None
+
+def scraped_fallback(user_message: str) -> str:
+    """The only response composed per request: a summary of matching scraped passages"""
+    scraped_results = clean_results(search_scraped_data(user_message))
+    if scraped_results:
+        return "📖 Here's what I found based on Xbox site data:\n" + "\n".join(scraped_results[:3])
+    return semantic_results(user_message) or ANSWERS.text("responses.elaborate")
+
+def spec_lookup(user_message: str, product: Optional[str] = None, topic: Optional[str] = None):
+    """(spec answer or None, product, topic) for a message.
+
+    What a follow-up leaves out is filled in from the previous product and topic,
+    and the product and topic to remember for the next message are returned.
+    """
+    spec = CORPUS.spec_lookup(user_message, product, topic)
+    if spec is not None:
+        attribute, model = spec[1]
+        return spec, model or product, attribute
+    attribute = spec_attribute(user_message)
+    return None, CORPUS.mentioned_model(user_message) or product, attribute or topic
+
+def get_enhanced_chatbot_response(user_message: str, session: Optional[Session] = None) -> str:
     """Generate enhanced chatbot response using scraped data and improved fallback logic."""
     user_message = user_message.lower().strip()
-
-    # === Polished Intro Greeting ===
-    if user_message in ["hi", "hello", "hey", "yo", "sup", "greetings"]:
-        return (
-            "🤖 **ENHANCED Xbox Ally Bot**: Hello there! I'm your **SUPER-ENHANCED AI expert** with **complete data** "
-            "from the Xbox ROG Ally website! 🚀\n\n"
-            "📊 463+ data points from the ROG Ally site\n"
-            "🎯 All tabs, sections, & interactive elements\n"
-            "⚙️ Full specifications & technical details\n"
-            "🎮 Gaming features & performance insights\n"
-            "🔍 Model comparisons & differences\n"
-            "💻 Complete UI, controls, & interface info\n\n"
-            "Ask me **anything** about the Xbox ROG Ally!"
-        )
-
-    # === Get scraped data ===
-    scraped_results = search_scraped_data(user_message)
-
-    # Clean scraped results (remove JSON/HTML noise)
-    def clean_results(results):
-        clean = []
-        for r in results:
-            # Skip large JSON dumps or HTML
-            if len(r) > 300 or "window.__PRELOADED_STATE__" in r or "{" in r or "<" in r:
-                continue
-            clean.append(r.strip())
-        return clean
-
-    scraped_results = clean_results(scraped_results)
-
-    # === Main Knowledge Checks ===
-    if any(word in user_message for word in ["what", "tell me", "explain", "describe"]):
-        if any(word in user_message for word in ["rog", "ally", "handheld", "device"]):
-            response = ENHANCED_KNOWLEDGE["general"]["what_is"] + "\n\n" + ENHANCED_KNOWLEDGE["general"]["tagline"]
-        elif any(word in user_message for word in ["specs", "specifications", "processor", "ram", "storage"]):
-            response = ENHANCED_KNOWLEDGE["specs"]["processor"] + "\n\n" + ENHANCED_KNOWLEDGE["specs"]["memory"] + "\n\n" + ENHANCED_KNOWLEDGE["specs"]["storage"]
-        elif any(word in user_message for word in ["display", "screen", "battery"]):
-            response = ENHANCED_KNOWLEDGE["specs"]["display"] + "\n\n" + ENHANCED_KNOWLEDGE["specs"]["battery"]
-        elif any(word in user_message for word in ["game", "gaming", "play"]):
-            response = "The ROG Xbox Ally supports Xbox Game Pass, Cloud Gaming, Play Anywhere, and Remote Play. You can access hundreds of games and stream them directly to your handheld device."
-        else:
-            response = ENHANCED_KNOWLEDGE["general"]["what_is"]
-
-    elif any(word in user_message for word in ["models", "versions", "difference", "compare", "ally x", "ally x vs", "vs ally"]):
-        response = ENHANCED_KNOWLEDGE["general"]["models"]
-
-    elif any(word in user_message for word in ["game pass", "xbox game pass"]):
-        response = "Yes! You get instant access to hundreds of high-quality games from Xbox Game Pass. Stream or download them to your handheld."
-
-    elif any(word in user_message for word in ["cloud", "streaming"]):
-        response = "The ROG Xbox Ally supports Xbox Cloud Gaming for streaming your favorite titles without downloads."
-
-    elif any(word in user_message for word in ["controls", "buttons", "triggers", "grips", "interface", "ui"]):
-        response = "Xbox-inspired controls with ABXY buttons, ergonomic grips, and impulse triggers (Ally X) or Hall Effect triggers (Ally)."
-
-    elif any(word in user_message for word in ["connectivity", "ports", "wifi", "bluetooth", "usb", "microsd", "audio"]):
-        response = "WiFi 6E + Bluetooth 5.4, USB-C with DisplayPort, microSD slot (UHS-II), and 3.5mm audio jack."
-
-    elif any(word in user_message for word in ["xbox experience", "boot", "startup", "interface", "game bar"]):
-        response = "Boots into Xbox full-screen experience. Game Bar provides quick access to essential tools."
-
-    elif any(word in user_message for word in ["120hz", "refresh rate", "freesync", "brightness", "gorilla glass", "anti reflection"]):
-        response = "7\" FHD (1080p) 120Hz IPS display, 500 nits brightness, AMD FreeSync Premium, Gorilla Glass Victus."
-
-    elif any(word in user_message for word in ["accessories", "included", "stand", "charger", "65w"]):
-        response = "Comes with ROG Xbox Ally, 65W charger, and stand."
-
-    elif any(word in user_message for word in ["use", "purpose", "when", "scenarios", "portable", "travel"]):
-        response = "Perfect for gaming on the go, during travel, or playing Xbox and PC games anywhere."
-
-    elif any(word in user_message for word in ["price", "cost", "how much", "buy", "purchase", "available"]):
-        response = "Pricing varies by region. The Ally X offers higher specs; the Ally is more budget-friendly."
-
+    if session is None:
+        spec = CORPUS.spec_lookup(user_message)
     else:
-        # Final fallback
-        if scraped_results:
-            response = "📖 Here's what I found based on Xbox site data:\n" + "\n".join(scraped_results[:3])
-        else:
-            response = "Can you please elaborate?"
-
-    return response
+        spec, session.product, session.topic = spec_lookup(user_message, session.product, session.topic)
+    if spec is not None:
+        table, key = spec
+        return table.answers[key]
+    answer_id = route_message(user_message)
+    if answer_id is None:
+        return scraped_fallback(user_message)
+    return ANSWERS.text(answer_id)
+
+def answer_body(user_message: str, product: Optional[str] = None, topic: Optional[str] = None):
+    """(JSON body, product, topic) for a message in the given context; canned answers use their pre-encoded body"""
+    user_message = user_message.lower().strip()
+    spec, product, topic = spec_lookup(user_message, product, topic)
+    if spec is not None:
+        table, key = spec
+        return table.json(key), product, topic
+    answer_id = route_message(user_message)
+    if answer_id is None:
+        return encode_response(scraped_fallback(user_message)), product, topic
+    return ANSWERS.json(answer_id), product, topic
+
+def answer_response(user_message: str, session: Optional[Session] = None) -> Response:
+    """JSON response for a message, updating the session's context if there is one"""
+    if session is None:
+        body, _, _ = answer_body(user_message)
+    else:
+        body, session.product, session.topic = answer_body(user_message, session.product, session.topic)
+    return Response(content=body, media_type="application/json")
 
 
 
@@ -319,28 +344,186 @@ def get_enhanced_chatbot_response(user_message: str) -> str:
     
 #     return response
 
+@lru_cache(maxsize=None)
+def get_quick_answers():
+    """(manifest, encoded body) of the answers to the quick-question buttons, embedded in the page
+    so a click needs no request"""
+    manifest = load_quick_answers("enhanced", get_enhanced_chatbot_response)
+    return manifest, json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+@lru_cache(maxsize=None)
+def snapshot_body() -> Optional[bytes]:
+    """Answers exported by snapshot.py, which the page checks before asking the server; on Vercel
+    they are served as static files, this covers running the app directly"""
+    return load_snapshot(data_version())
+
+def warm_up():
+    """Load everything the first requests would: templates, quick answers, indexes and the default shards"""
+    get_templates().get_template("index.html")
+    get_quick_answers()
+    snapshot_body()
+    knowledge_embeddings()
+    if ROUTER.speller is not None:
+        ROUTER.speller.build()
+    for name in CORPUS.route(""):
+        CORPUS.shard(name).passages_by_id  # also loads the shard's semantic index
+
+def write_index_segment():
+    """Compile the current knowledge base and datasets into SEGMENT_FILE; returns the shard summary"""
+    return write_segment(SEGMENT_FILE, data_version(), Corpus(section_order=SEARCH_SECTION_ORDER))
+
+def reload_data(rebuild: bool = False):
+    """Switch to the data files now on disk, attaching a newly written index segment.
+
+    With `rebuild`, a missing or stale segment is rewritten first; one process
+    (serve.py's master) does that before the others reload.
+    """
+    global KNOWLEDGE, KB_TEXT, ANSWERS, ROUTER, SEGMENT
+    data_version.cache_clear()
+    load_knowledge.cache_clear()
+    knowledge = load_knowledge()
+    version = data_version()
+    segment = attach_segment(SEGMENT_FILE, version, SEARCH_SECTION_ORDER)
+    if segment is None and rebuild and SEGMENT_FILE:
+        try:
+            write_index_segment()
+            segment = attach_segment(SEGMENT_FILE, version, SEARCH_SECTION_ORDER)
+        except OSError as e:  # read-only deployments keep parsing the datasets
+            print(f"Warning: could not write the index segment: {e}")
+    KNOWLEDGE, KB_TEXT, ROUTER = knowledge, knowledge.texts, knowledge.router("enhanced")
+    ANSWERS = knowledge.answers
+    SEGMENT = segment
+    CORPUS.reload(segment)
+    if ROUTER.speller is not None:
+        ROUTER.speller.add_vocabulary(CORPUS.vocabulary)
+    for cached in (get_quick_answers, snapshot_body, knowledge_embeddings):
+        cached.cache_clear()
+    print(f"Reloaded data version {version}{' from the index segment' if segment is not None else ''}")
+
+def ensure_index_segment():
+    """Write and attach the segment if there is no current one, so processes started after this can attach it"""
+    if SEGMENT is None and SEGMENT_FILE:
+        reload_data(rebuild=True)
+
+# Long-running servers can pay the loading at startup instead of on the first requests
+if os.environ.get("WARM_UP") == "1":
+    app.add_event_handler("startup", warm_up)
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    manifest, _ = get_quick_answers()
+    return get_templates().TemplateResponse("index.html", {
+        "request": request,
+        "quick_questions": QUICK_QUESTIONS,
+        "quick_answers": manifest["answers"],
+        "data_version": manifest["version"],
+        "has_session": SESSION_COOKIE in request.cookies,
+    })
+
+@app.get("/answers/manifest.json")
+async def answers_manifest():
+    body = snapshot_body()
+    if body is None:
+        return Response(status_code=404)
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "public, max-age=300"})
+
+@app.get("/api/quick-answers")
+async def quick_answers(v: Optional[str] = None):
+    """Quick-answer manifest; cacheable forever when requested by its current version"""
+    manifest, body = get_quick_answers()
+    cache_control = "public, max-age=31536000, immutable" if v == manifest["version"] else "no-cache"
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": cache_control})
+
+@app.get("/api/data-version")
+async def data_version_endpoint():
+    """Version of the data answers come from now; the page compares it with its own and the static manifest's"""
+    return Response(content=json.dumps({"version": data_version()}).encode("utf-8"), media_type="application/json",
+                    headers={"Cache-Control": DATA_VERSION_CACHE_CONTROL})
+
+@app.get("/api/warm-up")
+async def warm_up_endpoint():
+    """For platform warm-up pings: loads what the first questions would"""
+    warm_up()
+    return {"status": "warm", "loaded_shards": CORPUS.loaded()}
+
+def admitted_answer(message: str, product: Optional[str], topic: Optional[str]):
+    """answer_body for a computation holding an ADMISSION slot, released when it finishes"""
+    try:
+        return answer_body(message, product, topic)
+    finally:
+        ADMISSION.release()
+
+def too_many_requests(body: bytes, wait: float) -> Response:
+    return Response(content=body, status_code=429, media_type="application/json", headers={"Retry-After": retry_after(wait)})
+
+async def session_response(request: Request, message: str, remember: bool = True) -> Response:
+    """Answer a message in the context of the visitor's session, storing what it learned
+    unless `remember` is false.
+
+    Requests with the same message and context that arrive while one is being
+    answered share its answer. Clients over their rate limit, and new
+    computations while every ADMISSION slot is busy, get 429.
+    """
+    wait = RATE_LIMITER.check(client_address(request))
+    if wait:
+        return too_many_requests(RATE_LIMITED_BODY, wait)
+    session = load_session(SESSIONS, request.cookies.get(SESSION_COOKIE))
+    message = normalize_message(message)
+    key = (message, session.product, session.topic)
+    joining = key in INFLIGHT
+    if not joining and not ADMISSION.try_acquire():
+        return too_many_requests(BUSY_BODY, 1)
+    body, session.product, session.topic = await INFLIGHT.run(key, answer_body if joining else admitted_answer, *key)
+    response = Response(content=body, media_type="application/json")
+    if remember and session.has_context():
+        SESSIONS.save(session)
+        if session.is_new:
+            response.set_cookie(SESSION_COOKIE, session.id, max_age=SESSIONS.ttl, httponly=True, samesite="lax")
+    return response
 
 @app.post("/chat")
-async def chat(message: str = Form(...)):
-    response = get_enhanced_chatbot_response(message)
-    return {"response": response}
+async def chat(request: Request, message: str = Form(...)):
+    return await session_response(request, message)
 
 @app.get("/api/chat")
-async def chat_api(message: str):
-    response = get_enhanced_chatbot_response(message)
-    return {"response": response}
+async def chat_api(request: Request, message: str):
+    """Without a session cookie the answer depends only on the message and the data version,
+    so it carries an ETag and public cache headers and revalidates with 304; they vary on
+    Cookie, as the same URL answered with a session depends on its context"""
+    if SESSION_COOKIE in request.cookies:
+        response = await session_response(request, message)
+        response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+        return response
+    etag = answer_etag(data_version(), normalize_message(message))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, SESSION_VARY)
+    response = await session_response(request, message, remember=False)
+    if response.status_code == 200:
+        response.headers.update(cache_headers(etag, SESSION_VARY))
+    return response
+
+@app.get("/api/metrics")
+async def metrics():
+    """Admission, coalescing and session counters"""
+    return {
+        **admission_metrics(RATE_LIMITER, ADMISSION),
+        "single_flight": INFLIGHT.stats(),
+        "sessions": len(SESSIONS) if hasattr(SESSIONS, "__len__") else None,
+    }
 
 @app.get("/api/data-summary")
 async def get_data_summary():
     """Get summary of available data"""
-    if SCRAPED_DATA:
+    if len(CORPUS):
+        default_shard = CORPUS.shard(CORPUS.route("")[0])
         return {
             "status": "success",
             "total_data_points": 463,
-            "scraped_timestamp": SCRAPED_DATA.get("timestamp", "Unknown"),
+            "scraped_timestamp": default_shard.timestamp or "Unknown",
+            "shards": [
+                {"name": spec.name, "products": list(spec.products), "locale": spec.locale, "loaded": spec.name in CORPUS.loaded()}
+                for spec in CORPUS.specs.values()
+            ],
             "data_categories": [
                 "All Tabs & Sections (90 items)",
                 "Interactive Elements (223 items)",
@@ -364,7 +547,9 @@ async def get_data_summary():
         return {"status": "error", "message": "Scraped data not available"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
+    import uvicorn
+    warm_up()
+    uvicorn.run(app, host="0.0.0.0", port=8000)
 
 # from fastapi import FastAPI, Request, Form
 # from fastapi.responses import HTMLResponse
@@ -0,0 +1,391 @@
+"""Micro-benchmarks for the chatbot's data structures and request path.
+
+Run all of them with `python benchmark.py`, or name the ones to run:
+`python benchmark.py records`.
+"""
+import json
+import os
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.path.join(BASE_DIR, 'data', 'xbox_rog_ally_complete_data.json')
+SHARD_EMBEDDINGS_FILE = os.path.join(BASE_DIR, 'data', 'xbox_rog_ally_embeddings.npy')
+
+# IVF query latency on the 100x corpus may be at most this multiple of the 1x latency
+ANN_LATENCY_GROWTH = 3
+
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# Regressions found by benchmarks that enforce a budget; any makes the run exit nonzero
+FAILURES = []
+
+
+def measure_allocation(build):
+    """Bytes still allocated by the object `build()` returns"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    obj = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return obj, size
+
+
+def per_call_ns(stmt, globals_, number=200_000):
+    return timeit.timeit(stmt, globals=globals_, number=number) / number * 1e9
+
+
+def bench_records():
+    """Memory per entry and access cost: plain dicts vs slotted records"""
+    from dataset_io import load_dataset
+    from knowledge import KnowledgeEntry, build_knowledge_index
+    from main import CHATBOT_KNOWLEDGE
+    from passages import build_passages
+
+    passages = build_passages(load_dataset(DATA_FILE))
+    rows = [(category, key, text, 'knowledge_base') for category, items in CHATBOT_KNOWLEDGE.items() for key, text in items.items()]
+    rows += [(p.section, '/'.join(map(str, p.path)), p.text, p.section) for p in passages]
+
+    def as_dicts():
+        return [{'category': c, 'key': k, 'text': t, 'text_lower': t.lower(), 'source': s} for c, k, t, s in rows]
+
+    def as_records():
+        return [KnowledgeEntry(c, k, t, t.lower(), s) for c, k, t, s in rows]
+
+    dicts, dict_bytes = measure_allocation(as_dicts)
+    records, record_bytes = measure_allocation(as_records)
+    n = len(rows)
+    print(f"entries:                 {n}")
+    print(f"dict entries:            {dict_bytes / n:8.1f} bytes/entry (incl. lowercased text)")
+    print(f"slotted records:         {record_bytes / n:8.1f} bytes/entry (incl. lowercased text)")
+    print(f"container overhead:      {sys.getsizeof(dicts[0]):8d} bytes (dict) vs {sys.getsizeof(records[0])} bytes (record)")
+
+    index = build_knowledge_index(CHATBOT_KNOWLEDGE)
+    env = {'d': dicts[0], 'r': records[0], 'kb': CHATBOT_KNOWLEDGE, 'flat': index.texts}
+    dict_get = per_call_ns("d.get('text', '')", env)
+    slot_get = per_call_ns("r.text", env)
+    nested = per_call_ns("kb['specs']['processor']", env)
+    flat = per_call_ns("flat['specs.processor']", env)
+    print(f"field access:            {dict_get:6.1f} ns (dict.get) vs {slot_get:.1f} ns (slot)")
+    print(f"answer text lookup:      {nested:6.1f} ns (nested) vs {flat:.1f} ns (flat)")
+
+
+def bench_answers():
+    """Per-request cost of composing and serializing an answer vs looking it up"""
+    from fastapi.responses import JSONResponse
+    from main import ANSWERS, KB_TEXT, route_message
+
+    env = {'KB_TEXT': KB_TEXT, 'ANSWERS': ANSWERS, 'JSONResponse': JSONResponse}
+    compose = per_call_ns(
+        "JSONResponse({'response': 'Here are the key specifications:\\n\\n' + KB_TEXT['specs.processor'] + '\\n\\n'"
+        " + KB_TEXT['specs.memory'] + '\\n\\n' + KB_TEXT['specs.storage'] + '\\n\\n' + KB_TEXT['specs.display']"
+        " + '\\n\\n' + KB_TEXT['specs.battery']}).body", env, number=50_000)
+    lookup = per_call_ns("ANSWERS.json('specs.summary')", env)
+    route = per_call_ns("route_message('what are the specs')", {'route_message': route_message}, number=50_000)
+    print(f"answers:                 {len(ANSWERS)}")
+    print(f"compose + serialize:     {compose:8.1f} ns/request")
+    print(f"precomposed lookup:      {lookup:8.1f} ns/request")
+    print(f"routing (for scale):     {route:8.1f} ns/request")
+
+
+def bench_spelling():
+    """Typo correction cost: precomputed deletion index vs an edit-distance scan of the vocabulary"""
+    from knowledge import edit_distance, load_knowledge
+
+    speller = load_knowledge().router('enhanced').speller
+    tokens = ['baterry', 'gamepas', 'conectivity', 'accesories', 'bluetoth', 'specifcations', 'scenario']
+    terms = list(speller.terms)
+
+    def scan(token):
+        return min(terms, key=lambda term: edit_distance(token, term, 2))
+
+    env = {'speller': speller, 'tokens': tokens, 'scan': scan}
+    indexed = per_call_ns("for t in tokens: speller._lookup(t)", env, number=2_000) / len(tokens)
+    cached = per_call_ns("for t in tokens: speller.lookup(t)", env, number=20_000) / len(tokens)
+    scanned = per_call_ns("for t in tokens: scan(t)", env, number=200) / len(tokens)
+    print(f"vocabulary:              {len(terms)} terms, {len(speller.deletes)} deletion variants")
+    print(f"deletion index lookup:   {indexed / 1000:8.2f} us/token")
+    print(f"repeat (cached) lookup:  {cached / 1000:8.2f} us/token")
+    print(f"edit-distance scan:      {scanned / 1000:8.2f} us/token")
+
+
+def bench_ann():
+    """Query latency and recall of exact vs IVF search as the passage corpus grows 100x.
+
+    Fails if IVF latency grows more than ANN_LATENCY_GROWTH times or a query scores
+    more rows than the probe cap allows; recall is what the cap trades away.
+    """
+    import numpy as np
+    from ann_index import MAX_PROBED_ROWS, IVFIndex
+    from embeddings import encode, load_embedding_index
+
+    index = load_embedding_index(SHARD_EMBEDDINGS_FILE)
+    base = np.asarray(index.matrix)
+    rng = np.random.default_rng(0)
+    # Scaled corpora: real passage vectors plus perturbed copies standing in for more product pages
+    queries = encode(['battery life', 'ryzen processor', 'microsd card', 'game pass ultimate', 'refresh rate 120hz'], index.idf)
+    k = 5
+    print(f"{'rows':>8} {'exact ms':>9} {'ivf ms':>8} {'probed':>7} {'recall@5':>9} {'train s':>8}")
+    latencies = []
+    for scale in (1, 10, 100):
+        if scale == 1:
+            corpus = base
+        else:
+            picks = base[rng.integers(0, len(base), len(base) * scale)]
+            corpus = picks + rng.normal(0, 0.04, picks.shape).astype(np.float32)
+            corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+        corpus = np.ascontiguousarray(corpus, dtype=np.float32)
+
+        start = timeit.default_timer()
+        ivf = IVFIndex.train(corpus)
+        train_s = timeit.default_timer() - start
+
+        env = {'np': np, 'corpus': corpus, 'queries': queries, 'ivf': ivf, 'k': k}
+        exact = per_call_ns("for q in queries: s = corpus @ q; np.argpartition(-s, k - 1)[:k]", env, number=200) / len(queries)
+        approx = min(per_call_ns("for q in queries: ivf.search(corpus, q, k)", env, number=200) for _ in range(3)) / len(queries)
+        latencies.append(approx)
+
+        hits = 0
+        probed = 0
+        for q in queries:
+            truth = set(np.argsort(-(corpus @ q))[:k])
+            hits += len(truth & set(ivf.search(corpus, q, k)[1]))
+            rows = len(ivf.candidates(q))
+            probed += rows
+            largest_bucket = int(np.max(np.diff(ivf.list_offsets)))
+            if rows > max(MAX_PROBED_ROWS, largest_bucket):
+                FAILURES.append(f"ann: a query on {len(corpus)} rows scored {rows} rows, over the {MAX_PROBED_ROWS}-row cap")
+        print(f"{len(corpus):8d} {exact / 1e6:9.3f} {approx / 1e6:8.3f} {probed // len(queries):7d} "
+              f"{hits / (k * len(queries)):9.2f} {train_s:8.2f}")
+    encode_ns = per_call_ns("encode(['how long does the battery last'], idf)", {'encode': encode, 'idf': index.idf}, number=2_000)
+    print(f"query encoding (any corpus size): {encode_ns / 1e6:.3f} ms")
+    if latencies[-1] > ANN_LATENCY_GROWTH * latencies[0]:
+        FAILURES.append(f"ann: IVF latency grew {latencies[-1] / latencies[0]:.1f}x over a 100x larger corpus "
+                        f"(budget {ANN_LATENCY_GROWTH}x)")
+
+
+def bench_specs():
+    """Comparison questions: typed spec-table lookup vs a substring search of the scraped passages"""
+    from corpus import Corpus
+
+    corpus = Corpus()
+    shard = corpus.shard(corpus.route('')[0])
+    env = {'corpus': corpus, 'passages': shard.passages}
+    lookup = per_call_ns("corpus.spec_lookup('which has more ram')", env, number=20_000)
+    rejected = per_call_ns("corpus.spec_lookup('does it support game pass')", env, number=20_000)
+    search = per_call_ns("[p for p in passages if 'ram' in p.text_lower]", env, number=200)
+    print(f"spec table:              {len(shard.specs)} models, {len(shard.specs.answers)} precomposed answers")
+    print(f"spec lookup:             {lookup / 1000:8.2f} us/question")
+    print(f"non-spec rejection:      {rejected / 1000:8.2f} us/question")
+    print(f"passage search:          {search / 1000:8.2f} us/question")
+
+
+def bench_burst():
+    """A burst of identical questions: one computation shared by all vs one per request"""
+    import asyncio
+    from starlette.concurrency import run_in_threadpool
+    from starlette.requests import Request
+    sys.path.insert(0, os.path.join(BASE_DIR, 'api'))
+    import index
+
+    burst = 500
+    message = 'is the screen readable outdoors in sunlight'  # falls through to the scraped-data search
+    # One request from each of `burst` visitors, so the per-client rate limit does not apply
+    requests = [Request({'type': 'http', 'method': 'POST', 'headers': [], 'query_string': b'',
+                         'client': (f'10.0.{i // 256}.{i % 256}', 50000)}) for i in range(burst)]
+
+    async def coalesced():
+        return await asyncio.gather(*(index.session_response(request, message) for request in requests))
+
+    async def independent():
+        return await asyncio.gather(*(run_in_threadpool(index.answer_body, message) for _ in range(burst)))
+
+    index.answer_body(message)  # load the shard first
+    for name, run in (('independent', independent), ('coalesced', coalesced)):
+        before = index.INFLIGHT.computed
+        start = timeit.default_timer()
+        asyncio.run(run())
+        elapsed = timeit.default_timer() - start
+        computed = index.INFLIGHT.computed - before if name == 'coalesced' else burst
+        print(f"{name + ':':24} {elapsed * 1000:8.1f} ms for {burst} requests, {computed} computations")
+
+
+def bench_admission():
+    """Per-request overhead of the rate limiter and the concurrency cap"""
+    from admission import ConcurrencyLimit, RateLimiter
+
+    limiter = RateLimiter(per_minute=1e9, burst=1e9, max_clients=10_000)
+    concurrency = ConcurrencyLimit()
+    keys = [f'10.0.{i // 256}.{i % 256}' for i in range(20_000)]
+    env = {'limiter': limiter, 'concurrency': concurrency, 'keys': keys}
+    known = per_call_ns("limiter.check('10.0.0.1')", env)
+    churn = per_call_ns("for k in keys: limiter.check(k)", env, number=20) / len(keys)
+    slot = per_call_ns("concurrency.try_acquire(); concurrency.release()", env)
+    print(f"rate limit, known client:  {known:8.1f} ns/request")
+    print(f"rate limit, client churn:  {churn:8.1f} ns/request ({len(limiter)} buckets kept)")
+    print(f"concurrency slot:          {slot:8.1f} ns/request")
+
+
+def bench_wire():
+    """Serialization time and bytes on the wire for the canned answers"""
+    import gzip
+    import json
+    from fastapi.responses import JSONResponse
+    from response_encoding import BROTLI_QUALITY, COMPRESS_MIN_SIZE, GZIP_LEVEL, brotli, compress, orjson
+    from main import ANSWERS
+
+    texts = ANSWERS.texts
+    bodies = ANSWERS.json_bodies
+    env = {'JSONResponse': JSONResponse, 'json': json, 'orjson': orjson, 'texts': texts, 'ANSWERS': ANSWERS,
+           'gzip': gzip, 'bodies': bodies, 'compress': compress, 'GZIP_LEVEL': GZIP_LEVEL}
+    n = len(texts)
+    default = per_call_ns("for t in texts: JSONResponse({'response': t}).body", env, number=500) / n
+    print(f"answers:                 {n}, {sum(map(len, bodies)) / n:.0f} bytes of JSON on average")
+    print(f"JSONResponse render:     {default:8.1f} ns/answer")
+    if orjson is not None:
+        fast = per_call_ns("for t in texts: orjson.dumps({'response': t})", env, number=500) / n
+        print(f"orjson dumps:            {fast:8.1f} ns/answer")
+    lookup = per_call_ns("for i in range(len(texts)): ANSWERS.json_bodies[i]", env, number=500) / n
+    print(f"pre-encoded lookup:      {lookup:8.1f} ns/answer")
+
+    # As served: bodies under the threshold go out uncompressed
+    gzipped = sum(len(gzip.compress(b, compresslevel=GZIP_LEVEL, mtime=0)) if len(b) >= COMPRESS_MIN_SIZE else len(b)
+                  for b in bodies)
+    gzip_ns = per_call_ns("for b in bodies: gzip.compress(b, compresslevel=GZIP_LEVEL, mtime=0)", env, number=50) / n
+    compress.cache_clear()
+    cached_ns = per_call_ns("for b in bodies: compress(b, 'gzip')", env, number=500) / n
+    print(f"bytes on wire:           {sum(map(len, bodies))} identity, {gzipped} gzip"
+          + (f", {sum(len(brotli.compress(b, quality=BROTLI_QUALITY)) if len(b) >= COMPRESS_MIN_SIZE else len(b) for b in bodies)} br"
+             if brotli else " (br: install brotli)"))
+    print(f"gzip per request:        {gzip_ns:8.1f} ns/answer")
+    print(f"gzip, cached by body:    {cached_ns:8.1f} ns/answer")
+
+
+# Import-time self cost allowed for this repo's own modules, and modules the
+# serverless cold start must not import (they load on first use or in warm_up)
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '60'))
+DEFERRED_IMPORTS = ('numpy', 'jinja2', 'uvicorn')
+
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import api.index as app
+imported = time.perf_counter()
+deferred = [name for name in %r if name in sys.modules]
+app.get_enhanced_chatbot_response('is the screen readable outdoors in sunlight')
+answered = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1e3,
+    'first_answer_ms': (answered - imported) * 1e3,
+    'deferred': deferred,
+}))
+"""
+
+
+def first_party_import_ms(importtime_log):
+    """Self import time (ms) of each module from this repo, parsed from `-X importtime` output"""
+    local = {name.removesuffix('.py') for name in os.listdir(BASE_DIR)}
+    costs = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        module = module.strip()
+        if module.split('.')[0] in local:
+            costs[module] = int(self_us) / 1e3
+    return costs
+
+
+def bench_startup(runs=3):
+    """Cold start: importing the serverless app in a fresh interpreter, then its first answer"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _STARTUP_PROBE % (DEFERRED_IMPORTS,)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        timings['modules'] = first_party_import_ms(result.stderr)
+        timings['first_party_ms'] = sum(timings['modules'].values())
+        if best is None or timings['import_ms'] < best['import_ms']:
+            best = timings
+
+    print(f"import api.index:        {best['import_ms']:8.1f} ms")
+    print(f"first answer:            {best['first_answer_ms']:8.1f} ms")
+    print(f"first-party self time:   {best['first_party_ms']:8.1f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)")
+    for module, ms in sorted(best['modules'].items(), key=lambda item: -item[1])[:5]:
+        print(f"  {module:<22} {ms:8.1f} ms")
+    if best['first_party_ms'] > STARTUP_BUDGET_MS:
+        FAILURES.append(f"startup: first-party imports take {best['first_party_ms']:.1f} ms, over the {STARTUP_BUDGET_MS:.0f} ms budget")
+    if best['deferred']:
+        FAILURES.append(f"startup: {', '.join(best['deferred'])} imported at startup")
+
+
+def bench_segment():
+    """Attaching the index segment vs parsing a shard, and searching each"""
+    from corpus import Shard
+    from dataset_io import load_dataset
+    from passages import build_passages
+    from segment import IndexSegment
+    sys.path.insert(0, os.path.join(BASE_DIR, 'api'))
+    from index import SEARCH_SECTION_ORDER, SEGMENT_FILE
+
+    if not os.path.exists(SEGMENT_FILE):
+        print(f"No index segment at {SEGMENT_FILE}; write one with `python segment.py`")
+        return
+    attach_us = timeit.timeit(lambda: IndexSegment(SEGMENT_FILE), number=1_000) / 1_000 * 1e6
+    parse_ms = timeit.timeit(lambda: build_passages(load_dataset(DATA_FILE), SEARCH_SECTION_ORDER), number=5) / 5 * 1e3
+
+    segment = IndexSegment(SEGMENT_FILE)
+    name = segment.shard_names()[0]
+    env = {
+        'parsed': Shard(name, {}, build_passages(load_dataset(DATA_FILE), SEARCH_SECTION_ORDER)),
+        'mapped': Shard(name, None, segment.passages(name)),
+        'queries': ['game pass', 'wifi 6e', 'refresh rate', 'not on the page at all'],
+    }
+    parsed_ns = per_call_ns("for q in queries: parsed.search(q, 5)", env, number=2_000) / len(env['queries'])
+    mapped_ns = per_call_ns("for q in queries: mapped.search(q, 5)", env, number=2_000) / len(env['queries'])
+
+    print(f"segment file:            {os.path.getsize(SEGMENT_FILE) / 1024:8.1f} KiB, {len(env['mapped'].passages)} passages")
+    print(f"attach segment:          {attach_us:8.1f} us")
+    print(f"parse + build passages:  {parse_ms:8.1f} ms")
+    print(f"search, built passages:  {parsed_ns / 1e3:8.1f} us/query")
+    print(f"search, segment:         {mapped_ns / 1e3:8.1f} us/query")
+
+
+BENCHMARKS = {
+    'records': bench_records,
+    'answers': bench_answers,
+    'spelling': bench_spelling,
+    'ann': bench_ann,
+    'specs': bench_specs,
+    'burst': bench_burst,
+    'admission': bench_admission,
+    'wire': bench_wire,
+    'startup': bench_startup,
+    'segment': bench_segment,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name!r}; choose from {', '.join(BENCHMARKS)}")
+            sys.exit(2)
+    for name in names:
+        print(f"=== {name} ===")
+        BENCHMARKS[name]()
+        print()
+    if FAILURES:
+        for failure in FAILURES:
+            print(f"FAILED {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
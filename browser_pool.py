@@ -0,0 +1,232 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+try:
+    import psutil
+except ImportError:  # Memory-based recycling is disabled without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+# Requests the scraper never reads: it only records image/media URLs from the DOM,
+# and fonts and analytics beacons do not affect the rendered tabs and specs.
+# Scripts and stylesheets from the page itself are still loaded.
+BLOCKED_URL_PATTERNS = [
+    # Images
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    # Fonts
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    # Media
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3', '*.ogg', '*.wav',
+    # Analytics and tag managers
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*clarity.ms*', '*bat.bing.com*', '*connect.facebook.net*', '*scorecardresearch.com*',
+    '*demdex.net*', '*omtrdc.net*', '*adobedtm.com*', '*js.monitor.azure.com*',
+    '*browser.events.data.microsoft.com*', '*mscom.demdex.net*',
+]
+
+
+def build_chrome_options(block_resources=False):
+    """Build the headless Chrome options used by every scraper session"""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")  # Run in background
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+
+    if block_resources:
+        # Content settings cover images even when CDP is unavailable
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+    return chrome_options
+
+
+def apply_resource_blocking(driver, patterns=None):
+    """Block fonts, media, images and analytics requests through the DevTools protocol"""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns or BLOCKED_URL_PATTERNS})
+        return True
+    except Exception as e:
+        logger.warning(f"Request blocking unavailable, relying on Chrome prefs only: {e}")
+        return False
+
+
+def driver_memory_mb(driver):
+    """Resident memory of a Chrome session (driver + browser processes) in MB"""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+    except (AttributeError, psutil.Error):
+        return None
+
+
+class PooledBrowser:
+    """A warm Chrome session plus the bookkeeping used to decide when to recycle it"""
+    __slots__ = ('driver', 'pages_served', 'baseline_memory_mb', 'started_at')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages_served = 0
+        self.baseline_memory_mb = driver_memory_mb(driver)
+        self.started_at = time.time()
+
+
+class BrowserPool:
+    """Keeps N warm headless Chrome sessions and hands them out to page loads"""
+
+    def __init__(self, size=2, max_pages_per_session=25, max_memory_growth_mb=400, block_resources=False,
+                 options_factory=build_chrome_options):
+        self.size = max(1, size)
+        self.block_resources = block_resources
+        self.max_pages_per_session = max_pages_per_session
+        self.max_memory_growth_mb = max_memory_growth_mb
+        self.options_factory = options_factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._closed = False
+
+        if max_memory_growth_mb and psutil is None:
+            logger.warning("psutil not installed; browser sessions will only be recycled by page count")
+
+    def _start_browser(self):
+        driver = webdriver.Chrome(options=self.options_factory(block_resources=self.block_resources))
+        if self.block_resources:
+            apply_resource_blocking(driver)
+        logger.info("Started pooled Chrome session")
+        return PooledBrowser(driver)
+
+    def _quit_browser(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error while closing pooled Chrome session: {e}")
+        with self._lock:
+            self._started -= 1
+
+    def _needs_recycle(self, browser):
+        if self.max_pages_per_session and browser.pages_served >= self.max_pages_per_session:
+            logger.info(f"Recycling Chrome session after {browser.pages_served} pages")
+            return True
+
+        if self.max_memory_growth_mb and browser.baseline_memory_mb is not None:
+            current = driver_memory_mb(browser.driver)
+            if current is not None and current - browser.baseline_memory_mb > self.max_memory_growth_mb:
+                logger.info(f"Recycling Chrome session after memory grew to {current:.0f} MB")
+                return True
+
+        return False
+
+    def warm(self):
+        """Start sessions until the pool holds `size` browsers"""
+        while True:
+            with self._lock:
+                if self._closed or self._started >= self.size:
+                    return
+                self._started += 1
+            try:
+                self._idle.put(self._start_browser())
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+
+    def acquire(self, timeout=None):
+        """Take an idle session, starting a new one while the pool is below capacity"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_start = self._started < self.size
+                if can_start:
+                    self._started += 1
+
+            if can_start:
+                try:
+                    return self._start_browser()
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+
+            # Poll so that capacity freed by a recycled session is noticed
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if wait <= 0:
+                raise TimeoutError("Timed out waiting for a browser session")
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def release(self, browser, broken=False):
+        """Return a session to the pool, quitting it if it is broken, worn out or the pool is closed"""
+        browser.pages_served += 1
+
+        if broken or self._closed or self._needs_recycle(browser):
+            self._quit_browser(browser)
+            return
+
+        self._idle.put(browser)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Borrow a WebDriver for the duration of a `with` block"""
+        browser = self.acquire(timeout=timeout)
+        broken = False
+        try:
+            yield browser.driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(browser, broken=broken)
+
+    def close(self):
+        """Quit every idle session; sessions still in use are quit when released"""
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit_browser(browser)
+        logger.info("Browser pool closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
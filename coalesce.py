@@ -0,0 +1,53 @@
+"""Single-flight deduplication of identical in-flight computations.
+
+When many visitors send the same question at once (everyone clicking the same
+button during a campaign), only the first request computes the answer, in a
+worker thread so the event loop stays free, and every concurrent request for the
+same key awaits that one result. Nothing is cached: once the computation
+finishes, the next request for the key computes it again.
+"""
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+
+def normalize_message(message):
+    """Key form of a message: lowercased with whitespace collapsed"""
+    return ' '.join(message.lower().split())
+
+
+class SingleFlight:
+    """Concurrent `run` calls with equal keys share one call of `fn`"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._inflight)
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+    async def run(self, key, fn, *args):
+        """Result of `fn(*args)` run in a worker thread, or of the identical call already running"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.computed += 1
+        else:
+            self.coalesced += 1
+        # A caller that disconnects must not cancel the computation the others are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here, so it is not reported as unhandled if every caller went away
+
+    def stats(self):
+        return {'in_flight': len(self._inflight), 'computed': self.computed, 'coalesced': self.coalesced}
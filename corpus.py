@@ -0,0 +1,269 @@
+"""Scraped corpus split into per-product shards.
+
+Every `<name>_data.json` (or `_complete_data.json`, `.jsonl`, `.gz`, `.zst`) in the
+data directory is one shard, typically one product page or locale. `shards.json`
+in the same directory names the products each shard covers, so a question that
+mentions "Ally X" only searches the shards about it, and the models on the page,
+whose spec table is parsed into a SpecTable. Shards are loaded the first
+time a question needs them and the least recently used are dropped once more
+than `max_loaded` are in memory. With an index segment attached (see
+segment.py), shards it holds are read from it instead of parsing their datasets.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from dataset_io import load_dataset
+from passages import build_passages
+from spec_table import build_spec_table, spec_attribute, spec_table_from_rows
+from text_store import text_id
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = os.environ.get('SCRAPED_DATA_DIR', os.path.join(BASE_DIR, 'data'))
+MAX_LOADED_SHARDS = int(os.environ.get('MAX_LOADED_SHARDS', '4'))
+MANIFEST_FILE = 'shards.json'
+
+_DATASET_RE = re.compile(r'^(?P<name>.+?)(?:_complete)?_data\.(?:json|jsonl|ndjson)(?:\.gz|\.zst)?$')
+
+
+def shard_name(filename):
+    """Shard name of a dataset file (xbox_rog_ally_complete_data.json -> xbox_rog_ally), or None"""
+    match = _DATASET_RE.match(os.path.basename(filename))
+    return match.group('name') if match else None
+
+
+def embeddings_file(data_dir, name):
+    """Where the semantic index of shard `name` lives"""
+    return os.path.join(data_dir, f'{name}_embeddings.npy')
+
+
+def discover_datasets(data_dir):
+    """{shard name: dataset path} for every dataset file in `data_dir`, in name order"""
+    found = {}
+    if not os.path.isdir(data_dir):
+        return found
+    for filename in sorted(os.listdir(data_dir)):
+        name = shard_name(filename)
+        if name and name not in found:
+            found[name] = os.path.join(data_dir, filename)
+    return found
+
+
+class ShardSpec:
+    """What is known about a shard before it is loaded"""
+    __slots__ = ('name', 'path', 'products', 'locale', 'default', 'models')
+
+    def __init__(self, name, path, products=(), locale=None, default=False, models=None):
+        self.name = name
+        self.path = path
+        self.products = tuple(p.lower() for p in products)
+        self.locale = locale
+        self.default = default
+        self.models = models or {}
+
+
+_NOT_LOADED = object()
+
+
+class Shard:
+    """A loaded dataset with its passages, spec table and (optional) semantic index.
+
+    Shards read from an index segment have no `data`; their passages are a
+    SegmentPassages view and the scrape timestamp comes from the segment.
+    The semantic index (and numpy with it) is only loaded the first time
+    `embeddings` is read, so keyword and spec answers never pay for it.
+    """
+    __slots__ = ('name', 'data', 'timestamp', 'passages', 'specs', 'embeddings_file', 'passage_ids',
+                 '_embeddings', '_passages_by_id')
+
+    def __init__(self, name, data, passages, specs=None, timestamp=None, embeddings_file=None, passage_ids=None):
+        self.name = name
+        self.data = data
+        self.timestamp = data.get('timestamp') if data is not None else timestamp
+        self.passages = passages
+        self.specs = specs
+        self.embeddings_file = embeddings_file
+        self.passage_ids = passage_ids
+        self._embeddings = _NOT_LOADED
+        self._passages_by_id = None
+
+    @property
+    def embeddings(self):
+        """The shard's EmbeddingIndex, loaded on first use; None without one (or numpy)"""
+        if self._embeddings is _NOT_LOADED:
+            embeddings = None
+            if self.embeddings_file is not None:
+                from embeddings import MIN_PASSAGE_SIMILARITY, load_embedding_index
+                embeddings = load_embedding_index(self.embeddings_file, MIN_PASSAGE_SIMILARITY)
+            self._embeddings = embeddings
+        return self._embeddings
+
+    @property
+    def passages_by_id(self):
+        """Content address -> passage, for resolving semantic hits"""
+        if self._passages_by_id is None:
+            if self.embeddings is None:
+                self._passages_by_id = {}
+            elif self.passage_ids is not None:
+                self._passages_by_id = self.passage_ids()
+            else:
+                self._passages_by_id = {text_id(p.text): p for p in self.passages}
+        return self._passages_by_id
+
+    def search(self, query_lower, limit):
+        """Passages whose lowercased text contains `query_lower`, in order, at most `limit`"""
+        search = getattr(self.passages, 'search', None)
+        if search is not None:
+            return search(query_lower, limit)
+        hits = []
+        for passage in self.passages:
+            if query_lower in passage.text_lower:
+                hits.append(passage)
+                if len(hits) == limit:
+                    break
+        return hits
+
+
+class Corpus:
+    """Shard directory with product routing and lazy, bounded loading"""
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, section_order=(), max_loaded=MAX_LOADED_SHARDS, segment=None):
+        self.data_dir = data_dir
+        self.section_order = tuple(section_order)
+        self.max_loaded = max(1, max_loaded)
+        self.segment = segment
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_specs()
+
+    def _index_specs(self):
+        self.specs = self._read_specs()
+        aliases = {}
+        for spec in self.specs.values():
+            for product in spec.products:
+                aliases.setdefault(product, []).append(spec.name)
+        self._aliases = aliases
+        # Longest alias first, so "ally x" wins over "ally"
+        pattern = '|'.join(re.escape(a) for a in sorted(aliases, key=len, reverse=True))
+        self._alias_re = re.compile(rf'\b(?:{pattern})\b') if aliases else None
+        self._defaults = [s.name for s in self.specs.values() if s.default] or list(self.specs)
+
+    def _read_specs(self):
+        datasets = discover_datasets(self.data_dir)
+        manifest = {}
+        manifest_path = os.path.join(self.data_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+        specs = OrderedDict()
+        for name, entry in manifest.items():
+            path = os.path.join(self.data_dir, entry['file']) if 'file' in entry else datasets.get(name)
+            if path is None or not os.path.exists(path):
+                logger.warning(f"Shard {name!r} is listed in {MANIFEST_FILE} but has no dataset; skipping")
+                continue
+            specs[name] = ShardSpec(name, path, entry.get('products', ()), entry.get('locale'),
+                                    entry.get('default', False), entry.get('models'))
+        for name, path in datasets.items():
+            if name not in specs:
+                # Unlisted shards are still reachable by their own name ("steam_deck" -> "steam deck")
+                specs[name] = ShardSpec(name, path, [name.replace('_', ' ')])
+        return specs
+
+    def reload(self, segment=None):
+        """Re-read the shard directory and drop every loaded shard, reading them from `segment` from now on"""
+        with self._lock:
+            self._index_specs()
+            self.segment = segment
+            self._loaded.clear()
+
+    def __len__(self):
+        return len(self.specs)
+
+    def loaded(self):
+        return list(self._loaded)
+
+    def detect(self, message):
+        """Shards whose products the message mentions, in order of first mention"""
+        if self._alias_re is None:
+            return []
+        names = []
+        for match in self._alias_re.finditer(message.lower()):
+            for name in self._aliases[match.group()]:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def route(self, message):
+        """Shards to search for a message: the mentioned products, else the default shards"""
+        return self.detect(message) or self._defaults
+
+    def shard(self, name):
+        """The loaded shard `name`, loading it (and evicting the least recently used) if needed"""
+        with self._lock:
+            shard = self._loaded.get(name)
+            if shard is not None:
+                self._loaded.move_to_end(name)
+                return shard
+            spec = self.specs[name]
+            vectors = embeddings_file(self.data_dir, name)
+            if self.segment is not None and name in self.segment:
+                segment = self.segment
+                passages = segment.passages(name)
+                shard = Shard(name, None, passages, spec_table_from_rows(segment.spec_rows(name), spec.models),
+                              segment.timestamp(name), vectors, partial(segment.passage_ids, name, passages))
+            else:
+                data = load_dataset(spec.path)
+                passages = build_passages(data, self.section_order)
+                shard = Shard(name, data, passages, build_spec_table(data, spec.models), embeddings_file=vectors)
+            self._loaded[name] = shard
+            while len(self._loaded) > self.max_loaded:
+                evicted, _ = self._loaded.popitem(last=False)
+                logger.info(f"Unloaded shard {evicted!r}")
+            logger.info(f"Loaded shard {name!r}: {len(passages)} passages")
+            return shard
+
+    def shards_for(self, message):
+        """Yield the shards a message routes to, loading them on demand"""
+        for name in self.route(message):
+            yield self.shard(name)
+
+    def vocabulary(self):
+        """Texts of the default shards' passages, the words a message about the page may use"""
+        for name in self._defaults:
+            passages = self.shard(name).passages
+            for i in range(len(passages)):
+                yield passages[i].text
+
+    def spec_lookup(self, message, model=None, attribute=None):
+        """(spec table, answer key) for a spec or comparison question, or None.
+
+        `model` and `attribute` carry over from the previous question (see
+        SpecTable.lookup). Without them, messages that name no spec attribute are
+        rejected before any shard is loaded.
+        """
+        message = message.lower().strip()
+        if attribute is None and spec_attribute(message) is None:
+            return None
+        for shard in self.shards_for(message):
+            if shard.specs is not None:
+                key = shard.specs.lookup(message, model, attribute)
+                if key is not None:
+                    return shard.specs, key
+        return None
+
+    def mentioned_model(self, message):
+        """First spec-table model a message names, or None"""
+        message = message.lower()
+        for shard in self.shards_for(message):
+            if shard.specs is not None:
+                mentioned = shard.specs.mentioned_models(message)
+                if mentioned:
+                    return mentioned[0]
+        return None
@@ -0,0 +1,39 @@
+"""Version stamp of everything the answers are derived from.
+
+A content hash of the knowledge base, the shard manifest and every scraped
+dataset: equal stamps mean equal answers, so it keys the quick-answer manifests
+and the HTTP validators of /api/chat. Bump ENGINE_VERSION when a code change
+alters answers without any of those files changing.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+from corpus import DEFAULT_DATA_DIR, MANIFEST_FILE, discover_datasets
+from knowledge import DEFAULT_KNOWLEDGE_FILE
+
+ENGINE_VERSION = 4
+
+
+def source_files(data_dir=DEFAULT_DATA_DIR):
+    """Files the answers are derived from: the knowledge base, the shard manifest and every dataset"""
+    files = [DEFAULT_KNOWLEDGE_FILE, os.path.join(data_dir, MANIFEST_FILE)]
+    files.extend(discover_datasets(data_dir).values())
+    return [f for f in files if os.path.exists(f)]
+
+
+def compute_data_version(data_dir=DEFAULT_DATA_DIR):
+    """Short content hash of the answer sources; changes whenever any of them does"""
+    digest = hashlib.sha256(str(ENGINE_VERSION).encode('ascii'))
+    for filename in source_files(data_dir):
+        digest.update(os.path.basename(filename).encode('utf-8') + b'\0')
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def data_version(data_dir=DEFAULT_DATA_DIR):
+    """compute_data_version, hashed once per process: the data a process loaded does not change under it"""
+    return compute_data_version(data_dir)
@@ -0,0 +1,184 @@
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+from text_store import STRINGS_SECTION, expand_dataset, resolve_refs
+
+try:
+    import zstandard
+except ImportError:  # zstd output is optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def detect_format(filename):
+    """Infer (format, compression) from a dataset filename such as data.jsonl.gz"""
+    base, ext = os.path.splitext(filename)
+    compression = COMPRESSION_SUFFIXES.get(ext)
+    if compression:
+        ext = os.path.splitext(base)[1]
+    fmt = 'jsonl' if ext in ('.jsonl', '.ndjson') else 'json'
+    return fmt, compression
+
+
+def _compressed_writer(raw, compression):
+    if compression is None:
+        return raw, None
+    if compression == 'gzip':
+        stream = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0)
+        return stream, stream
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd output requires the 'zstandard' package")
+        stream = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+        return stream, stream
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def _iter_json_chunks(data, indent):
+    """Serialize a dataset one top-level section at a time"""
+    if indent is None:
+        separators = (',', ':')
+        yield '{'
+        for i, (key, value) in enumerate(data.items()):
+            prefix = ',' if i else ''
+            yield f"{prefix}{json.dumps(key, ensure_ascii=False)}:{json.dumps(value, ensure_ascii=False, separators=separators)}"
+        yield '}'
+        return
+
+    pad = ' ' * indent
+    yield '{'
+    for i, (key, value) in enumerate(data.items()):
+        body = json.dumps(value, ensure_ascii=False, indent=indent).replace('\n', '\n' + pad)
+        yield f"{',' if i else ''}\n{pad}{json.dumps(key, ensure_ascii=False)}: {body}"
+    yield '\n}' if data else '}'
+
+
+def _iter_jsonl_chunks(data):
+    """One line per top-level section: {"section": key, "data": value}"""
+    for key, value in data.items():
+        yield json.dumps({'section': key, 'data': value}, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+@contextmanager
+def atomic_write(filename):
+    """Binary file that replaces `filename` once the block completes without error.
+
+    It is a temp file in the destination directory, fsynced and then renamed
+    over the target, so readers only ever see the previous file or the complete
+    new one (and processes that mapped the old file keep its pages).
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass  # Not supported on every platform (e.g. Windows)
+
+
+def write_dataset(data, filename, fmt=None, compact=True, compression=None):
+    """Stream a scraped dataset to `filename` atomically (see atomic_write).
+
+    Sections are serialized and written one at a time, so the whole document
+    is never held as one string. `fmt` and `compression` default to what the
+    filename suggests.
+    """
+    detected_fmt, detected_compression = detect_format(filename)
+    fmt = fmt or detected_fmt
+    compression = compression or detected_compression
+
+    with atomic_write(filename) as raw:
+        stream, compressor = _compressed_writer(raw, compression)
+        text = io.TextIOWrapper(stream, encoding='utf-8', write_through=True)
+        chunks = _iter_jsonl_chunks(data) if fmt == 'jsonl' else _iter_json_chunks(data, None if compact else 2)
+        for chunk in chunks:
+            text.write(chunk)
+        text.flush()
+        text.detach()
+        if compressor is not None:
+            compressor.close()  # Ends the gzip member / zstd frame; `raw` stays open
+
+    logger.info(f"Dataset written to {filename} ({fmt}{', ' + compression if compression else ''})")
+    return filename
+
+
+def open_dataset(filename):
+    """Open a dataset for text reading, decompressing as needed"""
+    _, compression = detect_format(filename)
+    if compression == 'gzip':
+        return gzip.open(filename, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Reading zstd datasets requires the 'zstandard' package")
+        raw = open(filename, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(filename, 'r', encoding='utf-8')
+
+
+def _iter_raw_sections(filename):
+    fmt, _ = detect_format(filename)
+    with open_dataset(filename) as f:
+        if fmt == 'jsonl':
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record['section'], record['data']
+        else:
+            yield from json.load(f).items()
+
+
+def iter_sections(filename):
+    """Yield (section, value) pairs; line-delimited files are read one section at a time.
+
+    String references from a deduplicated dataset are resolved against its leading
+    `__strings__` section, which is not yielded itself.
+    """
+    strings = None
+    for key, value in _iter_raw_sections(filename):
+        if key == STRINGS_SECTION:
+            strings = value
+            continue
+        yield key, resolve_refs(value, strings) if strings is not None else value
+
+
+def load_dataset(filename, sections=None, expand=True):
+    """Load a dataset into a dict, optionally keeping only the named sections.
+
+    With expand=False a deduplicated dataset is returned as stored, `__strings__` included.
+    """
+    wanted = set(sections) if sections is not None else None
+    if wanted is not None and expand:
+        return {key: value for key, value in iter_sections(filename) if key in wanted}
+    data = dict(_iter_raw_sections(filename))
+    if expand:
+        return expand_dataset(data)
+    if wanted is not None:
+        wanted.add(STRINGS_SECTION)
+        return {key: value for key, value in data.items() if key in wanted}
+    return data
@@ -0,0 +1,300 @@
+"""Semantic retrieval tier: hashed character n-gram vectors searched by cosine similarity.
+
+Vectors are built offline with `python embeddings.py`: one index for the knowledge
+base and one per scraped-corpus shard (see corpus.py). Each is a contiguous float32
+matrix (.npy) plus a small JSON sidecar naming each row. The app memory-maps the matrix at startup,
+so nothing is encoded at import and the pages are shared between processes.
+Needs numpy; without it, or without the built files, the tier is simply off.
+
+Large corpora also get an IVF index (ann_index.py) so a query only scores a few
+buckets of rows; new scrapes can be appended to their shard with `python embeddings.py --add FILE`
+without re-encoding or retraining what is already indexed.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import zlib
+
+from dataset_io import atomic_write
+from text_store import text_id
+
+try:
+    import numpy as np
+    from ann_index import DEFAULT_NPROBE, IVFIndex
+except ImportError:  # the semantic tier is optional
+    np = None
+    DEFAULT_NPROBE = 8
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_EMBEDDINGS_FILE = os.path.join(BASE_DIR, 'knowledge', 'knowledge_embeddings.npy')
+
+DIM = 256
+NGRAM_SIZES = (3, 4)
+
+# Below this cosine similarity a hit is more likely noise than an answer. Knowledge
+# entries are written to be answers; raw page passages need a closer match
+MIN_SIMILARITY = 0.35
+MIN_PASSAGE_SIMILARITY = 0.45
+
+# Passages with fewer words are navigation labels ("About our ads") that match by chance
+MIN_PASSAGE_WORDS = 4
+
+# Below this many rows an exact scan is faster than probing an IVF index
+IVF_MIN_ROWS = 2000
+
+# Knowledge categories that are canned replies rather than facts worth retrieving
+SKIP_CATEGORIES = {'responses'}
+
+# Question and filler words that would otherwise make every question look alike
+STOPWORDS = frozenset(
+    'a an and are can do does for from have how i in is it its me my of on or the this to what '
+    'when where which who why will with you your about tell there be'.split()
+)
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+# Script and stylesheet residue that survives passage filtering ("Analytics&&o.", ".c-pivot ul")
+_MARKUP_RE = re.compile(r'&&|\|\||__|\w_\w|\w\[|\[[\w-]+\]|(?:^|[\s,])[.#][a-z][\w-]*')
+# One camelCase word: an element ID or class name ("headerUniversalHeader")
+_IDENTIFIER_RE = re.compile(r'[a-z]+(?:[A-Z][a-z0-9]*)+')
+
+
+def meta_path(filename):
+    """Sidecar that names the matrix rows: data.npy -> data.json"""
+    return os.path.splitext(filename)[0] + '.json'
+
+
+def ivf_path(filename):
+    """Persisted IVF buckets: data.npy -> data.ivf.npz"""
+    return os.path.splitext(filename)[0] + '.ivf.npz'
+
+
+def _features(text):
+    """Whole content words plus the character n-grams of each one"""
+    features = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        features.append('w:' + word)
+        padded = f' {word} '
+        for n in NGRAM_SIZES:
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+def _hashed(text):
+    """(bucket, sign) arrays for the features of `text`"""
+    hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in _features(text)), dtype=np.uint32)
+    buckets = (hashes % DIM).astype(np.intp)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    return buckets, signs
+
+
+def encode(texts, idf=None):
+    """L2-normalized float32 vectors, one row per text, optionally IDF-weighted per bucket"""
+    matrix = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets, signs = _hashed(text)
+        if len(buckets):
+            matrix[row] = np.bincount(buckets, weights=signs, minlength=DIM)
+    if idf is not None:
+        matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def bucket_idf(texts):
+    """Smoothed inverse document frequency of every hash bucket across `texts`"""
+    df = np.zeros(DIM, dtype=np.float64)
+    for text in texts:
+        buckets, _ = _hashed(text)
+        df[np.unique(buckets)] += 1
+    return (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+
+def _write_index(matrix, keys, idf, filename, ivf):
+    meta = {
+        'dim': DIM,
+        'ngram_sizes': list(NGRAM_SIZES),
+        'idf': [round(float(w), 6) for w in idf],
+        'rows': [list(key) for key in keys],
+    }
+    with atomic_write(filename) as f:
+        np.save(f, matrix, allow_pickle=False)
+    with atomic_write(meta_path(filename)) as f:
+        f.write(json.dumps(meta, separators=(',', ':')).encode('utf-8'))
+    if ivf is not None:
+        ivf.save(ivf_path(filename))
+    elif os.path.exists(ivf_path(filename)):
+        os.unlink(ivf_path(filename))
+
+
+def build_embeddings(rows, filename, ivf=None):
+    """Encode `rows` of (kind, key, text) and write the matrix and its sidecar.
+
+    Passages are keyed by the content address of their text, so rows stay valid
+    when the scraped data is re-segmented; texts that disappear just stop resolving.
+    An IVF index is trained when `ivf` is true, or by default once there are
+    IVF_MIN_ROWS rows.
+    """
+    if np is None:
+        raise RuntimeError("Building embeddings requires the 'numpy' package")
+    texts = [text for _, _, text in rows]
+    idf = bucket_idf(texts)
+    matrix = encode(texts, idf)
+    if ivf is None:
+        ivf = len(rows) >= IVF_MIN_ROWS
+    _write_index(matrix, [(kind, key) for kind, key, _ in rows], idf, filename, IVFIndex.train(matrix) if ivf else None)
+    return matrix
+
+
+def add_embeddings(rows, filename):
+    """Append the `rows` not indexed yet, returning how many were added.
+
+    New vectors are encoded with the stored IDF weights, so existing rows stay
+    comparable, and are dropped into their nearest IVF bucket. The buckets are
+    refitted only once the corpus has outgrown the data they were trained on.
+    """
+    index = load_embedding_index(filename)
+    if index is None:
+        build_embeddings(rows, filename)
+        return len(rows)
+
+    known = set(index.rows)
+    new_rows = []
+    for kind, key, text in rows:
+        if (kind, key) not in known:
+            known.add((kind, key))
+            new_rows.append((kind, key, text))
+    if not new_rows:
+        return 0
+
+    vectors = encode([text for _, _, text in new_rows], index.idf)
+    matrix = np.concatenate((index.matrix, vectors))
+    keys = index.rows + [(kind, key) for kind, key, _ in new_rows]
+    idf, ivf = index.idf, index.ivf
+    del index  # release the memory map before the file is replaced
+
+    if ivf is not None and not ivf.needs_retraining():
+        ivf.add(vectors)
+    elif ivf is not None or len(matrix) >= IVF_MIN_ROWS:
+        ivf = IVFIndex.train(matrix)
+    _write_index(matrix, keys, idf, filename, ivf)
+    return len(new_rows)
+
+
+class EmbeddingIndex:
+    """Memory-mapped row matrix with top-k cosine search, exact or through an IVF index"""
+
+    def __init__(self, matrix, rows, idf, ivf=None, nprobe=DEFAULT_NPROBE, min_score=MIN_SIMILARITY):
+        self.matrix = matrix
+        self.rows = rows
+        self.idf = idf
+        self.ivf = ivf
+        self.nprobe = nprobe
+        self.min_score = min_score
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, query, k=3, min_score=None):
+        """[(score, kind, key)] of the `k` rows most similar to `query`, best first"""
+        if min_score is None:
+            min_score = self.min_score
+        vector = encode([query], self.idf)[0]
+        if not vector.any():
+            return []
+        if self.ivf is not None:
+            scores, top = self.ivf.search(self.matrix, vector, k, self.nprobe)
+            return [(float(score), *self.rows[i]) for score, i in zip(scores, top) if score >= min_score]
+        scores = self.matrix @ vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), *self.rows[i]) for i in top if scores[i] >= min_score]
+
+
+def load_embedding_index(filename, min_score=MIN_SIMILARITY):
+    """Map a built index into memory, or None if numpy or the files are missing or mismatched.
+
+    Hits scoring below `min_score` are not returned by its searches.
+    """
+    if np is None:
+        logger.info("numpy not installed; semantic retrieval disabled")
+        return None
+    try:
+        with open(meta_path(filename), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        matrix = np.load(filename, mmap_mode='r', allow_pickle=False)
+    except FileNotFoundError:
+        logger.info(f"No embeddings at {filename}; semantic retrieval disabled (build with `python embeddings.py`)")
+        return None
+    if meta['dim'] != DIM or tuple(meta['ngram_sizes']) != NGRAM_SIZES or matrix.shape != (len(meta['rows']), DIM):
+        logger.warning(f"Embeddings at {filename} were built with different settings; rebuild with `python embeddings.py`")
+        return None
+
+    ivf = None
+    if os.path.exists(ivf_path(filename)):
+        ivf = IVFIndex.load(ivf_path(filename))
+        if len(ivf) != len(matrix):
+            logger.warning(f"IVF index at {ivf_path(filename)} does not match the matrix; using exact search")
+            ivf = None
+    return EmbeddingIndex(matrix, [tuple(row) for row in meta['rows']], np.asarray(meta['idf'], dtype=np.float32), ivf,
+                          min_score=min_score)
+
+
+def knowledge_rows(knowledge_index):
+    return [('knowledge', f'{e.category}.{e.key}', e.text) for e in knowledge_index if e.category not in SKIP_CATEGORIES]
+
+
+def indexable_passage(text):
+    """Whether a passage is page prose worth embedding, not a label, markup or an identifier"""
+    if _IDENTIFIER_RE.fullmatch(text.strip()) or _MARKUP_RE.search(text):
+        return False
+    return len(_WORD_RE.findall(text.lower())) >= MIN_PASSAGE_WORDS
+
+
+def passage_rows(passages):
+    return [('passage', text_id(p.text), p.text) for p in passages if indexable_passage(p.text)]
+
+
+def main():
+    from corpus import DEFAULT_DATA_DIR, discover_datasets, embeddings_file, shard_name
+    from dataset_io import load_dataset
+    from knowledge import load_knowledge
+    from passages import build_passages
+
+    parser = argparse.ArgumentParser(description="Build the semantic retrieval indexes")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Directory of scraped dataset shards")
+    parser.add_argument('--add', nargs='+', metavar='DATA_FILE', help="Append the passages of new scrapes to their shard's index")
+    ivf_group = parser.add_mutually_exclusive_group()
+    ivf_group.add_argument('--ivf', dest='ivf', action='store_true', default=None, help="Always train IVF indexes")
+    ivf_group.add_argument('--no-ivf', dest='ivf', action='store_false', help="Never train IVF indexes")
+    args = parser.parse_args()
+
+    if args.add:
+        for data_file in args.add:
+            name = shard_name(data_file)
+            if name is None:
+                parser.error(f"{data_file} is not named like a dataset shard (<name>_data.json)")
+            output = embeddings_file(args.data_dir, name)
+            added = add_embeddings(passage_rows(build_passages(load_dataset(data_file))), output)
+            print(f"Added {added} new vectors from {data_file} to {output}")
+        return
+
+    rows = knowledge_rows(load_knowledge().index)
+    build_embeddings(rows, KNOWLEDGE_EMBEDDINGS_FILE, ivf=args.ivf)
+    print(f"Wrote {len(rows)} knowledge vectors to {KNOWLEDGE_EMBEDDINGS_FILE}")
+    for name, data_file in discover_datasets(args.data_dir).items():
+        rows = passage_rows(build_passages(load_dataset(data_file)))
+        output = embeddings_file(args.data_dir, name)
+        matrix = build_embeddings(rows, output, ivf=args.ivf)
+        print(f"Wrote {len(rows)} vectors ({matrix.nbytes / 1024:.0f} KB) for shard {name!r} to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""HTTP validators and cache headers for answers that depend only on the message and the data.
+
+An answer's ETag is derived from the data version and the normalized message,
+so it is known before the answer is computed: a matching If-None-Match is
+answered with 304 without touching the answer engine, and browsers and edge
+caches can keep the answer until the data changes.
+"""
+import hashlib
+import os
+
+from fastapi.responses import Response
+
+CHAT_CACHE_MAX_AGE = int(os.environ.get('CHAT_CACHE_MAX_AGE', '300'))
+CHAT_CACHE_S_MAXAGE = int(os.environ.get('CHAT_CACHE_S_MAXAGE', '3600'))
+
+PRIVATE_CACHE_CONTROL = 'private, no-store'
+
+# Where a session cookie changes the answer, shared caches must not hand a cookieless answer to a visitor with one
+SESSION_VARY = ('Cookie',)
+
+# The current data version: edge caches may hold it briefly, browsers must ask again on every page load
+DATA_VERSION_S_MAXAGE = int(os.environ.get('DATA_VERSION_S_MAXAGE', '60'))
+DATA_VERSION_CACHE_CONTROL = f'public, max-age=0, s-maxage={DATA_VERSION_S_MAXAGE}'
+
+
+def answer_etag(version, message):
+    """Weak ETag of the answer to a normalized message; weak, as the body may be sent compressed"""
+    digest = hashlib.blake2b(message.encode('utf-8'), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header lists `etag` (compared weakly, as RFC 9110 requires) or is *"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(candidate.strip().removeprefix('W/') == opaque for candidate in if_none_match.split(','))
+
+
+def cache_headers(etag, vary=()):
+    """Public cache headers for an answer; `vary` names request headers, beyond Accept-Encoding, it depends on"""
+    return {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={CHAT_CACHE_MAX_AGE}, s-maxage={CHAT_CACHE_S_MAXAGE}',
+        'Vary': ', '.join(('Accept-Encoding',) + tuple(vary)),
+    }
+
+
+def not_modified(etag, vary=()):
+    return Response(status_code=304, headers=cache_headers(etag, vary))
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+import requests
+
+from data_version import compute_data_version
+from dataset_io import load_dataset
+from passages import NON_TEXT_KEYS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_FILE = os.path.join('data', 'xbox_rog_ally_complete_data.json')
+
+# Top-level keys that change on every run and say nothing about the page content
+VOLATILE_KEYS = ('url', 'timestamp', 'scraping_method')
+
+
+def state_path(filename):
+    """Path of the validator/hash state stored next to a data file"""
+    return os.path.splitext(filename)[0] + '.state.json'
+
+
+def manifest_path(filename):
+    """Path of the change manifest written next to a data file"""
+    return os.path.splitext(filename)[0] + '.changes.json'
+
+
+def section_hash(value):
+    """Stable content hash of one extracted section"""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def hash_sections(data):
+    """Hash every content section of a scraped dataset"""
+    return {key: section_hash(value) for key, value in data.items() if key not in VOLATILE_KEYS}
+
+
+def diff_sections(old_hashes, new_hashes):
+    """Compare two section-hash maps and report what changed"""
+    changed = sorted(k for k in new_hashes if k in old_hashes and old_hashes[k] != new_hashes[k])
+    added = sorted(k for k in new_hashes if k not in old_hashes)
+    removed = sorted(k for k in old_hashes if k not in new_hashes)
+    return changed, added, removed
+
+
+class ScrapeState:
+    """HTTP validators and section hashes remembered between scraper runs"""
+
+    def __init__(self, path, pages=None, sections=None):
+        self.path = path
+        self.pages = pages or {}
+        self.sections = sections or {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            return cls(path, raw.get('pages', {}), raw.get('sections', {}))
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scrape state {path}: {e}")
+            return cls(path)
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pages': self.pages, 'sections': self.sections}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a previously fetched URL"""
+        page = self.pages.get(url, {})
+        headers = {}
+        if page.get('etag'):
+            headers['If-None-Match'] = page['etag']
+        if page.get('last_modified'):
+            headers['If-Modified-Since'] = page['last_modified']
+        return headers
+
+    def remember_page(self, url, response, body_hash):
+        self.pages[url] = {
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'body_hash': body_hash,
+            'checked_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def write_manifest(filename, manifest):
+    """Write the change manifest that refresh_derived reads to decide what to rebuild"""
+    path = manifest_path(filename)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Change manifest written to {path}")
+    return path
+
+
+def load_existing_data(filename):
+    try:
+        return load_dataset(filename)
+    except (OSError, ValueError):
+        return None
+
+
+def incremental_scrape(scraper, filename=DEFAULT_DATA_FILE):
+    """Re-scrape only when the page changed and rewrite only the sections that differ.
+
+    Works with both XboxROGAllyScraper and AdvancedXboxROGAllyScraper: the page is
+    probed with a conditional GET on the scraper's requests session, and only a
+    changed page is (re-)rendered and passed to `scraper.extract_from_html`.
+    Returns the change manifest, or None if the page could not be fetched.
+    """
+    url = scraper.base_url
+    state = ScrapeState.load(state_path(filename))
+    existing = load_existing_data(filename)
+    data_dir = os.path.dirname(os.path.abspath(filename))
+    previous_version = compute_data_version(data_dir)
+    manifest = {
+        'url': url,
+        'data_file': os.path.abspath(filename),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'status': 'unchanged',
+        'previous_data_version': previous_version,
+        'data_version': previous_version,
+        'changed_sections': [],
+        'added_sections': [],
+        'removed_sections': [],
+    }
+
+    # Without an existing dataset there is nothing to compare against
+    headers = state.conditional_headers(url) if existing else {}
+    try:
+        response = scraper.session.get(url, headers=headers, timeout=30)
+    except requests.RequestException as e:
+        logger.error(f"Conditional request failed for {url}: {e}")
+        return None
+
+    if response.status_code == 304:
+        logger.info("Page not modified (304); skipping re-parse")
+        manifest['section_hashes'] = state.sections
+        write_manifest(filename, manifest)
+        return manifest
+
+    try:
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.error(f"Failed to fetch {url}: {e}")
+        return None
+
+    body_hash = hashlib.sha256(response.content).hexdigest()
+    if existing and state.pages.get(url, {}).get('body_hash') == body_hash:
+        logger.info("Page body unchanged; skipping re-parse")
+        state.remember_page(url, response, body_hash)
+        state.save()
+        manifest['section_hashes'] = state.sections
+        write_manifest(filename, manifest)
+        return manifest
+
+    page_content = response.text
+    if getattr(scraper, 'use_selenium', False):
+        # The raw HTML only tells us that something changed; tabs need the rendered DOM
+        page_content = scraper.get_page_content(url) or page_content
+
+    new_data = scraper.extract_from_html(page_content)
+    new_hashes = hash_sections(new_data)
+    old_hashes = (state.sections or hash_sections(existing)) if existing else {}
+    changed, added, removed = diff_sections(old_hashes, new_hashes)
+
+    if existing and not (changed or added or removed):
+        logger.info("Page changed but no extracted section differs; keeping existing data file")
+        scraper.scraped_data = existing
+    else:
+        merged = dict(existing) if existing else {}
+        for key in changed + added:
+            merged[key] = new_data[key]
+        for key in removed:
+            merged.pop(key, None)
+        for key in VOLATILE_KEYS:
+            if key in new_data:
+                merged[key] = new_data[key]
+
+        scraper.scraped_data = merged
+        if not scraper.save_data(filename):
+            return None
+        manifest['status'] = 'updated'
+
+    manifest['changed_sections'] = changed
+    manifest['added_sections'] = added
+    manifest['removed_sections'] = removed
+    manifest['section_hashes'] = new_hashes
+    manifest['data_version'] = compute_data_version(data_dir)
+
+    state.sections = new_hashes
+    state.remember_page(url, response, body_hash)
+    state.save()
+    write_manifest(filename, manifest)
+    logger.info(f"Incremental scrape {manifest['status']}: {len(changed)} changed, {len(added)} added, {len(removed)} removed sections")
+    return manifest
+
+
+def record_replacement(filename, previous_data, previous_version):
+    """Change manifest for a data file that was replaced whole (by a scheduled scrape).
+
+    The sections are diffed against `previous_data` and the section hashes the
+    next incremental scrape compares against are updated. A replaced file always
+    has a new data version, so it counts as updated even if no section differs.
+    """
+    data_dir = os.path.dirname(os.path.abspath(filename))
+    new_hashes = hash_sections(load_dataset(filename))
+    changed, added, removed = diff_sections(hash_sections(previous_data) if previous_data else {}, new_hashes)
+    data_version = compute_data_version(data_dir)
+    manifest = {
+        'url': None,
+        'data_file': os.path.abspath(filename),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'status': 'updated' if data_version != previous_version else 'unchanged',
+        'previous_data_version': previous_version,
+        'data_version': data_version,
+        'changed_sections': changed,
+        'added_sections': added,
+        'removed_sections': removed,
+        'section_hashes': new_hashes,
+    }
+    state = ScrapeState.load(state_path(filename))
+    state.sections = new_hashes
+    state.save()
+    write_manifest(filename, manifest)
+    return manifest
+
+
+def changed_sections(manifest):
+    """Every section an incremental scrape changed, added or removed"""
+    return manifest['changed_sections'] + manifest['added_sections'] + manifest['removed_sections']
+
+
+def answers_affected(manifest):
+    """Whether any section the chatbot builds answers from changed (not just scripts or styles)"""
+    return any(section not in NON_TEXT_KEYS for section in changed_sections(manifest))
+
+
+def restamp(filename, old_version, new_version):
+    """Move an answer manifest built from `old_version` to `new_version`; False if it was built from other data"""
+    from quick_answers import write_manifest as write_answers
+
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            answers = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if answers.get('version') != old_version:
+        return False
+    answers['version'] = new_version
+    write_answers(answers, filename)
+    return True
+
+
+def rebuild_shard_embeddings(data_file):
+    """Re-encode the semantic index of `data_file`'s shard if it has one; the file written, or None"""
+    from corpus import embeddings_file, shard_name
+    from embeddings import build_embeddings, np, passage_rows
+    from passages import build_passages
+
+    name = shard_name(data_file)
+    if name is None:
+        return None
+    output = embeddings_file(os.path.dirname(data_file), name)
+    if not os.path.exists(output):
+        return None
+    if np is None:
+        logger.warning(f"numpy is not installed; {output} still indexes the previous data")
+        return None
+    build_embeddings(passage_rows(build_passages(load_dataset(data_file))), output)
+    return output
+
+
+def refresh_derived(manifest):
+    """Bring the files derived from the data up to date after an incremental scrape.
+
+    An unchanged page needs nothing. When only sections the answers never read
+    changed, the quick answers and the exported snapshot are still right and are
+    just restamped with the new data version; otherwise they are recomputed, as
+    is the shard's semantic index if it has one. The index segment is rewritten
+    whenever the data file was. Returns the names of the files rewritten or
+    restamped.
+    """
+    if manifest['status'] != 'updated':
+        return []
+
+    import importlib
+    from quick_answers import APPS, manifest_path as quick_answers_path, rebuild_quick_answers
+    from snapshot import export_page, export_snapshot, page_path, snapshot_manifest_path
+
+    old_version, new_version = manifest['previous_data_version'], manifest['data_version']
+    refreshed = []
+    answers_files = [quick_answers_path(app) for app in APPS]
+    if answers_affected(manifest) or not all(restamp(f, old_version, new_version) for f in answers_files):
+        refreshed.extend(rebuild_quick_answers().values())
+    else:
+        refreshed.extend(answers_files)
+
+    snapshot_file = snapshot_manifest_path()
+    if answers_affected(manifest) or not restamp(snapshot_file, old_version, new_version):
+        export_snapshot()
+    else:
+        export_page()  # the page carries the data version too
+    refreshed.extend([snapshot_file, page_path()])
+
+    data_file = manifest.get('data_file')
+    if data_file and answers_affected(manifest):
+        embeddings = rebuild_shard_embeddings(data_file)
+        if embeddings is not None:
+            refreshed.append(embeddings)
+
+    app = importlib.import_module('api.index')
+    if app.SEGMENT_FILE:
+        app.write_index_segment()
+        refreshed.append(app.SEGMENT_FILE)
+    logger.info(f"Refreshed {len(refreshed)} derived files after changes to {changed_sections(manifest)}")
+    return refreshed
@@ -0,0 +1,19 @@
+"""Shared knowledge base for the standard (main.py) and enhanced (api/index.py) chatbots.
+
+All answer texts, multi-part answers and keyword routes live in knowledge_base.json.
+`load_knowledge()` compiles them once into typed entries, a precomposed answer
+table and one router per app.
+"""
+from .answers import SEPARATOR, AnswerTable, encode_response
+from .base import DEFAULT_KNOWLEDGE_FILE, KnowledgeBase, compile_knowledge, load_knowledge
+from .records import KnowledgeEntry, KnowledgeIndex, build_knowledge_index
+from .routing import Router, compile_router
+from .spelling import SpellingIndex, edit_distance
+
+__all__ = [
+    'SEPARATOR', 'AnswerTable', 'encode_response',
+    'DEFAULT_KNOWLEDGE_FILE', 'KnowledgeBase', 'compile_knowledge', 'load_knowledge',
+    'KnowledgeEntry', 'KnowledgeIndex', 'build_knowledge_index',
+    'Router', 'compile_router',
+    'SpellingIndex', 'edit_distance',
+]
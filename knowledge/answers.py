@@ -0,0 +1,75 @@
+import json
+import sys
+from typing import Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; json.dumps produces the same bytes, just slower
+    orjson = None
+
+SEPARATOR = "\n\n"
+
+
+def encode_response(text: str) -> bytes:
+    """`{"response": text}` encoded exactly as FastAPI's default JSONResponse would"""
+    if orjson is not None:
+        return orjson.dumps({"response": text})
+    return json.dumps({"response": text}, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class AnswerTable:
+    """Every canned response composed once at import, addressable by answer ID.
+
+    A request only resolves to an ID; the text and its pre-encoded JSON body are
+    looked up, so no strings are joined or serialized per request. Call `freeze()`
+    once all answers are added.
+    """
+    __slots__ = ('_ids', '_texts', '_json', 'texts', 'json_bodies')
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._texts: List[str] = []
+        self._json: List[bytes] = []
+        self.texts: Tuple[str, ...] = ()
+        self.json_bodies: Tuple[bytes, ...] = ()
+
+    def add(self, name: str, *parts: str, heading: str = None) -> int:
+        """Register `parts` joined by blank lines (after an optional heading) as answer `name`"""
+        if name in self._ids:
+            raise ValueError(f"Duplicate answer ID: {name}")
+        text = SEPARATOR.join(parts)
+        if heading is not None:
+            text = heading + SEPARATOR + text
+        answer_id = len(self._texts)
+        self._ids[sys.intern(name)] = answer_id
+        self._texts.append(sys.intern(text))
+        self._json.append(encode_response(text))
+        return answer_id
+
+    def add_index(self, index) -> None:
+        """Register every knowledge entry as a single-part answer named "category.key" """
+        for name, text in index.texts.items():
+            self.add(name, text)
+
+    def freeze(self) -> "AnswerTable":
+        self.texts = tuple(self._texts)
+        self.json_bodies = tuple(self._json)
+        return self
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def id(self, name: str) -> int:
+        return self._ids[name]
+
+    def names(self) -> List[str]:
+        return list(self._ids)
+
+    def text(self, name: str) -> str:
+        return self.texts[self._ids[name]]
+
+    def json(self, name: str) -> bytes:
+        return self.json_bodies[self._ids[name]]
@@ -0,0 +1,70 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict
+
+from .answers import AnswerTable
+from .records import KnowledgeIndex, build_knowledge_index
+from .routing import Router, compile_router
+from .spelling import SpellingIndex
+
+DEFAULT_KNOWLEDGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_base.json')
+
+
+class KnowledgeBase:
+    """The knowledge file compiled into entries, one answer table and a router per app"""
+    __slots__ = ('knowledge', 'index', 'texts', 'answers', 'routers')
+
+    def __init__(self, knowledge: Dict[str, Dict[str, str]], index: KnowledgeIndex,
+                 answers: AnswerTable, routers: Dict[str, Router]):
+        self.knowledge = knowledge
+        self.index = index
+        self.texts = index.texts
+        self.answers = answers
+        self.routers = routers
+
+    def router(self, name: str) -> Router:
+        return self.routers[name]
+
+
+def compile_knowledge(spec: Dict) -> KnowledgeBase:
+    """Build the knowledge base from the parsed knowledge file.
+
+    Raises ValueError if a composite answer or a route names something that does not exist,
+    so a typo in the data file fails at startup instead of on the request that hits it.
+    """
+    knowledge = spec['knowledge']
+    index = build_knowledge_index(knowledge)
+    texts = index.texts
+
+    answers = AnswerTable()
+    answers.add_index(index)
+    for name, answer in spec.get('answers', {}).items():
+        missing = [part for part in answer['parts'] if part not in texts]
+        if missing:
+            raise ValueError(f"Answer {name!r} references unknown entries: {', '.join(missing)}")
+        answers.add(name, *(texts[part] for part in answer['parts']), heading=answer.get('heading'))
+    answers.freeze()
+
+    routers = {}
+    for name, router_spec in spec.get('routers', {}).items():
+        router = compile_router(name, router_spec)
+        unknown = sorted({answer_id for answer_id in router.answer_ids() if answer_id not in answers})
+        if unknown:
+            raise ValueError(f"Router {name!r} routes to unknown answers: {', '.join(unknown)}")
+        routers[name] = router
+
+    # One typo index over the combined vocabulary, so either app can correct to any keyword;
+    # words the answers use are never "corrected"
+    speller = SpellingIndex((word for router in routers.values() for word in router.keywords()), texts.values())
+    for router in routers.values():
+        router.speller = speller
+
+    return KnowledgeBase(knowledge, index, answers, routers)
+
+
+@lru_cache(maxsize=None)
+def load_knowledge(filename: str = DEFAULT_KNOWLEDGE_FILE) -> KnowledgeBase:
+    """Load and compile a knowledge file; compiled once per process and shared by every importer"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return compile_knowledge(json.load(f))
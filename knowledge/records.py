@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Tuple
+
+
+@dataclass(frozen=True)
+class KnowledgeEntry:
+    """One knowledge-base or scraped text, with its lowercased form computed once"""
+    __slots__ = ('category', 'key', 'text', 'text_lower', 'source')
+    category: str
+    key: str
+    text: str
+    text_lower: str
+    source: str
+
+
+class KnowledgeIndex:
+    """Flat, read-only table of entries addressable by (category, key).
+
+    `texts` maps "category.key" straight to the answer text: one lookup on a
+    literal key whose hash is cached, instead of two nested dict lookups.
+    """
+    __slots__ = ('entries', 'texts', '_by_key')
+
+    def __init__(self, entries: Iterable[KnowledgeEntry]):
+        self.entries: Tuple[KnowledgeEntry, ...] = tuple(entries)
+        self._by_key: Dict[Tuple[str, str], KnowledgeEntry] = {(e.category, e.key): e for e in self.entries}
+        self.texts: Dict[str, str] = {f'{e.category}.{e.key}': e.text for e in self.entries}
+
+    def __getitem__(self, category_key: Tuple[str, str]) -> KnowledgeEntry:
+        return self._by_key[category_key]
+
+    def __contains__(self, category_key: Tuple[str, str]) -> bool:
+        return category_key in self._by_key
+
+    def __iter__(self) -> Iterator[KnowledgeEntry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def text(self, category: str, key: str) -> str:
+        return self._by_key[category, key].text
+
+    def category(self, category: str) -> Tuple[KnowledgeEntry, ...]:
+        return tuple(e for e in self.entries if e.category == category)
+
+
+def build_knowledge_index(knowledge: Dict[str, Dict[str, str]], source: str = 'knowledge_base') -> KnowledgeIndex:
+    """Flatten a {category: {key: text}} knowledge base into entries"""
+    return KnowledgeIndex(
+        KnowledgeEntry(category, key, text, text.lower(), source)
+        for category, items in knowledge.items()
+        for key, text in items.items()
+    )
+
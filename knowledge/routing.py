@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Tuple
+
+from .spelling import SpellingIndex
+
+# A compiled rule: (exact phrases, keywords, answer ID, nested rules, fallback answer ID)
+Rule = Tuple[frozenset, Tuple[str, ...], Optional[str], Tuple["Rule", ...], Optional[str]]
+
+
+class Router:
+    """Keyword router compiled from the declarative `routes` of a knowledge file.
+
+    Rules are tried in order and the first whose keywords occur in the message
+    wins. A rule either names its answer or holds nested rules, falling back to
+    its `otherwise` answer (or the router default) when none of them match.
+
+    With a `speller`, a message that matches nothing is retried once with its
+    misspelled tokens corrected, before giving up to the default.
+    """
+    __slots__ = ('name', 'rules', 'default', 'speller')
+
+    def __init__(self, name: str, rules: Tuple[Rule, ...], default: Optional[str],
+                 speller: Optional[SpellingIndex] = None):
+        self.name = name
+        self.rules = rules
+        self.default = default
+        self.speller = speller
+
+    def route(self, user_message: str) -> Optional[str]:
+        """Answer ID for a message, or the default (None when the app answers it some other way)"""
+        message = user_message.lower().strip()
+        answer = _match(self.rules, message)
+        if answer is None and self.speller is not None:
+            corrected = self.speller.correct(message)
+            if corrected != message:
+                answer = _match(self.rules, corrected)
+        return self.default if answer is None else answer
+
+    def keywords(self) -> List[str]:
+        """Every keyword and exact phrase the rules test for"""
+        words = []
+        stack = list(self.rules)
+        while stack:
+            exact, keywords, _, nested, _ = stack.pop()
+            words.extend(exact)
+            words.extend(keywords)
+            stack.extend(nested)
+        return words
+
+    def answer_ids(self) -> List[str]:
+        """Every answer ID this router can return"""
+        ids = [] if self.default is None else [self.default]
+        stack = list(self.rules)
+        while stack:
+            _, _, answer, nested, otherwise = stack.pop()
+            ids.extend(a for a in (answer, otherwise) if a is not None)
+            stack.extend(nested)
+        return ids
+
+    def branches(self) -> List[Tuple[str, str]]:
+        """(phrase, answer ID) for every exact phrase and keyword path through the rules.
+
+        A nested rule contributes its keywords combined with each of its children's,
+        and on its own for its `otherwise` answer; each phrase is routed for real, so
+        earlier rules that shadow a branch are accounted for.
+        """
+        phrases = []
+
+        def walk(rules, prefix):
+            for exact, keywords, answer, nested, otherwise in rules:
+                phrases.extend(sorted(exact))  # a set; sorted so exports are reproducible
+                for keyword in keywords:
+                    phrase = f'{prefix} {keyword}'.strip()
+                    if nested:
+                        walk(nested, phrase)
+                    if not nested or otherwise is not None:
+                        phrases.append(phrase)
+
+        walk(self.rules, '')
+        found = {}
+        for phrase in phrases:
+            answer = self.route(phrase)
+            if answer is not None:
+                found.setdefault(phrase, answer)
+        return list(found.items())
+
+
+def _match(rules: Tuple[Rule, ...], message: str) -> Optional[str]:
+    for exact, keywords, answer, nested, otherwise in rules:
+        if message in exact or any(word in message for word in keywords):
+            if nested:
+                found = _match(nested, message)
+                return otherwise if found is None else found
+            return answer
+    return None
+
+
+def compile_rules(specs: List[Dict]) -> Tuple[Rule, ...]:
+    """Turn the JSON rule list into nested tuples"""
+    return tuple(
+        (
+            frozenset(spec.get('exact', ())),
+            tuple(spec.get('any', ())),
+            spec.get('answer'),
+            compile_rules(spec.get('routes', [])),
+            spec.get('otherwise'),
+        )
+        for spec in specs
+    )
+
+
+def compile_router(name: str, spec: Dict) -> Router:
+    return Router(name, compile_rules(spec['routes']), spec.get('default'))
@@ -0,0 +1,157 @@
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Shorter tokens are never corrected: too many real words are one edit apart
+MIN_CORRECTED_CHARS = 5
+
+
+def max_edits(length: int) -> int:
+    """Typos tolerated in a token of this length; short words are too easy to confuse"""
+    if length <= 4:
+        return 0
+    if length <= 6:
+        return 1
+    return 2
+
+
+def _deletes(term: str, distance: int) -> Set[str]:
+    """Every string reachable from `term` by removing up to `distance` characters"""
+    found = {term}
+    frontier = {term}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance (transpositions count once), or limit + 1 if larger"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only cells within `limit` of the diagonal can stay within the limit
+    over = limit + 1
+    width = len(b)
+    previous2 = None
+    previous = [j if j <= limit else over for j in range(width + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (width + 1)
+        if i <= limit:
+            current[0] = i
+        low = max(1, i - limit)
+        high = min(width, i + limit)
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            best = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < best:
+                best = previous[j] + 1
+            if current[j - 1] + 1 < best:
+                best = current[j - 1] + 1
+            if previous2 is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] and previous2[j - 2] + 1 < best:
+                best = previous2[j - 2] + 1
+            current[j] = best
+        if min(current[low - 1:high + 1]) > limit:
+            return over
+        previous2, previous = previous, current
+    return min(previous[-1], over)
+
+
+class SpellingIndex:
+    """SymSpell-style correction of message tokens against the routers' keyword vocabulary.
+
+    Every keyword's deletion variants are precomputed, so a lookup only generates the
+    variants of the typed token, intersects them with the index and verifies the few
+    candidates found. Multi-word keywords are also indexed with their spaces removed,
+    which lets "gamepas" correct to "game pass".
+
+    Only unknown words are corrected: a token that is a word of any keyword or of the
+    `vocabulary` texts (the answers, the scraped pages) is left alone, so "button" is
+    not turned into the keyword "buttons".
+    """
+
+    def __init__(self, keywords: Iterable[str], vocabulary: Iterable[str] = (), cache_size: int = 4096):
+        counts = Counter(keyword.lower() for keyword in keywords)
+        self.terms: Dict[str, str] = {}
+        self.frequency: Dict[str, int] = {}
+        words: Set[str] = set()
+        for keyword, count in counts.items():
+            words.update(_TOKEN_RE.findall(keyword))
+            joined = keyword.replace(' ', '')
+            if not _TOKEN_RE.fullmatch(joined):
+                continue
+            self.terms.setdefault(joined, keyword)
+            self.frequency[joined] = self.frequency.get(joined, 0) + count
+        for text in vocabulary:
+            words.update(_TOKEN_RE.findall(text.lower()))
+        self.words = words
+
+        # Deletion variants are built on the first lookup: most messages match a rule
+        # without correction, and building them is most of the knowledge load time.
+        # Vocabulary sources (e.g. the scraped pages) are read then too
+        self._deletes: Optional[Dict[str, Set[str]]] = None
+        self._sources: List[Callable[[], Iterable[str]]] = []
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def add_vocabulary(self, source: Callable[[], Iterable[str]]):
+        """Treat the words of the texts `source()` returns as correct; read when the index is built"""
+        if self._deletes is None:
+            self._sources.append(source)
+        else:
+            self._add_words(source())
+            self.lookup.cache_clear()
+
+    def _add_words(self, texts: Iterable[str]):
+        for text in texts:
+            self.words.update(_TOKEN_RE.findall(text.lower()))
+
+    @property
+    def deletes(self) -> Dict[str, Set[str]]:
+        """Deletion variant -> terms it was derived from"""
+        if self._deletes is None:
+            self.build()
+        return self._deletes
+
+    def build(self):
+        """Build the deletion-variant index now rather than on the first lookup"""
+        if self._deletes is not None:
+            return
+        for source in self._sources:
+            self._add_words(source())
+        self._sources.clear()
+        deletes: Dict[str, Set[str]] = {}
+        for term in self.terms:
+            for variant in _deletes(term, max_edits(len(term))):
+                deletes.setdefault(variant, set()).add(term)
+        self._deletes = deletes
+
+    def _lookup(self, token: str) -> Optional[str]:
+        distance = max_edits(len(token))
+        if distance == 0 or len(token) < MIN_CORRECTED_CHARS or token in self.terms:
+            return None
+        index = self.deletes
+        if token in self.words:
+            return None
+        candidates = set()
+        for variant in _deletes(token, distance):
+            terms = index.get(variant)
+            if terms:
+                candidates |= terms
+        best = None
+        best_key = None
+        for term in candidates:
+            found = edit_distance(token, term, distance)
+            if found > distance or found > max_edits(len(term)):
+                continue
+            key = (found, -self.frequency[term], term)
+            if best_key is None or key < best_key:
+                best, best_key = term, key
+        return None if best is None else self.terms[best]
+
+    def correct(self, message: str) -> str:
+        """`message` with every misspelled token replaced by the keyword it most likely meant"""
+        return _TOKEN_RE.sub(lambda match: self.lookup(match.group()) or match.group(), message)
@@ -0,0 +1,141 @@
+import re
+
+# Longest unit worth returning; leaves room for a label within the chatbot's 300-char cap
+MAX_PASSAGE_CHARS = 260
+# Shortest piece of a split value worth keeping; a whole value (a heading, a tab or
+# link label such as "Battery" or "Help topics") is kept at any length
+MIN_PASSAGE_CHARS = 12
+
+# Keys whose values are markup/plumbing rather than readable page text
+NON_TEXT_KEYS = {
+    'url', 'timestamp', 'scraping_method', 'scripts', 'stylesheets', 'inline_styles',
+    'src', 'href', 'class', 'id', 'type', 'selector', 'onclick', 'action', 'method',
+    'aria_expanded', 'level', 'name', 'placeholder', 'canonical_url', 'language',
+}
+
+# get_text(strip=True) glues blocks together, so a sentence end is often followed
+# directly by the next capitalised word ("...handheld.Power of Xbox"). A "|" is not
+# a break: it separates the cells of a spec row ("ROG Xbox Ally X|24GB RAM|1TB"),
+# which only make sense together
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])(?:\s+|(?=[A-Z]))|\n+')
+# A lowercase letter run straight into a capital marks where get_text() glued two labels
+# together ("Help topicsAccount & profile"); runs of them are menus, not page text
+_GLUED_LABEL_RE = re.compile(r'[a-z][A-Z]')
+# Where a capitalised word starts right after a word or a figure ("5.4Dimensions")
+_LABEL_START_RE = re.compile(r'(?<=[a-z\d])(?=[A-Z][a-z])')
+_NOISE_RE = re.compile(r'[{}<>=\\]|;(?=\S)|":|","|\w\(["\']|\bfunction\b|window\.|https?://', re.IGNORECASE)
+
+
+class Passage:
+    """A sentence-sized slice of a scraped value, with offsets back to where it came from"""
+    __slots__ = ('section', 'path', 'start', 'end', 'text', 'text_lower')
+
+    def __init__(self, section, path, start, end, text):
+        self.section = section
+        self.path = path
+        self.start = start
+        self.end = end
+        self.text = text
+        self.text_lower = text.lower()
+
+    def __repr__(self):
+        return f"Passage({self.section}/{'/'.join(map(str, self.path))}[{self.start}:{self.end}] {self.text[:40]!r})"
+
+
+def looks_like_noise(text):
+    """Script, JSON or markup fragments that leak into get_text() output"""
+    return bool(_NOISE_RE.search(text))
+
+
+def looks_like_menu(text):
+    """Navigation menus flattened into one string: many glued labels and no figures.
+
+    Spec tables are glued the same way ("Dimensions" + "ROG Xbox Ally X290.8*121.5mm")
+    but always carry numbers, so those are kept.
+    """
+    glued = len(_GLUED_LABEL_RE.findall(text))
+    return glued >= 4 and glued * 100 >= 3 * len(text) and not any(c.isdigit() for c in text)
+
+
+def _window(text, start, end, limit):
+    """Split an over-long span into pieces of at most `limit` chars.
+
+    A piece ends where a glued label starts ("...Bluetooth 5.4|DimensionsROG") if
+    there is one in its second half, so a spec cell is not cut from its heading;
+    otherwise at the last word boundary.
+    """
+    while end - start > limit:
+        cut = -1
+        for match in _LABEL_START_RE.finditer(text, start + limit // 2, start + limit):
+            cut = match.start()
+        if cut <= start:
+            cut = text.rfind(' ', start, start + limit)
+        if cut <= start:
+            cut = start + limit
+        yield start, cut
+        start = cut
+        while start < end and text[start] == ' ':
+            start += 1
+    if start < end:
+        yield start, end
+
+
+def split_spans(text, limit=MAX_PASSAGE_CHARS):
+    """(start, end) offsets of the sentence/passage units in `text`"""
+    spans = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        if match.start() > start:
+            spans.extend(_window(text, start, match.start(), limit))
+        start = max(start, match.end())
+    if start < len(text):
+        spans.extend(_window(text, start, len(text), limit))
+    return spans
+
+
+def iter_text_values(value, path=()):
+    """Yield (path, text) for every readable string leaf of a scraped section"""
+    if isinstance(value, str):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key not in NON_TEXT_KEYS:
+                yield from iter_text_values(item, path + (key,))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from iter_text_values(item, path + (i,))
+
+
+def build_passages(data, section_order=()):
+    """Segment every scraped text value into retrievable units.
+
+    Sections named in `section_order` come first, in that order, then the rest.
+    Each distinct source text is segmented once, each distinct unit is kept once
+    (at its first location), and units that look like code, markup or flattened
+    navigation menus are dropped.
+    """
+    passages = []
+    seen_sources = set()
+    seen_units = set()
+    ordered = [key for key in section_order if key in data] + [key for key in data if key not in section_order]
+    for section in ordered:
+        value = data[section]
+        if section in NON_TEXT_KEYS:
+            continue
+        for path, text in iter_text_values(value):
+            if id(text) in seen_sources:
+                continue
+            seen_sources.add(id(text))
+            for start, end in split_spans(text):
+                while start < end and text[start].isspace():
+                    start += 1
+                while end > start and text[end - 1].isspace():
+                    end -= 1
+                unit = text[start:end]
+                if not unit or unit in seen_units or looks_like_noise(unit) or looks_like_menu(unit):
+                    continue
+                if len(unit) < MIN_PASSAGE_CHARS and unit != text.strip():
+                    continue
+                seen_units.add(unit)
+                passages.append(Passage(section, path, start, end, unit))
+    return passages
@@ -0,0 +1,98 @@
+"""Answers to the page's quick-question buttons, computed ahead of time.
+
+The buttons are the most-clicked inputs, and their questions never change, so
+each app runs them through its own answer engine once and embeds the results in
+the rendered page; a click is answered client-side without a request. The
+answers are also stored as a manifest (`data/quick_answers_<app>.json`) stamped
+with the data version (see data_version.py), and are recomputed whenever it no
+longer matches. `python quick_answers.py` rebuilds both.
+"""
+import importlib
+import json
+import logging
+import os
+
+from corpus import DEFAULT_DATA_DIR
+from data_version import compute_data_version, data_version
+from dataset_io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# (button label, question sent), in the order the buttons appear
+QUICK_QUESTIONS = [
+    ("Ally vs Ally X differences", "What are the differences between Ally and Ally X?"),
+    ("Device specifications", "What are the specifications?"),
+    ("Xbox Game Pass support", "Does it support Xbox Game Pass?"),
+    ("Cloud gaming features", "How does cloud gaming work?"),
+    ("Control layout & features", "Tell me about the controls"),
+    ("Ports & connectivity", "What ports and connectivity does it have?"),
+    ("Battery life & power", "What is the battery life like?"),
+    ("Xbox interface & Game Bar", "How does the Xbox experience work?"),
+    ("Included accessories", "What accessories are included?"),
+    ("Storage upgrade options", "Can I upgrade the storage?"),
+    ("Xbox remote play", "How does remote play work?"),
+]
+
+# App name -> module whose get_*_response answers its buttons
+APPS = {
+    'standard': ('main', 'get_chatbot_response'),
+    'enhanced': ('api.index', 'get_enhanced_chatbot_response'),
+}
+
+
+def manifest_path(app, data_dir=DEFAULT_DATA_DIR):
+    return os.path.join(data_dir, f'quick_answers_{app}.json')
+
+
+def build_quick_answers(respond, version):
+    return {
+        'version': version,
+        'answers': {question: respond(question) for _, question in QUICK_QUESTIONS},
+    }
+
+
+def write_manifest(manifest, filename):
+    with atomic_write(filename) as f:
+        f.write((json.dumps(manifest, ensure_ascii=False, indent=2) + '\n').encode('utf-8'))
+
+
+def load_quick_answers(app, respond, data_dir=DEFAULT_DATA_DIR):
+    """The app's quick-answer manifest, recomputed (and rewritten if possible) when its sources changed"""
+    version = data_version(data_dir)
+    filename = manifest_path(app, data_dir)
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == version:
+            return manifest
+        logger.info(f"Quick answers in {filename} are stale; recomputing")
+    except FileNotFoundError:
+        logger.info(f"No quick answers at {filename}; computing them")
+
+    manifest = build_quick_answers(respond, version)
+    try:
+        write_manifest(manifest, filename)
+    except OSError as e:  # read-only deployments still serve the freshly computed answers
+        logger.warning(f"Could not write {filename}: {e}")
+    return manifest
+
+
+def rebuild_quick_answers():
+    """Recompute and write every app's quick-answer manifest; {app: file written}"""
+    version = compute_data_version()
+    written = {}
+    for app, (module_name, function) in APPS.items():
+        respond = getattr(importlib.import_module(module_name), function)
+        filename = manifest_path(app)
+        write_manifest(build_quick_answers(respond, version), filename)
+        written[app] = filename
+    return written
+
+
+def main():
+    for app, filename in rebuild_quick_answers().items():
+        print(f"Wrote {len(QUICK_QUESTIONS)} quick answers for the {app} app to {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""How responses go on the wire: orjson serialization and brotli/gzip compression.
+
+JSON endpoints serialize with orjson when it is installed (JSON_RESPONSE_CLASS);
+the chat answers are pre-encoded bytes already (see knowledge.encode_response).
+
+Most bodies are repeats: canned answers, spec answers, the rendered page. The
+compressed form of a body is therefore cached by its bytes, so a repeated answer
+is compressed once per process rather than once per request. Brotli is used
+when the client accepts it and the optional `brotli` package is installed,
+otherwise gzip. Streaming responses pass through untouched.
+"""
+import gzip
+import os
+from functools import lru_cache
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+JSON_RESPONSE_CLASS = ORJSONResponse if orjson is not None else JSONResponse
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '500'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # the speed/ratio sweet spot for text compressed on the request path
+
+
+def accepted_encoding(accept_encoding):
+    """'br', 'gzip' or None: the best encoding an Accept-Encoding header allows"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+@lru_cache(maxsize=512)
+def compress(body, encoding):
+    """`body` compressed with `encoding`; repeated bodies are served from the cache"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses of at least `minimum_size` bytes"""
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message['type'] == 'http.response.start':
+                start = message
+                # Errors, 304s and partial content are small or must match another response: left as is
+                passthrough = (not 200 <= message['status'] < 300 or message['status'] in (204, 206)
+                               or 'content-encoding' in Headers(raw=message['headers']))
+                return
+            if message['type'] != 'http.response.body' or start is None:
+                await send(message)
+                return
+            if passthrough or message.get('more_body', False):
+                # Streamed, already encoded or not a success: send as is
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+            body = message.get('body', b'')
+            headers = MutableHeaders(raw=start['headers'])
+            if 'accept-encoding' not in headers.get('vary', '').lower():
+                headers.add_vary_header('Accept-Encoding')
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                message = {**message, 'body': body}
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,12 @@
+@echo off
+echo Starting Xbox ROG Ally scheduled scraper...
+echo.
+echo Installing scraper dependencies...
+pip install -r scraper_requirements.txt
+echo.
+echo Scraping every hour; new data is published only when it passes sanity checks.
+echo Run metrics are appended to scrape_metrics.jsonl
+echo Press Ctrl+C to stop the scheduler
+echo.
+python scrape_scheduler.py --interval 3600
+pause 
\ No newline at end of file
@@ -10,5 +10,5 @@ echo including tabs, buttons, interactive elements, and more...
 echo.
 python advanced_scraper.py
 echo.
-echo Scraping completed! Check xbox_rog_ally_complete_data.json for results.
+echo Scraping completed! Check data\xbox_rog_ally_complete_data.json for results.
 pause 
\ No newline at end of file
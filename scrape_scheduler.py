@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+import psutil
+
+from corpus import DEFAULT_DATA_DIR
+from data_version import compute_data_version
+from dataset_io import load_dataset
+from incremental import changed_sections, load_existing_data, record_replacement, refresh_derived
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the parent-side watchdog still applies
+    resource = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DATA_FILENAME = 'xbox_rog_ally_complete_data.json'
+
+# Sections the chatbot relies on; a run missing any of them is not published
+REQUIRED_SECTIONS = [
+    'main_content',
+    'comprehensive_specifications',
+    'gaming_features',
+    'model_comparisons',
+]
+
+
+def _scrape_to_file(output_path, use_selenium, block_resources, cpu_seconds):
+    """Child-process entry point: run one scrape and write it to `output_path`"""
+    if resource is not None and cpu_seconds:
+        # Backstop for runaway parsing; Chrome processes inherit the limit too
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_seconds), int(cpu_seconds) + 5))
+
+    from advanced_scraper import AdvancedXboxROGAllyScraper
+
+    scraper = AdvancedXboxROGAllyScraper(use_selenium=use_selenium, block_resources=block_resources)
+    try:
+        if not scraper.extract_all_data():
+            raise SystemExit(2)
+        if not scraper.save_data(output_path):
+            raise SystemExit(3)
+    finally:
+        scraper.cleanup()
+
+
+def count_data_points(data):
+    """Same counting rule as the scraper summaries: items in every dict/list section"""
+    return sum(len(value) for value in data.values() if isinstance(value, (dict, list)))
+
+
+def validate_dataset(path, min_bytes, min_data_points):
+    """Return None if the scraped file is fit to publish, otherwise the reason it is not"""
+    size = os.path.getsize(path)
+    if size < min_bytes:
+        return f"output too small ({size} bytes < {min_bytes})"
+
+    try:
+        data = load_dataset(path)
+    except ValueError as e:
+        return f"output is not valid JSON: {e}"
+
+    missing = [section for section in REQUIRED_SECTIONS if not data.get(section)]
+    if missing:
+        return f"missing or empty sections: {', '.join(missing)}"
+
+    data_points = count_data_points(data)
+    if data_points < min_data_points:
+        return f"too few data points ({data_points} < {min_data_points})"
+
+    return None
+
+
+class RunWatchdog:
+    """Samples the memory and CPU time of a scrape process tree (scraper + Chrome).
+
+    A process that has already exited leaves nothing to sample or kill.
+    """
+
+    def __init__(self, pid):
+        try:
+            self.root = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            self.root = None
+        self.peak_rss_mb = 0.0
+        self.cpu_seconds = 0.0
+        self._cpu_by_pid = {}
+
+    def sample(self):
+        if self.root is None:
+            return None
+        try:
+            processes = [self.root] + self.root.children(recursive=True)
+        except psutil.Error:
+            return None
+        rss = 0
+        for process in processes:
+            try:
+                rss += process.memory_info().rss
+                times = process.cpu_times()
+                self._cpu_by_pid[process.pid] = times.user + times.system
+            except psutil.Error:
+                continue
+        self.peak_rss_mb = max(self.peak_rss_mb, rss / (1024 * 1024))
+        # Exited processes keep their last sample so CPU time never goes backwards
+        self.cpu_seconds = sum(self._cpu_by_pid.values())
+        return rss / (1024 * 1024)
+
+    def kill_tree(self):
+        if self.root is None:
+            return
+        try:
+            processes = self.root.children(recursive=True) + [self.root]
+        except psutil.Error:
+            return
+        for process in processes:
+            try:
+                process.kill()
+            except psutil.Error:
+                continue
+
+
+class ScrapeScheduler:
+    """Runs the advanced scraper on an interval with per-run resource caps and guarded publishing"""
+
+    def __init__(self, data_dir='data', interval=3600, max_concurrent=1, memory_limit_mb=1500,
+                 cpu_limit_seconds=300, timeout_seconds=600, min_bytes=100_000, min_data_points=200,
+                 metrics_file='scrape_metrics.jsonl', use_selenium=True, block_resources=True, scrape=_scrape_to_file):
+        self.data_dir = os.path.abspath(data_dir)
+        self.staging_dir = os.path.join(self.data_dir, '.scrape_staging')
+        self.interval = interval
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_limit_seconds = cpu_limit_seconds
+        self.timeout_seconds = timeout_seconds
+        self.min_bytes = min_bytes
+        self.min_data_points = min_data_points
+        self.metrics_file = metrics_file
+        self.use_selenium = use_selenium
+        self.block_resources = block_resources
+        self.scrape = scrape  # child-process entry point, called with (output path, use_selenium, block_resources, cpu_seconds)
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._metrics_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._context = multiprocessing.get_context('spawn')
+
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def record_metrics(self, metrics):
+        line = json.dumps(metrics, ensure_ascii=False)
+        with self._metrics_lock:
+            with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def publish(self, staging_path, metrics):
+        """Move a validated scrape into place, then rebuild what is derived from it"""
+        target = os.path.join(self.data_dir, DATA_FILENAME)
+        previous_data = load_existing_data(target)
+        previous_version = compute_data_version(self.data_dir)
+        os.replace(staging_path, target)
+        metrics['status'] = 'published'
+        metrics['published'] = True
+
+        manifest = record_replacement(target, previous_data, previous_version)
+        metrics['data_version'] = manifest['data_version']
+        metrics['changed_sections'] = changed_sections(manifest)
+        if self.data_dir != os.path.abspath(DEFAULT_DATA_DIR):
+            metrics['derived'] = []  # the apps serve, and derive their files from, another directory
+            return
+        try:
+            # In a fresh interpreter: the apps load the data once per process, so one imported
+            # here by an earlier run would rebuild from the data it saw then
+            with self._context.Pool(1) as pool:
+                metrics['derived'] = pool.apply(refresh_derived, (manifest,))
+        except Exception as e:  # the data is published either way
+            logger.error(f"Rebuilding the files derived from {target} failed: {e}")
+            metrics['derived_error'] = str(e)
+
+    def run_once(self):
+        """Run one scrape synchronously; returns the metrics record"""
+        run_id = uuid.uuid4().hex[:12]
+        staging_path = os.path.join(self.staging_dir, f'{run_id}.json')
+        metrics = {
+            'run_id': run_id,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'status': 'failed',
+            'reason': '',
+            'published': False,
+        }
+        started = time.monotonic()
+
+        process = self._context.Process(
+            target=self.scrape,
+            args=(staging_path, self.use_selenium, self.block_resources, self.cpu_limit_seconds),
+            name=f'scrape-{run_id}',
+        )
+        process.start()
+
+        try:
+            watchdog = RunWatchdog(process.pid)  # inside the try: the child may already have exited
+            while process.is_alive():
+                rss_mb = watchdog.sample()
+                elapsed = time.monotonic() - started
+                if rss_mb is not None and self.memory_limit_mb and rss_mb > self.memory_limit_mb:
+                    metrics['reason'] = f"memory limit exceeded ({rss_mb:.0f} MB > {self.memory_limit_mb} MB)"
+                elif self.cpu_limit_seconds and watchdog.cpu_seconds > self.cpu_limit_seconds:
+                    metrics['reason'] = f"CPU time limit exceeded ({watchdog.cpu_seconds:.1f}s > {self.cpu_limit_seconds}s)"
+                elif self.timeout_seconds and elapsed > self.timeout_seconds:
+                    metrics['reason'] = f"timed out after {elapsed:.0f}s"
+                if metrics['reason']:
+                    logger.warning(f"Run {run_id} aborted: {metrics['reason']}")
+                    watchdog.kill_tree()
+                    break
+                process.join(timeout=1.0)
+            process.join(timeout=10)
+
+            if not metrics['reason']:
+                if process.exitcode != 0:
+                    metrics['reason'] = f"scraper exited with code {process.exitcode}"
+                elif not os.path.exists(staging_path):
+                    metrics['reason'] = "scraper produced no output"
+                else:
+                    metrics['bytes'] = os.path.getsize(staging_path)
+                    problem = validate_dataset(staging_path, self.min_bytes, self.min_data_points)
+                    if problem:
+                        metrics['status'] = 'rejected'
+                        metrics['reason'] = problem
+                    else:
+                        self.publish(staging_path, metrics)
+        finally:
+            if os.path.exists(staging_path):
+                os.unlink(staging_path)
+
+        metrics['duration_seconds'] = round(time.monotonic() - started, 2)
+        metrics['peak_rss_mb'] = round(watchdog.peak_rss_mb, 1)
+        metrics['cpu_seconds'] = round(watchdog.cpu_seconds, 2)
+        self.record_metrics(metrics)
+        logger.info(f"Run {run_id} {metrics['status']} in {metrics['duration_seconds']}s"
+                    + (f": {metrics['reason']}" if metrics['reason'] else ''))
+        return metrics
+
+    def _run_in_slot(self):
+        try:
+            self.run_once()
+        except Exception as e:
+            logger.error(f"Scheduled scrape crashed: {e}")
+        finally:
+            self._slots.release()
+
+    def tick(self):
+        """Start a run if a concurrency slot is free, otherwise record the skip"""
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Previous scrape still running; skipping this interval")
+            self.record_metrics({
+                'run_id': None,
+                'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'status': 'skipped',
+                'reason': 'concurrency limit reached',
+                'published': False,
+            })
+            return None
+        thread = threading.Thread(target=self._run_in_slot, daemon=True)
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        logger.info(f"Scrape scheduler started: every {self.interval}s, publishing to {self.data_dir}")
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() >= next_run:
+                self.tick()
+                next_run += self.interval
+            self._stop.wait(timeout=max(0.0, min(1.0, next_run - time.monotonic())))
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    """Run the scrape scheduler from the command line"""
+    parser = argparse.ArgumentParser(description="Scheduled Xbox ROG Ally scraper with bounded resource use")
+    parser.add_argument('--interval', type=int, default=3600, help='seconds between runs')
+    parser.add_argument('--max-concurrent', type=int, default=1, help='maximum overlapping runs')
+    parser.add_argument('--memory-limit-mb', type=int, default=1500, help='RSS cap for scraper + Chrome per run')
+    parser.add_argument('--cpu-limit-seconds', type=int, default=300, help='CPU time cap per run')
+    parser.add_argument('--timeout-seconds', type=int, default=600, help='wall-clock cap per run')
+    parser.add_argument('--data-dir', default='data', help="chatbot data directory to publish into")
+    parser.add_argument('--min-bytes', type=int, default=100_000, help='smallest output accepted for publishing')
+    parser.add_argument('--min-data-points', type=int, default=200, help='fewest data points accepted for publishing')
+    parser.add_argument('--metrics-file', default='scrape_metrics.jsonl', help='JSON-lines file for run metrics')
+    parser.add_argument('--no-selenium', action='store_true', help='requests-only scraping')
+    parser.add_argument('--once', action='store_true', help='run a single scrape and exit')
+    args = parser.parse_args()
+
+    scheduler = ScrapeScheduler(
+        data_dir=args.data_dir,
+        interval=args.interval,
+        max_concurrent=args.max_concurrent,
+        memory_limit_mb=args.memory_limit_mb,
+        cpu_limit_seconds=args.cpu_limit_seconds,
+        timeout_seconds=args.timeout_seconds,
+        min_bytes=args.min_bytes,
+        min_data_points=args.min_data_points,
+        metrics_file=args.metrics_file,
+        use_selenium=not args.no_selenium,
+    )
+
+    if args.once:
+        metrics = scheduler.run_once()
+        raise SystemExit(0 if metrics['published'] else 1)
+
+    try:
+        scheduler.serve_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        logger.info("Scrape scheduler stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import requests
 from bs4 import BeautifulSoup
-import json
 import time
 import re
 from urllib.parse import urljoin, urlparse
 import logging
+import os
+import sys
+from incremental import incremental_scrape, refresh_derived
+from dataset_io import write_dataset
+from text_store import compact_dataset, NEAR_DUPLICATE_THRESHOLD
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -323,7 +327,11 @@ class XboxROGAllyScraper:
             logger.error("Failed to fetch main page")
             return None
         
-        soup = BeautifulSoup(main_content, 'html.parser')
+        return self.extract_from_html(main_content)
+    
+    def extract_from_html(self, page_content):
+        """Extract all data categories from already-fetched page HTML"""
+        soup = BeautifulSoup(page_content, 'html.parser')
         
         # Extract all categories of data
         self.scraped_data = {
@@ -344,15 +352,16 @@ class XboxROGAllyScraper:
         logger.info("Data extraction completed successfully")
         return self.scraped_data
     
-    def save_data(self, filename='xbox_rog_ally_complete_data.json'):
-        """Save scraped data to JSON file"""
+    def save_data(self, filename=os.path.join('data', 'xbox_rog_ally_complete_data.json'), compact=True, compression=None, dedupe=True):
+        """Save scraped data atomically (.jsonl for line-delimited, .gz/.zst for compressed output)"""
         if not self.scraped_data:
             logger.error("No data to save")
             return False
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.scraped_data, f, indent=2, ensure_ascii=False)
+            # Keyword extractors capture the same parent text many times; store each text once
+            data = compact_dataset(self.scraped_data, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD) if dedupe else self.scraped_data
+            write_dataset(data, filename, compact=compact, compression=compression)
             logger.info(f"Data saved to {filename}")
             return True
         except Exception as e:
@@ -391,6 +400,16 @@ def main():
     
     scraper = XboxROGAllyScraper()
     
+    if '--incremental' in sys.argv:
+        manifest = incremental_scrape(scraper)
+        if manifest:
+            print(f"Incremental scrape {manifest['status']}: changed sections {manifest['changed_sections'] + manifest['added_sections'] + manifest['removed_sections']}")
+            for path in refresh_derived(manifest):
+                print(f"Refreshed {path}")
+        else:
+            logger.error("Incremental scraping failed!")
+        return
+    
     # Extract all data
     data = scraper.extract_all_data()
     
@@ -0,0 +1,323 @@
+"""Read-only index segment: the compiled search index in one mmap'd file.
+
+Every worker that parses the datasets and builds passages holds its own copy of
+them. The segment stores the result once, in flat arrays a process can use in
+place: each list of strings is an offset table (uint32, n + 1 entries) into a
+UTF-8 arena, so attaching is an mmap and a read of the small JSON directory at
+the front, and every process (including workers started later) shares the same
+page-cache pages. Passage search runs `mmap.find` over a shard's lowercased arena and maps hits
+back to passages through the offset table; Passage objects are only created
+for hits.
+
+Layout: MAGIC, the directory length (uint32), the JSON directory, then the
+8-byte-aligned tables it lists as [offset, length] from the end of the
+directory. The directory also records the data version (see data_version.py),
+so a segment is not attached once the data it was built from changes, and the
+section order its passages were built with.
+
+Canned answers are not stored: the in-process AnswerTable is a dict lookup
+(about 0.1 us against 1.7 us to find and slice one out of the segment) and
+small next to the passages.
+
+The segment is a build artifact, written next to the datasets. Hosts without a
+writable persistent disk (Vercel's functions only have a scratch /tmp) never
+have one: attach_segment finds no file and shards are parsed from their
+datasets as before, which is also what a first request costs without it.
+
+`python segment.py` writes the enhanced app's segment; a process picks up a
+newly written one when it reloads its data (SIGHUP under serve.py).
+"""
+import importlib
+import json
+import logging
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from dataset_io import atomic_write, load_dataset
+from passages import Passage, build_passages
+from spec_table import extract_rows
+from text_store import text_id
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'XBIDXSG3'
+_HEADER = struct.Struct('<8sI')
+_ALIGN = 8
+
+# Passage paths are stored as components tagged 's' (key) or 'i' (list index), joined by
+# a unit separator: decoding them is several times faster than json.loads
+_PATH_SEPARATOR = '\x1f'
+
+
+def _pad(size):
+    return -size % _ALIGN
+
+
+def encode_path(path):
+    parts = []
+    for part in path:
+        if isinstance(part, int):
+            parts.append(f'i{part}')
+        elif _PATH_SEPARATOR in part:
+            raise ValueError(f"Path component {part!r} contains the separator")
+        else:
+            parts.append('s' + part)
+    return _PATH_SEPARATOR.join(parts)
+
+
+def decode_path(encoded):
+    if not encoded:
+        return ()
+    return tuple(int(part[1:]) if part[0] == 'i' else part[1:] for part in encoded.split(_PATH_SEPARATOR))
+
+
+class _SegmentWriter:
+    """Accumulates named tables and lays them out behind the directory"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.tables = {}
+
+    def add(self, name, data):
+        data = bytes(data)
+        self.tables[name] = [self.size, len(data)]
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = _pad(self.size)
+        if padding:
+            self.chunks.append(b'\0' * padding)
+            self.size += padding
+
+    def add_array(self, name, typecode, values):
+        self.add(name, array(typecode, values).tobytes())
+
+    def add_strings(self, name, strings):
+        """`strings` as an offset table and an arena"""
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = [0]
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        if offsets[-1] > 0xFFFFFFFF:
+            raise ValueError(f"Table {name!r} is too large for 32-bit offsets")
+        self.add_array(name + '.offsets', 'I', offsets)
+        self.add(name + '.arena', b''.join(encoded))
+
+    def write(self, filename, directory):
+        directory = dict(directory, byteorder=sys.byteorder, tables=self.tables)
+        encoded = json.dumps(directory, separators=(',', ':')).encode('utf-8')
+        encoded += b' ' * _pad(_HEADER.size + len(encoded))
+        # Replaced, never rewritten in place: processes still attached keep the old file's pages
+        with atomic_write(filename) as f:
+            f.write(_HEADER.pack(MAGIC, len(encoded)))
+            f.write(encoded)
+            for chunk in self.chunks:
+                f.write(chunk)
+
+
+def write_segment(filename, version, corpus):
+    """Write the passages and spec rows of every shard in `corpus` to `filename`"""
+    writer = _SegmentWriter()
+    shards = {}
+    for name, spec in corpus.specs.items():
+        data = load_dataset(spec.path)
+        passages = build_passages(data, corpus.section_order)
+        sections = sorted({p.section for p in passages})
+        section_ids = {section: i for i, section in enumerate(sections)}
+        prefix = f'shards.{name}'
+        writer.add_strings(prefix + '.texts', [p.text for p in passages])
+        writer.add_strings(prefix + '.lower', [p.text_lower for p in passages])
+        writer.add_strings(prefix + '.paths', [encode_path(p.path) for p in passages])
+        writer.add_array(prefix + '.sections', 'H', [section_ids[p.section] for p in passages])
+        writer.add_array(prefix + '.spans', 'I', [offset for p in passages for offset in (p.start, p.end)])
+        # Text IDs (what the semantic index returns) sorted for binary search, with their passage numbers
+        ids = sorted((int(text_id(p.text), 16), i) for i, p in enumerate(passages))
+        writer.add_array(prefix + '.ids', 'Q', [key for key, _ in ids])
+        writer.add_array(prefix + '.id_passages', 'I', [i for _, i in ids])
+        rows = extract_rows(data, list(spec.models)) if spec.models else {}
+        writer.add(prefix + '.spec_rows', json.dumps(rows, ensure_ascii=False).encode('utf-8'))
+        shards[name] = {'passages': len(passages), 'sections': sections, 'timestamp': data.get('timestamp')}
+
+    writer.write(filename, {
+        'data_version': version,
+        'section_order': list(corpus.section_order),
+        'shards': shards,
+    })
+    return shards
+
+
+class StringTable:
+    """Strings stored as an offset table into a UTF-8 arena in the segment"""
+    __slots__ = ('offsets', '_buffer', '_base')
+
+    def __init__(self, buffer, offsets, base):
+        self.offsets = offsets
+        self._buffer = buffer
+        self._base = base
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return self._buffer[self._base + self.offsets[i]:self._base + self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.offsets) - 1:
+            raise IndexError(i)
+        return self.raw(i).decode('utf-8')
+
+    def find(self, needle, start=0):
+        """Arena offset of the first occurrence of `needle` at or after `start`, or -1"""
+        position = self._buffer.find(needle, self._base + start, self._base + self.offsets[-1])
+        return position - self._base if position >= 0 else -1
+
+
+class SegmentPassages:
+    """A shard's passages read from the segment, indexable like the list build_passages returns"""
+    __slots__ = ('texts', 'lower', 'paths', 'sections', 'spans', 'section_names')
+
+    def __init__(self, texts, lower, paths, sections, spans, section_names):
+        self.texts = texts
+        self.lower = lower
+        self.paths = paths
+        self.sections = sections
+        self.spans = spans
+        self.section_names = section_names
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        text = self.texts[i]
+        path = decode_path(self.paths[i])
+        return Passage(self.section_names[self.sections[i]], path, self.spans[2 * i], self.spans[2 * i + 1], text)
+
+    def search(self, query_lower, limit):
+        """Passages whose lowercased text contains `query_lower`, in order, at most `limit`"""
+        needle = query_lower.encode('utf-8')
+        lower = self.lower
+        offsets = lower.offsets
+        end = offsets[-1]
+        hits = []
+        position = lower.find(needle)
+        while 0 <= position < end and len(hits) < limit:
+            i = bisect_right(offsets, position) - 1
+            if position + len(needle) <= offsets[i + 1]:
+                hits.append(self[i])
+                position = lower.find(needle, offsets[i + 1])
+            else:  # runs into the next passage
+                position = lower.find(needle, position + 1)
+        return hits
+
+
+class SegmentPassageIds:
+    """Text ID -> passage, by binary search over the segment's sorted ID table"""
+    __slots__ = ('ids', 'positions', 'passages')
+
+    def __init__(self, ids, positions, passages):
+        self.ids = ids
+        self.positions = positions
+        self.passages = passages
+
+    def get(self, key, default=None):
+        value = int(key, 16)
+        i = bisect_left(self.ids, value)
+        if i < len(self.ids) and self.ids[i] == value:
+            return self.passages[self.positions[i]]
+        return default
+
+
+class IndexSegment:
+    """An attached segment file; raises ValueError if the file is not a usable segment"""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = self._buffer
+        if len(buffer) < _HEADER.size:
+            raise ValueError(f"{filename} is too short to be an index segment")
+        magic, length = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not an index segment in this format; rewrite it with `python segment.py`")
+        directory = json.loads(buffer[_HEADER.size:_HEADER.size + length])
+        if directory.get('byteorder') != sys.byteorder:
+            raise ValueError(f"{filename} was written on a {directory.get('byteorder')}-endian machine")
+        self.filename = filename
+        self.version = directory['data_version']
+        self.section_order = tuple(directory['section_order'])
+        self._shards = directory['shards']
+        self._tables = directory['tables']
+        self._base = _HEADER.size + length
+        self._view = memoryview(buffer)
+
+    def _table(self, name, typecode='B'):
+        offset, length = self._tables[name]
+        start = self._base + offset
+        view = self._view[start:start + length]
+        return view.cast(typecode) if typecode != 'B' else view
+
+    def _strings(self, name):
+        offset, _ = self._tables[name + '.arena']
+        return StringTable(self._buffer, self._table(name + '.offsets', 'I'), self._base + offset)
+
+    def __contains__(self, shard):
+        return shard in self._shards
+
+    def shard_names(self):
+        return list(self._shards)
+
+    def passages(self, shard):
+        prefix = f'shards.{shard}'
+        return SegmentPassages(self._strings(prefix + '.texts'), self._strings(prefix + '.lower'),
+                               self._strings(prefix + '.paths'), self._table(prefix + '.sections', 'H'),
+                               self._table(prefix + '.spans', 'I'), self._shards[shard]['sections'])
+
+    def passage_ids(self, shard, passages=None):
+        prefix = f'shards.{shard}'
+        return SegmentPassageIds(self._table(prefix + '.ids', 'Q'), self._table(prefix + '.id_passages', 'I'),
+                                 passages if passages is not None else self.passages(shard))
+
+    def spec_rows(self, shard):
+        return json.loads(self._table(f'shards.{shard}.spec_rows').tobytes())
+
+    def timestamp(self, shard):
+        return self._shards[shard].get('timestamp')
+
+
+def attach_segment(filename, version, section_order=()):
+    """The segment at `filename` if it was built from data version `version` with `section_order`, else None.
+
+    An empty `filename` means the segment is disabled.
+    """
+    if not filename:
+        return None
+    try:
+        segment = IndexSegment(filename)
+    except FileNotFoundError:
+        logger.info(f"No index segment at {filename}; shards will be parsed from their datasets")
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring index segment {filename}: {e}")
+        return None
+    if segment.version != version:
+        logger.info(f"Index segment {filename} is stale (data version {segment.version}, now {version})")
+        return None
+    if segment.section_order != tuple(section_order):
+        logger.warning(f"Index segment {filename} was built with a different section order; ignoring it")
+        return None
+    return segment
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    app = importlib.import_module('api.index')
+    shards = app.write_index_segment()
+    passages = sum(shard['passages'] for shard in shards.values())
+    print(f"Wrote {passages} passages from {len(shards)} shard(s) to {app.SEGMENT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Pre-fork production launcher: load and index the data once, then fork the workers.
+
+`uvicorn --workers N` starts N fresh interpreters, each importing the app and
+parsing the datasets itself, so memory grows with the worker count. Here the
+master imports the app, runs its warm_up() and binds the socket, then forks the
+workers, which share the loaded data copy-on-write.
+
+Sharing only survives if the workers do not write to those pages. The master
+keeps the collector disabled while loading (so no freed holes are left between
+long-lived objects) and calls gc.freeze() before forking, which moves every
+object into a permanent generation the workers' collections never traverse;
+without it the first full collection in each worker rewrites the GC header of
+every shared object and copies most of the heap. Refcount updates on objects a
+worker actually touches still copy those pages.
+
+The enhanced app's passages and spec rows live in an index segment (see
+segment.py) that every process maps read-only; the master writes it if it is
+missing or stale. SIGHUP reloads the data: the master rewrites the segment if
+the data changed and every worker attaches the new one.
+
+    python serve.py --workers 4                  # serve the enhanced app on :8000
+    python serve.py --app standard --no-preload  # workers load the app themselves
+    python serve.py --report                     # per-worker memory, with and without preloading
+"""
+import argparse
+import gc
+import importlib
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from quick_answers import APPS, QUICK_QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get('WEB_CONCURRENCY', str(os.cpu_count() or 1)))
+
+# Questions a worker answers before its memory is measured, beyond the quick questions,
+# so searches, shard loads and spec tables are exercised too
+REPORT_QUESTIONS = [
+    'is the screen readable outdoors in sunlight',
+    'how heavy is the ally x',
+    'compare the ally and the ally x battery',
+]
+
+# (label, load in the master, freeze before forking, use the index segment)
+REPORT_MODES = [
+    ('load per worker', False, False, False),
+    ('load per worker, segment', False, False, True),
+    ('preload', True, False, False),
+    ('preload + gc.freeze', True, True, False),
+    ('preload + freeze, segment', True, True, True),
+]
+
+# Setting the app's segment file to '' makes it parse the datasets instead
+SEGMENT_FILE_VARIABLE = 'INDEX_SEGMENT_FILE'
+
+
+def ensure_segment(module):
+    """Write the app's index segment if it has one and it is missing or stale"""
+    ensure = getattr(module, 'ensure_index_segment', None)
+    if ensure is not None:
+        ensure()
+
+
+def load_app(app_name):
+    """Import the app's module and load everything its first requests would"""
+    module = importlib.import_module(APPS[app_name][0])
+    ensure_segment(module)
+    warm_up = getattr(module, 'warm_up', None)
+    if warm_up is not None:
+        warm_up()
+    return module
+
+
+def reload_app(module):
+    """Have the app pick up new data files, if it supports reloading"""
+    reload_data = getattr(module, 'reload_data', None)
+    if reload_data is not None:
+        reload_data()
+
+
+def preload_app(app_name, freeze=True):
+    """Load the app in the master, leaving its objects ready to be shared with forked workers"""
+    gc.disable()
+    module = load_app(app_name)
+    if freeze:
+        gc.freeze()
+    else:
+        gc.enable()
+    return module
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def exercise(module, app_name):
+    """Answer a spread of questions, then run a full collection, as a worker soon would in service"""
+    respond = getattr(module, APPS[app_name][1])
+    for _, question in QUICK_QUESTIONS:
+        respond(question)
+    for question in REPORT_QUESTIONS:
+        respond(question)
+    gc.collect()
+
+
+def spawn_worker(app_name, module, sock, ready_fd=None, log_level='info'):
+    """Fork a worker serving on `sock`; it loads the app itself if the master has not.
+
+    With `ready_fd`, the worker exercises the app and writes a byte to it before serving.
+    """
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        gc.enable()
+        if module is None:
+            module = load_app(app_name)
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_app(module))
+        if ready_fd is not None:
+            exercise(module, app_name)
+            os.write(ready_fd, b'.')
+        config = uvicorn.Config(module.app, log_level=log_level, lifespan='on')
+        uvicorn.Server(config).run(sockets=[sock])
+    except Exception:
+        logger.exception(f"Worker {os.getpid()} failed")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def stop_workers(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def supervise(spawn, workers, reload=None):
+    """Keep `workers` processes from `spawn()` running until SIGINT or SIGTERM, then stop them.
+
+    SIGHUP calls `reload` in the master, then is passed on to every worker.
+    """
+    started = {}
+    for _ in range(workers):
+        started[spawn()] = time.monotonic()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        stop_workers(list(started))
+
+    def hang_up(signum, frame):
+        if reload is not None:
+            reload()
+        for pid in list(started):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, hang_up)
+    while started:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        began = started.pop(pid, None)
+        if stopping or began is None:
+            continue
+        logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; starting another")
+        if time.monotonic() - began < 1:
+            time.sleep(1)  # a worker that dies at startup should not be restarted in a tight loop
+        started[spawn()] = time.monotonic()
+
+
+def serve(app_name='enhanced', host='0.0.0.0', port=8000, workers=DEFAULT_WORKERS, preload=True, log_level='info'):
+    sock = bind_socket(host, port)
+    module = preload_app(app_name) if preload else None
+    logger.info(f"Serving the {app_name} app on {host}:{port} with {workers} workers"
+                f"{' sharing the preloaded data' if preload else ''}")
+
+    def reload():
+        if module is None:
+            return  # each worker reloads from whatever segment is on disk
+        reload_data = getattr(module, 'reload_data', None)
+        if reload_data is not None:
+            reload_data(rebuild=True)
+            gc.freeze()  # share what the reload allocated with workers forked from now on
+
+    supervise(lambda: spawn_worker(app_name, module, sock, log_level=log_level), workers, reload)
+
+
+def memory_usage(pid):
+    """Bytes of a process's memory from /proc/<pid>/smaps_rollup: 'unique' (private pages) and 'pss'"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r', encoding='ascii') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                fields[name] = int(rest.split()[0]) * 1024
+    return {'unique': fields['Private_Clean'] + fields['Private_Dirty'], 'pss': fields['Pss']}
+
+
+def measure_mode(app_name, workers, preload, freeze, segment):
+    """Memory of a master and its workers once every worker has exercised the app"""
+    if not segment:
+        os.environ[SEGMENT_FILE_VARIABLE] = ''
+    sock = bind_socket('127.0.0.1', 0)
+    module = preload_app(app_name, freeze) if preload else None
+    ready_read, ready_write = os.pipe()
+    pids = [spawn_worker(app_name, module, sock, ready_write, log_level='warning') for _ in range(workers)]
+    os.close(ready_write)
+    try:
+        received = 0
+        while received < workers:
+            chunk = os.read(ready_read, workers)
+            if not chunk:
+                raise RuntimeError("a worker exited before it was ready")
+            received += len(chunk)
+        return {'master': memory_usage(os.getpid()), 'workers': [memory_usage(pid) for pid in pids]}
+    finally:
+        stop_workers(pids)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        os.close(ready_read)
+        sock.close()
+
+
+def run_in_child(fn, *args):
+    """JSON result of `fn(*args)` run in a forked process, so the caller's state is left untouched"""
+    result_read, result_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(result_read)
+        status = 0
+        try:
+            os.write(result_write, json.dumps(fn(*args)).encode('utf-8'))
+        except Exception:
+            logger.exception(f"{fn.__name__} failed")
+            status = 1
+        finally:
+            os._exit(status)
+    os.close(result_write)
+    with os.fdopen(result_read, 'rb') as f:
+        output = f.read()
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        raise RuntimeError(f"{fn.__name__} failed in a child process")
+    return json.loads(output)
+
+
+def prepare_segment(app_name):
+    """Write the app's index segment if needed; False if the app has none"""
+    module = importlib.import_module(APPS[app_name][0])
+    ensure_segment(module)
+    return hasattr(module, 'ensure_index_segment')
+
+
+def report(app_name='enhanced', workers=4):
+    """Print per-worker unique RSS and the total PSS for each loading mode"""
+    mib = 1024 * 1024
+    print(f"{app_name} app, {workers} workers, after each answered {len(QUICK_QUESTIONS) + len(REPORT_QUESTIONS)} questions")
+    # Each mode runs in its own process, starting from a master that has loaded nothing
+    has_segment = run_in_child(prepare_segment, app_name)
+    print(f"{'mode':<26} {'unique RSS / worker':>20} {'master unique':>14} {'total PSS':>10}")
+    for label, preload, freeze, segment in REPORT_MODES:
+        if segment and not has_segment:
+            continue
+        usage = run_in_child(measure_mode, app_name, workers, preload, freeze, segment)
+        unique = sum(worker['unique'] for worker in usage['workers']) / workers
+        total_pss = usage['master']['pss'] + sum(worker['pss'] for worker in usage['workers'])
+        print(f"{label:<26} {unique / mib:>16.1f} MiB {usage['master']['unique'] / mib:>10.1f} MiB {total_pss / mib:>6.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--app', choices=sorted(APPS), default='enhanced')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help="let each worker load the app itself, as uvicorn --workers does")
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--report', action='store_true', help="print per-worker memory with and without preloading, then exit")
+    args = parser.parse_args()
+    level = 'WARNING' if args.report else args.log_level.upper()  # the workers' load messages would interleave with the table
+    logging.basicConfig(level=level, format='%(asctime)s %(process)d %(levelname)s %(message)s')
+    workers = max(1, args.workers)
+    if args.report:
+        report(args.app, workers)
+    else:
+        serve(args.app, args.host, args.port, workers, args.preload, args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Per-visitor conversation context, keyed by a cookie.
+
+A session remembers the product and spec topic of the last question, so a
+follow-up like "and the battery on the X?" is answered from the spec table
+instead of falling through to a search. Only sessions that picked up context are
+stored. Entries are small tuples in an LRU map with a TTL and a size cap, so
+memory stays bounded however many visitors arrive. Set SESSION_REDIS_URL (and
+install `redis`) to share sessions between processes instead.
+"""
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import redis
+except ImportError:  # the shared backend is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = 'chat_session'
+SESSION_TTL = int(os.environ.get('SESSION_TTL', '1800'))
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', '50000'))
+SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL')
+
+# Anything else in the cookie is ignored rather than used as a store key
+_SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class Session:
+    """Context carried from one question to the next"""
+    __slots__ = ('id', 'product', 'topic', 'is_new')
+
+    def __init__(self, id=None, product=None, topic=None):
+        self.is_new = id is None
+        self.id = id or secrets.token_urlsafe(16)
+        self.product = product
+        self.topic = topic
+
+    def has_context(self):
+        return self.product is not None or self.topic is not None
+
+
+class MemorySessionStore:
+    """In-process sessions: least recently used are dropped past `max_sessions`, idle ones after `ttl` seconds"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self._entries = OrderedDict()  # id -> (product, topic, expires), oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            product, topic, expires = entry
+            if expires < time.monotonic():
+                del self._entries[session_id]
+                return None
+        return Session(session_id, product, topic)
+
+    def save(self, session):
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries
+            entries[session.id] = (session.product, session.topic, now + self.ttl)
+            entries.move_to_end(session.id)
+            # Every entry has the same TTL, so the expired ones are all at the front
+            while entries:
+                oldest = next(iter(entries.values()))
+                if len(entries) <= self.max_sessions and oldest[2] >= now:
+                    break
+                entries.popitem(last=False)
+
+
+class RedisSessionStore:
+    """Sessions in Redis, shared by every worker; Redis enforces the TTL"""
+
+    def __init__(self, url, ttl=SESSION_TTL, prefix='chat_session:'):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, session_id):
+        product, topic = self._client.hmget(self.prefix + session_id, 'product', 'topic')
+        if product is None and topic is None:
+            return None
+        return Session(session_id, product or None, topic or None)
+
+    def save(self, session):
+        key = self.prefix + session.id
+        pipe = self._client.pipeline()
+        pipe.hset(key, mapping={'product': session.product or '', 'topic': session.topic or ''})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+
+def create_session_store():
+    """Redis store when SESSION_REDIS_URL is set and redis is installed, else an in-memory store"""
+    if SESSION_REDIS_URL:
+        if redis is not None:
+            return RedisSessionStore(SESSION_REDIS_URL)
+        logger.warning("SESSION_REDIS_URL is set but the 'redis' package is not installed; keeping sessions in memory")
+    return MemorySessionStore()
+
+
+def load_session(store, session_id: Optional[str]) -> Session:
+    """The stored session for a cookie value, or a new, empty one"""
+    if session_id and _SESSION_ID_RE.match(session_id):
+        session = store.get(session_id)
+        if session is not None:
+            return session
+    return Session()
@@ -0,0 +1,144 @@
+"""Static export of the page and the answers to known questions, for the Vercel edge.
+
+`python snapshot.py` renders the page and runs the known questions through the
+enhanced app's answer engine, writing:
+
+    public/index.html             the page, quick answers embedded
+    public/answers/manifest.json  {"version", "questions": {message: i}, "answers": [text]}
+
+vercel.json routes `/` and `/answers/*` to these files ahead of the Python
+function, so loading the page and asking a known question never start Python;
+the page looks a question up in the manifest first and only sends the ones it
+does not know to /chat. Re-run after the knowledge base or the scraped data
+change; `--incremental` scrapes do this themselves when the answers changed.
+The page and the manifest are stamped with the data version, and the page
+compares them with /api/data-version, so a deploy that ships new data with an
+old export falls back to asking the server instead of showing stale answers.
+
+Known questions are the quick questions, knowledge/common_questions.txt and a
+phrase for every branch of the enhanced router. Questions whose answer depends
+on, or would update, a visitor's session (spec follow-ups) are left to the server.
+"""
+import argparse
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.join(BASE_DIR, 'public')
+COMMON_QUESTIONS_FILE = os.path.join(BASE_DIR, 'knowledge', 'common_questions.txt')
+
+
+def snapshot_manifest_path(public_dir=PUBLIC_DIR):
+    return os.path.join(public_dir, 'answers', 'manifest.json')
+
+
+def load_snapshot(version, public_dir=PUBLIC_DIR):
+    """Compact JSON body of the exported manifest, or None if there is none or it was built from other data"""
+    try:
+        with open(snapshot_manifest_path(public_dir), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get('version') != version:
+        logger.warning(f"Answer snapshot is stale (data version {manifest.get('version')}, loaded {version}); "
+                       f"not serving it. Re-export with `python snapshot.py`")
+        return None
+    return json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def known_questions(router, quick_questions, filename=COMMON_QUESTIONS_FILE):
+    questions = [question for _, question in quick_questions]
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            questions.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    questions.extend(phrase for phrase, _ in router.branches())
+    return questions
+
+
+def build_snapshot(app_module, questions, version):
+    """Manifest of the stateless answers, each distinct answer stored once"""
+    from coalesce import normalize_message
+
+    index = {}
+    answers = []
+    positions = {}
+    skipped = 0
+    for question in questions:
+        message = normalize_message(question)
+        if message in index:
+            continue
+        body, product, topic = app_module.answer_body(message)
+        if product is not None or topic is not None:
+            skipped += 1  # the session would have learned context from it
+            continue
+        text = json.loads(body)['response']
+        if text not in positions:
+            positions[text] = len(answers)
+            answers.append(text)
+        index[message] = positions[text]
+    return {'version': version, 'questions': index, 'answers': answers}, skipped
+
+
+def render_page(app_module):
+    manifest, _ = app_module.get_quick_answers()
+    template = app_module.get_templates().get_template('index.html')
+    return template.render(quick_questions=app_module.QUICK_QUESTIONS, quick_answers=manifest['answers'],
+                           data_version=manifest['version'])
+
+
+def page_path(public_dir=PUBLIC_DIR):
+    return os.path.join(public_dir, 'index.html')
+
+
+def load_app():
+    import importlib
+    import sys
+
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    return importlib.import_module('api.index')
+
+
+def write_page(app_module, out=PUBLIC_DIR):
+    with open(page_path(out), 'w', encoding='utf-8') as f:
+        f.write(render_page(app_module))
+
+
+def export_page(out=PUBLIC_DIR):
+    """Re-render only the page, e.g. to stamp it with a new data version; the file written"""
+    write_page(load_app(), out)
+    return page_path(out)
+
+
+def export_snapshot(out=PUBLIC_DIR):
+    """Write the page and the answer manifest to `out`; (manifest, session-dependent questions skipped)"""
+    from data_version import compute_data_version
+    from quick_answers import write_manifest
+
+    app_module = load_app()
+    version = compute_data_version()
+    questions = known_questions(app_module.ROUTER, app_module.QUICK_QUESTIONS)
+    manifest, skipped = build_snapshot(app_module, questions, version)
+
+    os.makedirs(os.path.join(out, 'answers'), exist_ok=True)
+    write_manifest(manifest, snapshot_manifest_path(out))
+    write_page(app_module, out)
+    return manifest, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the page and known answers as static files")
+    parser.add_argument('--out', default=PUBLIC_DIR, help="Directory to write the static files to")
+    args = parser.parse_args()
+
+    manifest, skipped = export_snapshot(args.out)
+    print(f"Wrote {len(manifest['questions'])} questions ({len(manifest['answers'])} distinct answers, "
+          f"{skipped} session-dependent skipped) to {snapshot_manifest_path(args.out)}")
+    print(f"Wrote the page to {page_path(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
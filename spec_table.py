@@ -0,0 +1,299 @@
+"""Typed per-model spec table extracted from the scraped spec tabs.
+
+The product page's spec table is scraped as one string per row, label and
+per-model values glued together:
+
+    'MemoryROG Xbox Ally X24 GB LPDDR5X-8000ROG Xbox Ally16 GB LPDDR5X-6400'
+
+`build_spec_table` splits those rows on the model names, parses the numbers out
+and precomposes an answer for every (attribute, model) and every comparison, so
+a spec question is a dict lookup rather than a text search.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from knowledge import encode_response
+from passages import iter_text_values
+
+# Scraped row label -> attribute
+ROW_LABELS = {
+    'Operating System': 'os',
+    'Processor': 'processor',
+    'Memory': 'memory',
+    'Storage': 'storage',
+    'Display': 'display',
+    'IO Ports': 'ports',
+    'Network and Communication': 'network',
+    'Dimensions': 'dimensions',
+    'Battery': 'battery',
+}
+
+ATTRIBUTE_NAMES = {
+    'os': 'Operating system',
+    'processor': 'Processor',
+    'memory': 'Memory',
+    'storage': 'Storage',
+    'display': 'Display',
+    'ports': 'Ports',
+    'network': 'Wireless',
+    'dimensions': 'Dimensions',
+    'weight': 'Weight',
+    'battery': 'Battery',
+}
+
+# Words that point a question at an attribute
+ATTRIBUTE_KEYWORDS = {
+    'memory': ['ram', 'memory', 'lpddr5x'],
+    'storage': ['storage', 'ssd', 'space'],
+    'processor': ['processor', 'cpu', 'chip', 'apu', 'ryzen', 'z2'],
+    'battery': ['battery', 'wh', 'battery life'],
+    'weight': ['weight', 'weigh', 'weighs', 'heavy', 'heavier', 'lighter'],
+    'dimensions': ['size', 'dimensions', 'bigger', 'smaller', 'thick', 'thicker'],
+    'ports': ['ports', 'port', 'usb', 'thunderbolt', 'usb4'],
+    'display': ['display', 'screen'],
+    'network': ['wifi', 'wi-fi', 'bluetooth'],
+    'os': ['operating system', 'os'],
+}
+
+COMPARISON_WORDS = ['compare', 'comparison', 'difference', 'differences', 'differ', 'different', 'vs', 'versus',
+                    'more', 'less', 'which', 'better', 'bigger', 'smaller', 'heavier', 'lighter', 'between', 'both']
+
+# Numeric attributes: (field, unit, how the difference is stated)
+NUMERIC = {
+    'memory': ('memory_gb', 'GB', "The {high} has {difference} ({percent}%) more memory."),
+    'storage': ('storage_gb', 'GB', "The {high} has {difference} ({percent}%) more storage."),
+    'battery': ('battery_wh', 'Wh', "The {high} has {difference} ({percent}%) more battery capacity."),
+    'weight': ('weight_g', 'g', "The {high} is {difference} ({percent}%) heavier than the {low}."),
+}
+
+
+def _word_re(words: Iterable[str]):
+    return re.compile(r'\b(?:' + '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True)) + r')\b')
+
+
+_ATTRIBUTE_RES = {attribute: _word_re(words) for attribute, words in ATTRIBUTE_KEYWORDS.items()}
+_COMPARISON_RE = _word_re(COMPARISON_WORDS)
+
+
+@dataclass(frozen=True)
+class ModelSpecs:
+    """One model's parsed spec sheet; a field is None when the page did not say"""
+    __slots__ = ('model', 'os', 'processor', 'memory', 'memory_gb', 'storage', 'storage_gb', 'display',
+                 'ports', 'network', 'dimensions', 'dimensions_mm', 'weight_g', 'battery', 'battery_wh')
+    model: str
+    os: Optional[str]
+    processor: Optional[str]
+    memory: Optional[str]
+    memory_gb: Optional[int]
+    storage: Optional[str]
+    storage_gb: Optional[int]
+    display: Optional[str]
+    ports: Tuple[str, ...]
+    network: Optional[str]
+    dimensions: Optional[str]
+    dimensions_mm: Optional[Tuple[float, float, float]]
+    weight_g: Optional[int]
+    battery: Optional[str]
+    battery_wh: Optional[int]
+
+    def value(self, attribute: str) -> Optional[str]:
+        """Display form of an attribute"""
+        if attribute == 'ports':
+            return '; '.join(self.ports) or None
+        if attribute == 'weight':
+            return None if self.weight_g is None else f'{self.weight_g} g'
+        return getattr(self, attribute)
+
+
+def _unglue(text: str) -> str:
+    """Re-insert the separators get_text(strip=True) dropped between spec fragments"""
+    text = re.sub(r'(?<=\d:9)(?=\d{2,3}Hz)', ', ', text)
+    text = re.sub(r'(?<=[a-z])(?=[A-Z]{2,})', ', ', text)
+    text = re.sub(r'\)(?=[A-Z])', '), ', text)
+    return text.strip()
+
+
+def _split_ports(text: str) -> Tuple[str, ...]:
+    """'2x USB ... 3.01x UHS-II ...' -> ('2x USB ... 3.0', '1x UHS-II ...')"""
+    starts = [m.start() for m in re.finditer(r'\dx ', text)
+              if m.start() == 0 or not text[m.start() - 1].isdigit() or text[m.start() - 2:m.start()][:1] == '.']
+    if not starts:
+        return (text,) if text else ()
+    starts.append(len(text))
+    return tuple(text[a:b].strip() for a, b in zip(starts, starts[1:]) if text[a:b].strip())
+
+
+def _number(pattern: str, text: Optional[str], cast=int):
+    match = re.search(pattern, text or '')
+    return cast(match.group(1)) if match else None
+
+
+def _split_row(body: str, models: List[str]) -> Dict[str, str]:
+    """Per-model values of one row; "A and B" before a value assigns it to both"""
+    names = sorted(models, key=len, reverse=True)
+    both = ' and '.join(models)
+    marker = re.compile('|'.join(re.escape(n) for n in [both] + names))
+    values = {}
+    matches = list(marker.finditer(body))
+    for match, following in zip(matches, matches[1:] + [None]):
+        value = body[match.end():following.start() if following else len(body)]
+        targets = models if match.group() == both else [match.group()]
+        for model in targets:
+            if value and model not in values:
+                values[model] = value
+    return values
+
+
+def extract_rows(data: Dict, models: List[str]) -> Dict[str, Dict[str, str]]:
+    """{attribute: {model: raw value}} from the scraped spec-table rows.
+
+    Container elements repeat their rows glued together, so the shortest text
+    that starts with a label is taken to be that row.
+    """
+    candidates = {}
+    labels = sorted(ROW_LABELS, key=len, reverse=True)
+    for _, text in iter_text_values(data.get('all_tabs_and_sections', {})):
+        label = next((l for l in labels if text.startswith(l)), None)
+        if label is None:
+            continue
+        best = candidates.get(label)
+        if best is None or len(text) < len(best):
+            values = _split_row(text[len(label):], models)
+            if values:
+                candidates[label] = text
+    return {ROW_LABELS[label]: _split_row(text[len(label):], models) for label, text in candidates.items()}
+
+
+def parse_model(model: str, rows: Dict[str, Dict[str, str]]) -> ModelSpecs:
+    raw = {attribute: values.get(model) for attribute, values in rows.items()}
+    dimensions = raw.get('dimensions')
+    dims_match = re.search(r'([\d.]+)\s*[*x×]\s*([\d.]+)\s*[*x×]\s*([\d.]+)\s*mm', dimensions or '')
+    memory = raw.get('memory')
+    storage = raw.get('storage')
+    battery = raw.get('battery')
+    storage_gb = _number(r'(\d+)\s*TB', storage)
+    storage_gb = storage_gb * 1024 if storage_gb is not None else _number(r'(\d+)\s*GB', storage)
+    battery_wh = _number(r'(\d+)\s*Wh', battery)
+    return ModelSpecs(
+        model=model,
+        os=raw.get('os'),
+        processor=raw.get('processor'),
+        memory=memory,
+        memory_gb=_number(r'(\d+)\s*GB', memory),
+        storage=storage,
+        storage_gb=storage_gb,
+        display=_unglue(raw['display']) if raw.get('display') else None,
+        ports=_split_ports(raw.get('ports') or ''),
+        network=raw.get('network'),
+        dimensions=' x '.join(dims_match.groups()) + ' mm' if dims_match else dimensions,
+        dimensions_mm=tuple(float(x) for x in dims_match.groups()) if dims_match else None,
+        weight_g=_number(r'mm\s*(\d+)\s*g', dimensions),
+        battery=f'{battery_wh} Wh' if battery_wh is not None else battery,
+        battery_wh=battery_wh,
+    )
+
+
+class SpecTable:
+    """Per-model specs with every single-model and comparison answer composed up front"""
+    __slots__ = ('models', 'model_aliases', 'answers', '_json', '_model_re')
+
+    def __init__(self, models: Dict[str, ModelSpecs], model_aliases: Dict[str, List[str]]):
+        self.models = models
+        self.model_aliases = {alias.lower(): model for model, aliases in model_aliases.items() for alias in aliases}
+        self._model_re = _word_re(self.model_aliases) if self.model_aliases else None
+        self.answers: Dict[Tuple[str, Optional[str]], str] = {}
+        for attribute in ATTRIBUTE_NAMES:
+            text = self._compare(attribute)
+            if text:
+                self.answers[attribute, None] = text
+            for name, specs in models.items():
+                value = specs.value(attribute)
+                if value:
+                    self.answers[attribute, name] = f"{ATTRIBUTE_NAMES[attribute]} of the {name}: {value}."
+        self._json = {key: encode_response(text) for key, text in self.answers.items()}
+
+    def __len__(self):
+        return len(self.models)
+
+    def get(self, model: str, attribute: str):
+        return self.models[model].value(attribute)
+
+    def _compare(self, attribute: str) -> Optional[str]:
+        specs = [s for s in self.models.values() if s.value(attribute)]
+        if not specs:
+            return None
+        name = ATTRIBUTE_NAMES[attribute]
+        if len({s.value(attribute) for s in specs}) == 1:
+            return f"{name}: both the {' and the '.join(s.model for s in specs)} have {specs[0].value(attribute)}."
+        lines = [f"{name} — " + '; '.join(f"{s.model}: {s.value(attribute)}" for s in specs) + '.']
+        if attribute in NUMERIC and len(specs) == 2:
+            field, unit, template = NUMERIC[attribute]
+            high, low = sorted(specs, key=lambda s: getattr(s, field) or 0, reverse=True)
+            a, b = getattr(high, field), getattr(low, field)
+            if a and b and a != b:
+                difference = a - b
+                shown = f"{difference // 1024} TB" if unit == 'GB' and difference % 1024 == 0 else f"{difference} {unit}"
+                lines.append(template.format(high=high.model, low=low.model, difference=shown, percent=round(100 * difference / b)))
+        return ' '.join(lines)
+
+    def mentioned_models(self, message: str) -> List[str]:
+        """Models a lowercased message names, in order of first mention"""
+        mentioned = []
+        if self._model_re is not None:
+            for match in self._model_re.finditer(message):
+                model = self.model_aliases[match.group()]
+                if model not in mentioned:
+                    mentioned.append(model)
+        return mentioned
+
+    def lookup(self, message: str, model: Optional[str] = None,
+               attribute: Optional[str] = None) -> Optional[Tuple[str, Optional[str]]]:
+        """(attribute, model or None for a comparison) a spec question asks about, or None.
+
+        `model` and `attribute` are the context of the previous question: a follow-up
+        that names only an attribute is about the last model, and one that names only
+        a model ("what about the ally x?") is about the last attribute.
+        """
+        message = message.lower()
+        mentioned = self.mentioned_models(message)
+        asked = spec_attribute(message)
+        if asked is None:
+            if attribute is None or not mentioned:
+                return None
+            asked = attribute
+        if _COMPARISON_RE.search(message) or len(mentioned) > 1:
+            key = (asked, None)
+        elif mentioned:
+            key = (asked, mentioned[0])
+        elif model in self.models:
+            key = (asked, model)
+        else:
+            return None
+        return key if key in self.answers else None
+
+    def answer(self, message: str) -> Optional[str]:
+        key = self.lookup(message)
+        return None if key is None else self.answers[key]
+
+    def json(self, key: Tuple[str, Optional[str]]) -> bytes:
+        """Pre-encoded response body of an answer"""
+        return self._json[key]
+
+
+def spec_attribute(message: str) -> Optional[str]:
+    """The spec attribute a lowercased message mentions, if any"""
+    return next((a for a, pattern in _ATTRIBUTE_RES.items() if pattern.search(message)), None)
+
+
+def build_spec_table(data: Dict, model_aliases: Dict[str, List[str]]) -> Optional[SpecTable]:
+    """Spec table for the models named in `model_aliases`, or None if the page has no spec rows"""
+    rows = extract_rows(data, list(model_aliases)) if model_aliases else {}
+    return spec_table_from_rows(rows, model_aliases)
+
+
+def spec_table_from_rows(rows: Dict[str, Dict[str, str]], model_aliases: Dict[str, List[str]]) -> Optional[SpecTable]:
+    """Spec table from rows already extracted by extract_rows, or None if there are none"""
+    if not rows:
+        return None
+    return SpecTable({model: parse_model(model, rows) for model in model_aliases}, model_aliases)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live at the top level of the repository and api/, not in a package
+for path in (ROOT, os.path.join(ROOT, 'api')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Answer from the datasets on disk rather than whatever index segment a local run left behind
+os.environ['INDEX_SEGMENT_FILE'] = ''
+
+
+def call(app, method, path, **kwargs):
+    """Response from one request to an ASGI app, made without a server"""
+    import asyncio
+
+    import httpx
+
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return await client.request(method, path, **kwargs)
+
+    return asyncio.run(send())
@@ -0,0 +1,68 @@
+import importlib
+
+import pytest
+
+import admission
+import main
+from admission import ConcurrencyLimit, RateLimiter
+
+from conftest import call
+
+enhanced = importlib.import_module('api.index')
+
+
+def test_rate_limiter_refuses_past_the_burst_and_says_when_to_retry():
+    limiter = RateLimiter(per_minute=60, burst=2)
+    assert limiter.check('a') == 0
+    assert limiter.check('a') == 0
+    assert limiter.check('a') == pytest.approx(1, abs=0.05)
+    assert limiter.check('b') == 0  # buckets are per client
+    assert (limiter.allowed, limiter.limited) == (3, 1)
+
+
+def test_rate_limiter_forgets_the_least_recently_seen_client():
+    limiter = RateLimiter(per_minute=60, burst=1, max_clients=2)
+    for key in ('a', 'b', 'c'):
+        limiter.check(key)
+    assert len(limiter) == 2
+    assert limiter.check('a') == 0  # a fresh bucket
+
+
+def test_concurrency_limit_sheds_instead_of_queueing():
+    limit = ConcurrencyLimit(1)
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+    limit.release()
+    assert limit.try_acquire()
+    assert (limit.peak, limit.shed) == (1, 1)
+
+
+def test_client_address_trusts_only_the_proxy_hops():
+    class FakeRequest:
+        headers = {'x-forwarded-for': 'spoofed, 203.0.113.7'}
+        client = None
+
+    assert admission.client_address(FakeRequest(), hops=1) == '203.0.113.7'
+    assert admission.client_address(FakeRequest(), hops=0) == 'unknown'
+
+
+@pytest.mark.parametrize('app_module', [main, enhanced], ids=['standard', 'enhanced'])
+def test_chat_endpoints_answer_429_over_the_rate_limit(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'RATE_LIMITER', RateLimiter(per_minute=1, burst=1))
+    ok = call(app_module.app, 'POST', '/chat', data={'message': 'how much ram'})
+    assert ok.status_code == 200
+    limited = call(app_module.app, 'GET', '/api/chat', params={'message': 'how much storage'})
+    assert limited.status_code == 429
+    assert int(limited.headers['retry-after']) >= 1
+    assert 'etag' not in limited.headers
+
+
+@pytest.mark.parametrize('app_module', [main, enhanced], ids=['standard', 'enhanced'])
+def test_chat_endpoints_answer_429_when_every_slot_is_busy(app_module, monkeypatch):
+    busy = ConcurrencyLimit(1)
+    busy.try_acquire()
+    monkeypatch.setattr(app_module, 'RATE_LIMITER', RateLimiter())
+    monkeypatch.setattr(app_module, 'ADMISSION', busy)
+    response = call(app_module.app, 'POST', '/chat', data={'message': 'what is the weight of the ally x'})
+    assert response.status_code == 429
+    assert response.headers['retry-after'] == '1'
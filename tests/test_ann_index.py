@@ -0,0 +1,37 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from ann_index import IVFIndex  # noqa: E402
+
+
+def unit_vectors(n, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_probed_rows_stay_under_the_cap_as_the_corpus_grows():
+    for n in (1_000, 20_000):
+        vectors = unit_vectors(n)
+        ivf = IVFIndex.train(vectors)
+        largest_bucket = int(np.max(np.diff(ivf.list_offsets)))
+        for query in vectors[:20]:
+            assert len(ivf.candidates(query, nprobe=64, max_rows=200)) <= max(200, largest_bucket)
+
+
+def test_closest_bucket_is_always_probed():
+    vectors = unit_vectors(2_000)
+    ivf = IVFIndex.train(vectors)
+    query = vectors[0]
+    closest = int(np.argmax(ivf.centroids @ query))
+    rows = set(ivf.candidates(query, max_rows=1).tolist())
+    bucket = ivf.list_rows[ivf.list_offsets[closest]:ivf.list_offsets[closest + 1]]
+    assert rows == set(bucket.tolist())
+
+
+def test_search_finds_an_indexed_vector():
+    vectors = unit_vectors(5_000)
+    ivf = IVFIndex.train(vectors)
+    scores, rows = ivf.search(vectors, vectors[42], k=1)
+    assert rows[0] == 42
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
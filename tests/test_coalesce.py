@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+from coalesce import SingleFlight, normalize_message
+
+
+def test_messages_are_keyed_case_and_whitespace_insensitively():
+    assert normalize_message('  How much\tRAM \n') == 'how much ram'
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute(message):
+        calls.append(message)
+        release.wait(5)
+        return message.upper()
+
+    async def burst():
+        waiting = [asyncio.ensure_future(flight.run(key, compute, key)) for key in ['ram'] * 5 + ['storage']]
+        while len(calls) < 2:
+            await asyncio.sleep(0.001)
+        assert len(flight) == 2
+        release.set()
+        return await asyncio.gather(*waiting)
+
+    assert asyncio.run(burst()) == ['RAM'] * 5 + ['STORAGE']
+    assert sorted(calls) == ['ram', 'storage']
+    assert flight.stats() == {'in_flight': 0, 'computed': 2, 'coalesced': 4}
+
+
+def test_results_are_not_cached_once_the_computation_finishes():
+    flight = SingleFlight()
+    calls = []
+
+    async def twice():
+        for _ in range(2):
+            await flight.run('ram', calls.append, 'ram')
+
+    asyncio.run(twice())
+    assert calls == ['ram', 'ram']
+
+
+def test_every_waiter_sees_the_error():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("no answer")
+
+    async def burst():
+        return await asyncio.gather(*(flight.run('key', fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.run('key', lambda: release.wait(5) and 'answer'))
+        second = asyncio.ensure_future(flight.run('key', lambda: 'unused'))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == 'answer'
@@ -0,0 +1,35 @@
+import os
+import stat
+
+import pytest
+
+from dataset_io import atomic_write, load_dataset, write_dataset
+
+
+def test_atomic_write_replaces_the_file_readable_by_all(tmp_path):
+    filename = tmp_path / 'out.bin'
+    filename.write_bytes(b'old')
+    with atomic_write(str(filename)) as f:
+        f.write(b'new')
+    assert filename.read_bytes() == b'new'
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+    assert os.listdir(tmp_path) == ['out.bin']
+
+
+def test_a_failed_write_leaves_the_previous_file(tmp_path):
+    filename = tmp_path / 'out.bin'
+    filename.write_bytes(b'old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(filename)) as f:
+            f.write(b'partial')
+            raise RuntimeError("scrape failed")
+    assert filename.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['out.bin']
+
+
+@pytest.mark.parametrize('name', ['data.json', 'data.jsonl', 'data.json.gz'])
+def test_datasets_round_trip(tmp_path, name):
+    data = {'timestamp': '2026-10-19', 'main_content': {'headings': ['Xbox full screen experience']}, 'empty': {}}
+    filename = str(tmp_path / name)
+    write_dataset(data, filename)
+    assert load_dataset(filename) == data
@@ -0,0 +1,101 @@
+import importlib
+import json
+import re
+
+import pytest
+
+import main
+from conftest import call
+from data_version import data_version
+from http_cache import answer_etag, etag_matches
+from response_encoding import accepted_encoding
+from snapshot import PUBLIC_DIR, snapshot_manifest_path
+
+enhanced = importlib.import_module('api.index')
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    from admission import RateLimiter
+    for module in (main, enhanced):
+        monkeypatch.setattr(module, 'RATE_LIMITER', RateLimiter(per_minute=6000, burst=1000))
+
+
+def test_etag_comparison_is_weak():
+    etag = answer_etag('v1', 'how much ram')
+    assert etag_matches(etag.removeprefix('W/'), etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(answer_etag('v2', 'how much ram'), etag)
+
+
+@pytest.mark.parametrize('app_module', [main, enhanced], ids=['standard', 'enhanced'])
+def test_api_chat_revalidates_with_304(app_module):
+    first = call(app_module.app, 'GET', '/api/chat', params={'message': 'How much RAM'})
+    assert first.status_code == 200
+    etag = first.headers['etag']
+    assert etag == answer_etag(data_version(), 'how much ram')
+    again = call(app_module.app, 'GET', '/api/chat', params={'message': 'how much  ram'}, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.content == b''
+
+
+def test_public_answers_of_the_enhanced_app_vary_on_cookie():
+    first = call(enhanced.app, 'GET', '/api/chat', params={'message': 'how much ram'})
+    assert first.headers['cache-control'].startswith('public')
+    assert {v.strip().lower() for v in first.headers['vary'].split(',')} >= {'accept-encoding', 'cookie'}
+    again = call(enhanced.app, 'GET', '/api/chat', params={'message': 'how much ram'},
+                 headers={'If-None-Match': first.headers['etag']})
+    assert again.status_code == 304
+    assert 'cookie' in again.headers['vary'].lower()
+
+
+def test_api_chat_with_a_session_is_not_cached():
+    response = call(enhanced.app, 'GET', '/api/chat', params={'message': 'how much ram'},
+                    headers={'Cookie': 'chat_session=unknown'})
+    assert response.status_code == 200
+    assert 'etag' not in response.headers
+    assert response.headers['cache-control'] == 'private, no-store'
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('gzip;q=0, identity', None),
+    ('*', 'gzip'),
+    ('', None),
+])
+def test_accepted_encoding_without_brotli(header, expected, monkeypatch):
+    monkeypatch.setattr('response_encoding.brotli', None)
+    assert accepted_encoding(header) == expected
+
+
+def test_page_is_compressed_when_accepted():
+    response = call(main.app, 'GET', '/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] in ('gzip', 'br')
+    assert 'Accept-Encoding' in response.headers['vary']
+    plain = call(main.app, 'GET', '/', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    assert response.text == plain.text
+
+
+def test_short_answers_are_sent_uncompressed():
+    response = call(main.app, 'GET', '/api/data-version', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+    assert response.json()['version'] == data_version()
+
+
+@pytest.mark.parametrize('app_module', [main, enhanced], ids=['standard', 'enhanced'])
+def test_data_version_matches_the_rendered_page(app_module):
+    version = call(app_module.app, 'GET', '/api/data-version').json()['version']
+    assert version == data_version()
+    page = call(app_module.app, 'GET', '/').text
+    assert f'const PAGE_VERSION = "{version}";' in page
+
+
+def test_static_export_is_current():
+    with open(snapshot_manifest_path(PUBLIC_DIR), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(f'{PUBLIC_DIR}/index.html', 'r', encoding='utf-8') as f:
+        page = f.read()
+    assert manifest['version'] == data_version(), "re-export with `python snapshot.py`"
+    assert re.search(r'const PAGE_VERSION = "(\w+)";', page).group(1) == manifest['version']
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+
+import pytest
+import requests
+
+from dataset_io import load_dataset, write_dataset
+from incremental import ScrapeState, incremental_scrape, manifest_path, state_path
+
+URL = 'https://example.com/rog-xbox-ally'
+
+PAGE = {
+    'main_content': {'headings': ['Xbox full screen experience']},
+    'comprehensive_specifications': {'Weight': '715 g'},
+    'gaming_features': ['Game Bar'],
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for {URL}")
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        return self.response
+
+
+class FakeScraper:
+    """The parts of the scrapers incremental_scrape uses; the page HTML is the extracted JSON"""
+    use_selenium = False
+    base_url = URL
+
+    def __init__(self, response):
+        self.session = FakeSession(response)
+        self.scraped_data = None
+        self.extracted = 0
+
+    def extract_from_html(self, page_content):
+        self.extracted += 1
+        return dict(json.loads(page_content), url=URL, timestamp='2026-10-20 00:00:00')
+
+    def save_data(self, filename):
+        write_dataset(self.scraped_data, filename)
+        return True
+
+
+def page_response(page, status_code=200, etag='"v2"'):
+    return FakeResponse(status_code, json.dumps(page), {'ETag': etag})
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """A dataset scraped earlier, with the validators and hashes of that run"""
+    filename = str(tmp_path / 'xbox_rog_ally_complete_data.json')
+    scraper = FakeScraper(page_response(PAGE, etag='"v1"'))
+    assert incremental_scrape(scraper, filename)['status'] == 'updated'
+    return filename
+
+
+def read_manifest(filename):
+    with open(manifest_path(filename), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_a_not_modified_page_is_not_parsed(data_file):
+    before = load_dataset(data_file)
+    scraper = FakeScraper(FakeResponse(304))
+    manifest = incremental_scrape(scraper, data_file)
+
+    assert scraper.session.requests == [{'If-None-Match': '"v1"'}]
+    assert scraper.extracted == 0
+    assert manifest['status'] == 'unchanged'
+    assert manifest['data_version'] == manifest['previous_data_version']
+    assert load_dataset(data_file) == before
+    assert read_manifest(data_file)['status'] == 'unchanged'
+
+
+def test_an_identical_body_is_not_parsed(data_file):
+    with open(data_file, 'rb') as f:
+        stored = f.read()
+    scraper = FakeScraper(page_response(PAGE, etag='"v1-again"'))
+    manifest = incremental_scrape(scraper, data_file)
+
+    assert scraper.extracted == 0
+    assert manifest['status'] == 'unchanged'
+    with open(data_file, 'rb') as f:
+        assert f.read() == stored
+    # The new validators are remembered for the next conditional request
+    assert ScrapeState.load(state_path(data_file)).conditional_headers(URL) == {'If-None-Match': '"v1-again"'}
+
+
+def test_only_the_changed_section_is_rewritten(data_file):
+    page = dict(PAGE, comprehensive_specifications={'Weight': '720 g'})
+    manifest = incremental_scrape(FakeScraper(page_response(page)), data_file)
+
+    assert manifest['status'] == 'updated'
+    assert manifest['changed_sections'] == ['comprehensive_specifications']
+    assert manifest['added_sections'] == manifest['removed_sections'] == []
+    assert manifest['previous_data_version'] != manifest['data_version']
+    data = load_dataset(data_file)
+    assert data['comprehensive_specifications'] == {'Weight': '720 g'}
+    assert data['main_content'] == PAGE['main_content']
+    assert data['timestamp'] == '2026-10-20 00:00:00'
+    assert read_manifest(data_file) == manifest
+
+
+def test_a_changed_body_with_the_same_sections_keeps_the_file(data_file):
+    with open(data_file, 'rb') as f:
+        stored = f.read()
+    response = FakeResponse(200, json.dumps(PAGE) + '\n<!-- new tracking pixel -->', {'ETag': '"v2"'})
+    response.text = json.dumps(PAGE)  # what the extractor sees is the same
+    manifest = incremental_scrape(FakeScraper(response), data_file)
+
+    assert manifest['status'] == 'unchanged'
+    with open(data_file, 'rb') as f:
+        assert f.read() == stored
+
+
+def test_sections_missing_from_the_page_are_removed(data_file):
+    page = {key: value for key, value in PAGE.items() if key != 'gaming_features'}
+    manifest = incremental_scrape(FakeScraper(page_response(page)), data_file)
+
+    assert manifest['removed_sections'] == ['gaming_features']
+    assert 'gaming_features' not in load_dataset(data_file)
+
+
+@pytest.mark.parametrize('response', [FakeResponse(404), FakeResponse(410)])
+def test_a_page_that_disappears_leaves_the_data_alone(data_file, response):
+    before = load_dataset(data_file)
+    manifest_before = read_manifest(data_file)
+    assert incremental_scrape(FakeScraper(response), data_file) is None
+    assert load_dataset(data_file) == before
+    assert read_manifest(data_file) == manifest_before
+
+
+def test_an_unreachable_page_leaves_the_data_alone(data_file):
+    class Unreachable(FakeSession):
+        def get(self, url, headers=None, timeout=None):
+            raise requests.ConnectionError("name resolution failed")
+
+    scraper = FakeScraper(None)
+    scraper.session = Unreachable(None)
+    before = load_dataset(data_file)
+    assert incremental_scrape(scraper, data_file) is None
+    assert load_dataset(data_file) == before
+
+
+def test_the_first_scrape_sends_no_validators(tmp_path):
+    filename = str(tmp_path / 'xbox_rog_ally_complete_data.json')
+    scraper = FakeScraper(page_response(PAGE))
+    manifest = incremental_scrape(scraper, filename)
+    assert scraper.session.requests == [{}]
+    assert sorted(manifest['added_sections']) == sorted(PAGE)
+    assert os.path.exists(filename)
+    assert ScrapeState.load(state_path(filename)).pages[URL]['body_hash'] == hashlib.sha256(
+        json.dumps(PAGE).encode('utf-8')).hexdigest()
@@ -0,0 +1,45 @@
+from passages import build_passages, looks_like_menu, split_spans
+
+
+def passage_texts(data):
+    return [p.text for p in build_passages(data)]
+
+
+def test_spec_rows_are_not_split_on_pipes():
+    texts = passage_texts({'main_content': {'paragraphs': ['ROG Xbox Ally X|24GB RAM|1TB']}})
+    assert texts == ['ROG Xbox Ally X|24GB RAM|1TB']
+
+
+def test_short_headings_are_kept():
+    headings = [{'level': 'h3', 'text': name} for name in ('Battery', 'Storage', 'Memory', 'Dimensions', 'Processor')]
+    texts = passage_texts({'main_content': {'headings': headings}})
+    assert texts == ['Battery', 'Storage', 'Memory', 'Dimensions', 'Processor']
+
+
+def test_short_fragments_of_split_values_are_dropped():
+    texts = passage_texts({'main_content': {'paragraphs': ['Play for hours. Yes. Then charge it over USB-C.']}})
+    assert texts == ['Play for hours.', 'Then charge it over USB-C.']
+
+
+def test_glued_sentences_are_split():
+    text = 'Xbox games on a handheld.Power of Xbox in your hands'
+    assert [text[start:end] for start, end in split_spans(text)] == ['Xbox games on a handheld.', 'Power of Xbox in your hands']
+
+
+def test_flattened_menus_are_dropped_but_spec_tables_kept():
+    menu = 'Help topicsHelp topicsAccount & profileSubscriptions & billingHardware & networkingFamily & online safety'
+    specs = 'DimensionsROG Xbox Ally X290.8*121.5*50.7mm715gROG Xbox Ally290.8*121.5*50.7mm670g'
+    assert looks_like_menu(menu)
+    assert not looks_like_menu(specs)
+    assert passage_texts({'all_tabs_and_sections': {'nav': {'content': menu}, 'specs': {'content': specs}}}) == [specs]
+
+
+def test_script_fragments_are_dropped():
+    assert passage_texts({'comprehensive_specifications': {'flags': 'hack","xbena971","storagemanage'}}) == []
+
+
+def test_long_spec_text_is_cut_where_a_label_starts():
+    text = 'Network and CommunicationROG Xbox AllyWiFi 6E + Bluetooth 5.4' * 4 + 'DimensionsROG Xbox Ally X290.8*121.5*50.7mm715g'
+    pieces = [text[start:end] for start, end in split_spans(text, limit=260)]
+    assert pieces[-1].startswith('Dimensions')
+    assert all(len(piece) <= 260 for piece in pieces)
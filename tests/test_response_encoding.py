@@ -0,0 +1,102 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+import response_encoding
+from conftest import call
+from response_encoding import CompressionMiddleware
+
+BIG = b'{"response":"' + b'The ROG Xbox Ally X has 24 GB of memory. ' * 40 + b'"}'
+SMALL = b'{"response":"Hi!"}'
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+
+@app.get('/big')
+async def big():
+    return Response(content=BIG, media_type='application/json', headers={'Vary': 'Cookie'})
+
+
+@app.get('/small')
+async def small():
+    return Response(content=SMALL, media_type='application/json')
+
+
+@app.get('/not-modified')
+async def not_modified():
+    return Response(status_code=304, headers={'ETag': 'W/"v1"', 'Vary': 'Accept-Encoding, Cookie'})
+
+
+@app.get('/too-many')
+async def too_many():
+    return Response(content=BIG, status_code=429, media_type='application/json', headers={'Retry-After': '3'})
+
+
+
+def vary(response):
+    return {value.strip().lower() for value in response.headers.get('vary', '').split(',') if value.strip()}
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(response_encoding, 'brotli', None)
+
+
+def test_gzip_when_accepted(without_brotli):
+    response = call(app, 'GET', '/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.content == BIG  # decoded by the client
+    assert int(response.headers['content-length']) == len(gzip.compress(BIG, compresslevel=6, mtime=0))
+    assert vary(response) == {'cookie', 'accept-encoding'}
+
+
+def test_brotli_when_accepted_and_installed():
+    brotli = pytest.importorskip('brotli')
+    response = call(app, 'GET', '/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['content-encoding'] == 'br'
+    assert int(response.headers['content-length']) == len(brotli.compress(BIG, quality=response_encoding.BROTLI_QUALITY))
+    assert 'accept-encoding' in vary(response)
+
+
+@pytest.mark.parametrize('accept_encoding', ['identity', '', 'gzip;q=0', 'deflate'])
+def test_identity_when_nothing_supported_is_accepted(accept_encoding):
+    response = call(app, 'GET', '/big', headers={'Accept-Encoding': accept_encoding})
+    assert 'content-encoding' not in response.headers
+    assert response.content == BIG
+    assert int(response.headers['content-length']) == len(BIG)
+
+
+def test_short_bodies_are_sent_uncompressed():
+    response = call(app, 'GET', '/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+    assert response.content == SMALL
+    assert int(response.headers['content-length']) == len(SMALL)
+    assert 'accept-encoding' in vary(response)  # another body from the same URL might be compressed
+
+
+def test_not_modified_passes_through():
+    response = call(app, 'GET', '/not-modified', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 304
+    assert 'content-encoding' not in response.headers
+    assert response.headers['etag'] == 'W/"v1"'
+    assert response.headers['vary'] == 'Accept-Encoding, Cookie'
+
+
+def test_too_many_requests_passes_through():
+    response = call(app, 'GET', '/too-many', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 429
+    assert response.headers['retry-after'] == '3'
+    assert 'content-encoding' not in response.headers
+    assert 'vary' not in response.headers
+    assert response.content == BIG
+
+
+def test_repeated_bodies_are_compressed_once(without_brotli):
+    response_encoding.compress.cache_clear()
+    for _ in range(3):
+        call(app, 'GET', '/big', headers={'Accept-Encoding': 'gzip'})
+    info = response_encoding.compress.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
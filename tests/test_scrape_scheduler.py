@@ -0,0 +1,200 @@
+import json
+import os
+import time
+
+import pytest
+
+import scrape_scheduler
+from dataset_io import load_dataset, write_dataset
+from incremental import manifest_path, state_path
+from scrape_scheduler import DATA_FILENAME, RunWatchdog, ScrapeScheduler, validate_dataset
+
+SECTIONS = {
+    'main_content': {'headings': ['Xbox full screen experience']},
+    'comprehensive_specifications': {'Weight': '715 g'},
+    'gaming_features': ['Game Bar'],
+    'model_comparisons': {'ROG Xbox Ally X': '24 GB'},
+}
+
+
+def dataset(**changes):
+    return {'url': 'https://example.com', 'timestamp': '2026-10-19 00:00:00', **SECTIONS, **changes}
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    write_dataset(dataset(), str(data_dir / DATA_FILENAME))
+    return ScrapeScheduler(data_dir=str(data_dir), metrics_file=str(tmp_path / 'metrics.jsonl'))
+
+
+def limited(tmp_path, scrape, **limits):
+    """A scheduler whose child process runs `scrape` instead of the real scraper"""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir(exist_ok=True)
+    options = dict(memory_limit_mb=0, cpu_limit_seconds=0, timeout_seconds=0, min_bytes=0, min_data_points=0)
+    options.update(limits)
+    return ScrapeScheduler(data_dir=str(data_dir), metrics_file=str(tmp_path / 'metrics.jsonl'),
+                           scrape=scrape, **options)
+
+
+# Child-process stand-ins for the scraper; module level so the spawn context can import them
+
+def scrape_fixture(output_path, use_selenium, block_resources, cpu_seconds):
+    write_dataset(dataset(), output_path)
+
+
+def exit_at_once(output_path, use_selenium, block_resources, cpu_seconds):
+    pass
+
+
+def hang(output_path, use_selenium, block_resources, cpu_seconds):
+    time.sleep(60)
+
+
+def spin(output_path, use_selenium, block_resources, cpu_seconds):
+    while True:
+        pass
+
+
+def hog_memory(output_path, use_selenium, block_resources, cpu_seconds):
+    ballast = bytearray(300 * 1024 * 1024)
+    time.sleep(60)
+
+
+def stage(scheduler, data):
+    path = os.path.join(scheduler.staging_dir, 'run.json')
+    write_dataset(data, path)
+    return path
+
+
+class InlinePool:
+    """Stands in for the scheduler's process pool, running the call in this process"""
+
+    def __init__(self, processes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def apply(self, fn, args):
+        return fn(*args)
+
+
+def test_publishing_records_what_changed(scheduler):
+    target = os.path.join(scheduler.data_dir, DATA_FILENAME)
+    new = dataset(timestamp='2026-10-20 00:00:00', gaming_features=['Game Bar', 'Cloud saves'])
+    metrics = {}
+    scheduler.publish(stage(scheduler, new), metrics)
+
+    assert metrics['published'] and metrics['status'] == 'published'
+    assert load_dataset(target) == new
+    assert metrics['changed_sections'] == ['gaming_features']
+    assert metrics['derived'] == []  # not the apps' data directory
+    with open(manifest_path(target), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['status'] == 'updated'
+    assert manifest['previous_data_version'] != manifest['data_version'] == metrics['data_version']
+    with open(state_path(target), 'r', encoding='utf-8') as f:
+        assert json.load(f)['sections'] == manifest['section_hashes']
+
+
+def test_publishing_into_the_apps_data_directory_rebuilds_the_derived_files(scheduler, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(scrape_scheduler, 'DEFAULT_DATA_DIR', scheduler.data_dir)
+    monkeypatch.setattr(scrape_scheduler, 'refresh_derived', lambda manifest: refreshed.append(manifest) or ['quick answers'])
+    monkeypatch.setattr(scheduler._context, 'Pool', InlinePool)
+    metrics = {}
+    scheduler.publish(stage(scheduler, dataset(timestamp='2026-10-20 00:00:00')), metrics)
+
+    assert metrics['derived'] == ['quick answers']
+    assert refreshed[0]['status'] == 'updated'
+    assert refreshed[0]['changed_sections'] == []  # only the timestamp: the derived files are restamped
+
+
+def test_a_failed_rebuild_still_publishes(scheduler, monkeypatch):
+    def fail(manifest):
+        raise RuntimeError("no disk space")
+
+    monkeypatch.setattr(scrape_scheduler, 'DEFAULT_DATA_DIR', scheduler.data_dir)
+    monkeypatch.setattr(scrape_scheduler, 'refresh_derived', fail)
+    monkeypatch.setattr(scheduler._context, 'Pool', InlinePool)
+    metrics = {}
+    scheduler.publish(stage(scheduler, dataset(timestamp='2026-10-20 00:00:00')), metrics)
+    assert metrics['published']
+    assert metrics['derived_error'] == 'no disk space'
+
+
+def write(path, data):
+    write_dataset(data, str(path))
+    return str(path)
+
+
+def test_validate_dataset(tmp_path):
+    good = write(tmp_path / 'good.json', dataset())
+    assert validate_dataset(good, 0, 4) is None
+    assert validate_dataset(good, 10**6, 0).startswith("output too small")
+    assert validate_dataset(good, 0, 5) == "too few data points (4 < 5)"
+
+    missing = write(tmp_path / 'missing.json', dataset(gaming_features=[], model_comparisons=None))
+    assert validate_dataset(missing, 0, 0) == "missing or empty sections: gaming_features, model_comparisons"
+
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"main_content": ')
+    assert validate_dataset(str(broken), 0, 0).startswith("output is not valid JSON")
+
+
+def test_a_valid_scrape_is_published(tmp_path):
+    scheduler = limited(tmp_path, scrape_fixture, min_data_points=4)
+    metrics = scheduler.run_once()
+    assert metrics['status'] == 'published', metrics['reason']
+    assert load_dataset(os.path.join(scheduler.data_dir, DATA_FILENAME)) == dataset()
+    assert os.listdir(scheduler.staging_dir) == []
+
+
+def test_an_invalid_scrape_is_rejected(tmp_path):
+    scheduler = limited(tmp_path, scrape_fixture, min_data_points=5)
+    metrics = scheduler.run_once()
+    assert metrics['status'] == 'rejected'
+    assert metrics['reason'] == "too few data points (4 < 5)"
+    assert not os.path.exists(os.path.join(scheduler.data_dir, DATA_FILENAME))
+    assert os.listdir(scheduler.staging_dir) == []
+
+
+@pytest.mark.parametrize('scrape, limits, reason', [
+    (hang, {'timeout_seconds': 1}, "timed out"),
+    (spin, {'cpu_limit_seconds': 1}, "CPU time limit exceeded"),
+    (hog_memory, {'memory_limit_mb': 150}, "memory limit exceeded"),
+])
+def test_the_watchdog_stops_a_run_over_its_limits(tmp_path, scrape, limits, reason):
+    scheduler = limited(tmp_path, scrape, **limits)
+    started = time.monotonic()
+    metrics = scheduler.run_once()
+    assert metrics['status'] == 'failed'
+    assert metrics['reason'].startswith(reason)
+    assert time.monotonic() - started < 30  # killed rather than waited out
+    with open(scheduler.metrics_file, 'r', encoding='utf-8') as f:
+        assert json.loads(f.readline())['reason'] == metrics['reason']
+
+
+def test_a_child_that_exits_at_once_is_still_recorded(tmp_path):
+    scheduler = limited(tmp_path, exit_at_once)
+    metrics = scheduler.run_once()
+    assert metrics['reason'] == "scraper produced no output"
+    assert os.listdir(scheduler.staging_dir) == []
+    with open(scheduler.metrics_file, 'r', encoding='utf-8') as f:
+        assert json.loads(f.readline())['run_id'] == metrics['run_id']
+
+
+def test_the_watchdog_tolerates_an_exited_process(tmp_path):
+    process = limited(tmp_path, exit_at_once)._context.Process(target=exit_at_once, args=(None, False, False, 0))
+    process.start()
+    process.join()
+    watchdog = RunWatchdog(process.pid)  # already reaped
+    assert watchdog.sample() is None
+    watchdog.kill_tree()
+    assert watchdog.peak_rss_mb == watchdog.cpu_seconds == 0.0
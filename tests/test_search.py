@@ -0,0 +1,28 @@
+import importlib
+
+import pytest
+
+app = importlib.import_module('api.index')
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('ram', '24GB RAM|1TB'),
+    ('storage', '**Heading**: Storage'),
+    ('dimensions', '**Heading**: Dimensions'),
+    ('processor', '**Heading**: Processor'),
+    ('help', 'Help topics'),
+])
+def test_search_finds_page_text_before_navigation(query, expected):
+    results = app.clean_results(app.search_scraped_data(query))
+    assert expected in results[0]
+
+
+@pytest.mark.parametrize('query, unwanted', [
+    ('ram', 'Instagram logo'),
+    ('storage', 'Shop all accessories'),
+    ('help', 'Shop all consoles'),
+    ('dimensions', 'DisplayPort'),
+])
+def test_search_skips_navigation_and_unrelated_rows(query, unwanted):
+    top = app.clean_results(app.search_scraped_data(query))[:2]
+    assert not any(unwanted in result for result in top)
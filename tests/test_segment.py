@@ -0,0 +1,50 @@
+import pytest
+
+from corpus import Corpus
+from segment import IndexSegment, attach_segment, write_segment
+
+SECTION_ORDER = ['main_content', 'comprehensive_specifications', 'interactive_elements', 'all_tabs_and_sections']
+
+
+@pytest.fixture(scope='module')
+def segment_file(tmp_path_factory):
+    filename = str(tmp_path_factory.mktemp('segment') / 'index_segment.bin')
+    write_segment(filename, 'v1', Corpus(section_order=SECTION_ORDER))
+    return filename
+
+
+def test_segment_passages_match_the_parsed_ones(segment_file):
+    parsed = Corpus(section_order=SECTION_ORDER)
+    mapped = Corpus(section_order=SECTION_ORDER, segment=attach_segment(segment_file, 'v1', SECTION_ORDER))
+    for name in parsed.route(''):
+        built, stored = parsed.shard(name), mapped.shard(name)
+        assert stored.data is None
+        assert stored.timestamp == built.timestamp
+        assert [p.text for p in stored.passages] == [p.text for p in built.passages]
+        for query in ('game pass', 'wifi 6e', 'not on the page at all'):
+            assert [p.text for p in stored.search(query, 5)] == [p.text for p in built.search(query, 5)]
+        assert stored.specs.answers == built.specs.answers
+
+
+@pytest.mark.parametrize('version, section_order', [('v2', SECTION_ORDER), ('v1', ['main_content'])])
+def test_a_segment_built_from_other_data_is_not_attached(segment_file, version, section_order):
+    assert attach_segment(segment_file, version, section_order) is None
+
+
+def test_without_a_segment_file_shards_are_parsed(tmp_path):
+    assert attach_segment(str(tmp_path / 'missing.bin'), 'v1', SECTION_ORDER) is None
+    assert attach_segment('', 'v1', SECTION_ORDER) is None
+
+
+def test_a_file_in_another_format_is_ignored(tmp_path):
+    filename = tmp_path / 'index_segment.bin'
+    filename.write_bytes(b'not a segment at all')
+    with pytest.raises(ValueError):
+        IndexSegment(str(filename))
+    assert attach_segment(str(filename), 'v1', SECTION_ORDER) is None
+
+
+def test_answers_stay_in_process():
+    import importlib
+    app = importlib.import_module('api.index')
+    assert app.ANSWERS is app.KNOWLEDGE.answers
@@ -0,0 +1,67 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from embeddings import indexable_passage, passage_rows  # noqa: E402
+from conftest import ROOT  # noqa: E402
+from passages import Passage  # noqa: E402
+
+app = importlib.import_module('api.index')
+
+
+@pytest.mark.parametrize('text', [
+    'headerUniversalHeader',
+    'Analytics&&o.',
+    'View a, .featureCal',
+    'XgpImmersiveSkuModule-module__details___2WJRb, .',
+    'a[data-bi-id],[data-bi-id]',
+    'About our ads',
+    'Privacy & Cookies',
+])
+def test_labels_markup_and_identifiers_are_not_embedded(text):
+    assert not indexable_passage(text)
+
+
+@pytest.mark.parametrize('text', [
+    'Xbox full screen experience',
+    '1 TB M.2 2280 SSD for easier upgrade',
+    'Peak efficiency paired with a 60Wh or 80Wh battery to play for hours',
+])
+def test_page_prose_is_embedded(text):
+    assert indexable_passage(text)
+
+
+def test_passage_rows_skip_unindexable_passages():
+    passages = [Passage('main_content', (i,), 0, len(text), text)
+                for i, text in enumerate(['headerUniversalHeader', 'Press the Xbox button for Game Bar'])]
+    assert [text for _, _, text in passage_rows(passages)] == ['Press the Xbox button for Game Bar']
+
+
+def test_headphone_gets_the_audio_answer_not_an_element_id():
+    answer = app.get_enhanced_chatbot_response('headphone')
+    assert 'headerUniversalHeader' not in answer
+    assert 'audio jack' in answer
+
+
+@pytest.mark.parametrize('message', ['pizza', 'cooling', 'weather today'])
+def test_low_confidence_hits_fall_back_to_asking(message):
+    assert app.scraped_fallback(message) == app.ANSWERS.text('responses.elaborate')
+
+
+def test_spec_answers_do_not_load_the_semantic_index():
+    script = (
+        "import importlib, sys\n"
+        "app = importlib.import_module('api.index')\n"
+        "assert 'numpy' not in sys.modules\n"
+        "print(app.get_enhanced_chatbot_response('how heavy is the ally x'))\n"
+        "assert 'numpy' not in sys.modules, 'numpy imported for a spec answer'\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, 'api')]))
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert '715 g' in result.stdout
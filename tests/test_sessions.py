@@ -0,0 +1,55 @@
+import importlib
+
+import pytest
+
+from admission import RateLimiter
+from conftest import call
+from sessions import SESSION_COOKIE, MemorySessionStore, Session, load_session
+
+app = importlib.import_module('api.index')
+
+
+def test_store_drops_the_least_recently_used_past_its_cap():
+    store = MemorySessionStore(ttl=60, max_sessions=2)
+    sessions = [Session(product='ROG Xbox Ally X') for _ in range(3)]
+    for session in sessions:
+        store.save(session)
+    assert len(store) == 2
+    assert store.get(sessions[0].id) is None
+    assert store.get(sessions[2].id).product == 'ROG Xbox Ally X'
+
+
+def test_expired_sessions_are_forgotten():
+    store = MemorySessionStore(ttl=-1)
+    session = Session(topic='battery')
+    store.save(session)
+    assert store.get(session.id) is None
+
+
+@pytest.mark.parametrize('cookie', [None, '', 'short', 'x' * 65, 'has spaces in it!!', 'unknown-but-well-formed'])
+def test_unusable_cookies_start_a_new_session(cookie):
+    session = load_session(MemorySessionStore(), cookie)
+    assert session.is_new
+    assert not session.has_context()
+
+
+def test_follow_ups_are_answered_in_the_visitors_context(monkeypatch):
+    monkeypatch.setattr(app, 'SESSIONS', MemorySessionStore())
+    monkeypatch.setattr(app, 'RATE_LIMITER', RateLimiter(per_minute=6000, burst=1000))
+    first = call(app.app, 'POST', '/chat', data={'message': 'weight of the ally x'})
+    cookie = first.headers['set-cookie']
+    assert cookie.startswith(f'{SESSION_COOKIE}=') and 'HttpOnly' in cookie
+    headers = {'Cookie': cookie.split(';')[0]}
+    follow_up = call(app.app, 'POST', '/chat', data={'message': 'and the battery?'}, headers=headers)
+    assert follow_up.json()['response'] == 'Battery of the ROG Xbox Ally X: 80 Wh.'
+    assert 'set-cookie' not in follow_up.headers
+    other_model = call(app.app, 'POST', '/chat', data={'message': 'what about the base ally?'}, headers=headers)
+    assert other_model.json()['response'] == 'Battery of the ROG Xbox Ally: 60 Wh.'
+
+
+def test_questions_without_context_do_not_start_a_session(monkeypatch):
+    monkeypatch.setattr(app, 'SESSIONS', MemorySessionStore())
+    monkeypatch.setattr(app, 'RATE_LIMITER', RateLimiter(per_minute=6000, burst=1000))
+    response = call(app.app, 'POST', '/chat', data={'message': 'does it support game pass'})
+    assert 'set-cookie' not in response.headers
+    assert len(app.SESSIONS) == 0
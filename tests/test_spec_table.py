@@ -0,0 +1,44 @@
+import pytest
+
+from corpus import Corpus
+from spec_table import spec_attribute
+
+CORPUS = Corpus()
+
+
+@pytest.mark.parametrize('message, key', [
+    ('ram on the ally x', ('memory', 'ROG Xbox Ally X')),
+    ('weight of the ally x', ('weight', 'ROG Xbox Ally X')),
+    ('battery of the base ally', ('battery', 'ROG Xbox Ally')),
+    ('how much heavier is the ally x than the ally', ('weight', None)),
+    ('compare the battery of the ally x and the base ally', ('battery', None)),
+])
+def test_spec_questions_resolve_to_an_answer_key(message, key):
+    table, found = CORPUS.spec_lookup(message)
+    assert found == key
+    assert table.answers[found]
+
+
+def test_comparisons_state_the_difference():
+    table, key = CORPUS.spec_lookup('how much heavier is the ally x than the ally')
+    assert table.answers[key] == ('Weight — ROG Xbox Ally X: 715 g; ROG Xbox Ally: 670 g. '
+                                  'The ROG Xbox Ally X is 45 g (7%) heavier than the ROG Xbox Ally.')
+
+
+def test_answers_are_pre_encoded():
+    table, key = CORPUS.spec_lookup('weight of the ally x')
+    assert table.json(key) == b'{"response":"Weight of the ROG Xbox Ally X: 715 g."}'
+
+
+@pytest.mark.parametrize('message', ['does it support game pass', 'hello', 'what is the game bar'])
+def test_other_questions_are_not_spec_questions(message):
+    assert spec_attribute(message) is None
+    assert CORPUS.spec_lookup(message) is None
+
+
+def test_follow_ups_carry_the_previous_model_and_attribute():
+    _, key = CORPUS.spec_lookup('and the battery?', model='ROG Xbox Ally X')
+    assert key == ('battery', 'ROG Xbox Ally X')
+    _, key = CORPUS.spec_lookup('what about the base ally?', model='ROG Xbox Ally X', attribute='weight')
+    assert key == ('weight', 'ROG Xbox Ally')
+    assert CORPUS.spec_lookup('and the battery?') is None
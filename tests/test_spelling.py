@@ -0,0 +1,61 @@
+import pytest
+
+from knowledge import SpellingIndex, edit_distance, load_knowledge
+
+
+@pytest.fixture
+def speller():
+    return SpellingIndex(['battery', 'buttons', 'game pass', 'connectivity', 'accessories'],
+                         ['Press the Xbox button for Game Bar'])
+
+
+@pytest.mark.parametrize('typed, expected', [
+    ('baterry', 'battery'),
+    ('gamepas', 'game pass'),
+    ('conectivity', 'connectivity'),
+    ('accesories', 'accessories'),
+])
+def test_misspelled_keywords_are_corrected(speller, typed, expected):
+    assert speller.lookup(typed) == expected
+
+
+def test_words_in_the_vocabulary_are_not_corrected(speller):
+    assert speller.correct('xbox button') == 'xbox button'
+
+
+def test_words_of_multi_word_keywords_are_not_corrected():
+    speller = SpellingIndex(['xbox controller', 'controllers'])
+    assert speller.correct('controller') == 'controller'
+    assert speller.correct('controllres') == 'controllers'
+
+
+def test_short_tokens_are_not_corrected():
+    speller = SpellingIndex(['specs', 'ports'])
+    assert speller.correct('spec port') == 'spec port'
+
+
+def test_vocabulary_sources_are_read_when_the_index_is_built():
+    reads = []
+
+    def source():
+        reads.append(1)
+        return ['Pair up to four controllers']
+
+    speller = SpellingIndex(['controller'])
+    speller.add_vocabulary(source)
+    assert reads == []
+    assert speller.lookup('controllers') is None
+    assert reads == [1]
+    assert speller.lookup('controler') == 'controller'
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance('baterry', 'battery', 2) == 2
+    assert edit_distance('bluetoth', 'bluetooth', 2) == 1
+    assert edit_distance('abcdef', 'badcfe', 2) == 3
+
+
+def test_router_keeps_valid_words():
+    router = load_knowledge().router('enhanced')
+    assert router.speller.correct('xbox button') == 'xbox button'
+    assert router.route('baterry') == router.route('battery')
@@ -0,0 +1,68 @@
+import os
+import random
+
+import pytest
+
+from conftest import ROOT
+from dataset_io import load_dataset
+from incremental import DEFAULT_DATA_FILE
+from text_store import (NEAR_DUPLICATE_THRESHOLD, REF_KEY, STRINGS_SECTION, MinHasher, TextStore,
+                        compact_dataset, expand_dataset)
+
+LONG = 'The ROG Xbox Ally X pairs an AMD Ryzen AI Z2 Extreme processor with 24 GB of memory. ' * 4
+
+
+def page_text(changed_words=0):
+    """A 300-word text with `changed_words` words replaced, spread out so each breaks five shingles"""
+    rng = random.Random(1)
+    words = [f'w{rng.randrange(5000)}' for _ in range(300)]
+    for i in range(changed_words):
+        words[20 + i * 13] = f'changed{i}'
+    return ' '.join(words)
+
+
+def test_compaction_round_trips():
+    data = {
+        'url': 'https://example.com',
+        'main_content': {'paragraphs': [LONG, LONG, 'short'], 'count': 3, 'flag': True, 'missing': None},
+        'specs': [{'value': LONG}, [LONG.upper()]],
+    }
+    compacted = compact_dataset(data)
+    assert list(compacted)[0] == STRINGS_SECTION
+    assert len(compacted[STRINGS_SECTION]) == 2
+    assert compacted['main_content']['paragraphs'][2] == 'short'
+    assert compacted['main_content']['paragraphs'][0] == {REF_KEY: next(iter(compacted[STRINGS_SECTION]))}
+    expanded = expand_dataset(compacted)
+    assert expanded == data
+    assert expanded['main_content']['paragraphs'][0] is expanded['specs'][0]['value']
+
+
+def test_the_scraped_dataset_round_trips():
+    stored = load_dataset(os.path.join(ROOT, DEFAULT_DATA_FILE), expand=False)
+    expanded = expand_dataset(stored)
+    assert expand_dataset(compact_dataset(expanded)) == expanded
+
+
+def test_a_dataset_without_references_is_returned_as_is():
+    data = {'main_content': {'title': 'ROG Xbox Ally'}}
+    assert expand_dataset(data) is data
+
+
+@pytest.mark.parametrize('changed_words, collapsed', [(0, True), (3, True), (5, False), (20, False)])
+def test_the_threshold_decides_what_collapses(changed_words, collapsed):
+    hasher = MinHasher()
+    similarity = hasher.similarity(hasher.signature(page_text()), hasher.signature(page_text(changed_words)))
+    assert (similarity >= NEAR_DUPLICATE_THRESHOLD) == collapsed  # 3 changes: 0.906, 5 changes: 0.875
+
+    store = TextStore(near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD)
+    first = store.add(page_text())
+    second = store.add(page_text(changed_words))
+    assert (second == first) == collapsed
+    assert len(store.strings) == (1 if collapsed else 2)
+    assert store.collapsed == (1 if collapsed and changed_words else 0)
+
+
+def test_without_a_threshold_near_duplicates_are_kept():
+    store = TextStore()
+    assert store.add(page_text()) != store.add(page_text(1))
+    assert len(store.strings) == 2
@@ -0,0 +1,154 @@
+import hashlib
+import re
+
+# Strings shorter than this are cheaper to keep inline than to reference
+MIN_REF_LENGTH = 200
+
+# Estimated Jaccard similarity at which scraped texts are treated as the same passage
+NEAR_DUPLICATE_THRESHOLD = 0.9
+
+STRINGS_SECTION = '__strings__'
+REF_KEY = '$ref'
+
+_WORD_RE = re.compile(r'\w+')
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def text_id(text):
+    """Content address of a string"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _shingles(text, size):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, with deterministic per-permutation seeds"""
+
+    def __init__(self, num_perm=64, shingle_size=5):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        seeds = hashlib.blake2b(b'text_store.minhash', digest_size=64).digest()
+        params = []
+        state = int.from_bytes(seeds, 'big')
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+            a = (state >> 3) % _MERSENNE_PRIME or 1
+            state = (state * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+            b = (state >> 3) % _MERSENNE_PRIME
+            params.append((a, b))
+        self._params = params
+
+    def signature(self, text):
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'big')
+                  for s in _shingles(text, self.shingle_size)]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        """Estimated Jaccard similarity of the two shingle sets"""
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class TextStore:
+    """Content-addressed string store: each distinct text is kept once and referenced by ID.
+
+    With a `near_duplicate_threshold`, texts whose estimated shingle similarity to an
+    already stored text reaches the threshold are collapsed onto that text. Candidates
+    are found with MinHash LSH banding, so adding a text does not compare it against
+    every stored one.
+    """
+
+    def __init__(self, near_duplicate_threshold=None, num_perm=64, bands=16):
+        self.strings = {}
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.collapsed = 0
+        if near_duplicate_threshold:
+            self._hasher = MinHasher(num_perm=num_perm)
+            self._rows = num_perm // bands
+            self._bands = bands
+            self._buckets = {}
+            self._signatures = {}
+
+    def _band_keys(self, signature):
+        rows = self._rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self._bands)]
+
+    def add(self, text):
+        """Store `text` (or find its duplicate) and return the ID to reference it by"""
+        key = text_id(text)
+        if key in self.strings:
+            return key
+
+        if self.near_duplicate_threshold:
+            signature = self._hasher.signature(text)
+            band_keys = self._band_keys(signature)
+            candidates = set()
+            for band_key in band_keys:
+                candidates.update(self._buckets.get(band_key, ()))
+            best, best_score = None, 0.0
+            for candidate in candidates:
+                score = MinHasher.similarity(signature, self._signatures[candidate])
+                if score > best_score:
+                    best, best_score = candidate, score
+            if best is not None and best_score >= self.near_duplicate_threshold:
+                self.collapsed += 1
+                return best
+            self._signatures[key] = signature
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, []).append(key)
+
+        self.strings[key] = text
+        return key
+
+
+def compact_dataset(data, min_length=MIN_REF_LENGTH, near_duplicate_threshold=None):
+    """Replace long strings with {"$ref": id} and put each distinct text once in `__strings__`.
+
+    The strings section comes first so line-delimited readers can resolve references
+    while streaming the remaining sections.
+    """
+    store = TextStore(near_duplicate_threshold=near_duplicate_threshold)
+
+    def compact(value):
+        if isinstance(value, str):
+            if len(value) >= min_length:
+                return {REF_KEY: store.add(value)}
+            return value
+        if isinstance(value, dict):
+            return {k: compact(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [compact(v) for v in value]
+        return value
+
+    sections = {key: compact(value) for key, value in data.items() if key != STRINGS_SECTION}
+    compacted = {STRINGS_SECTION: store.strings}
+    compacted.update(sections)
+    return compacted
+
+
+def resolve_refs(value, strings):
+    """Swap {"$ref": id} markers for the shared string objects in `strings`"""
+    if isinstance(value, dict):
+        if len(value) == 1 and REF_KEY in value:
+            return strings[value[REF_KEY]]
+        return {k: resolve_refs(v, strings) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(v, strings) for v in value]
+    return value
+
+
+def expand_dataset(data):
+    """Inverse of compact_dataset; every reference to a text shares one str object"""
+    strings = data.get(STRINGS_SECTION)
+    if strings is None:
+        return data
+    return {key: resolve_refs(value, strings) for key, value in data.items() if key != STRINGS_SECTION}